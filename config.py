@@ -110,6 +110,41 @@ def load_config() -> Dict[str, Any]:
             stt_cfg.get("fallback_log_prob_threshold", -5.0),
         )),
     }
+    db_cfg = config.get("database", {})
+    config["database"] = {
+        "journal_mode": str(os.getenv("DB_JOURNAL_MODE", db_cfg.get("journal_mode", "WAL"))).upper(),
+        "synchronous": str(os.getenv("DB_SYNCHRONOUS", db_cfg.get("synchronous", "NORMAL"))).upper(),
+        "cache_size": _coerce_int(os.getenv("DB_CACHE_SIZE", db_cfg.get("cache_size", -16000)), -16000),
+        "mmap_size": _coerce_int(os.getenv("DB_MMAP_SIZE", db_cfg.get("mmap_size", 134217728)), 134217728),
+        "busy_timeout": _coerce_int(os.getenv("DB_BUSY_TIMEOUT", db_cfg.get("busy_timeout", 5000)), 5000),
+        "temp_store": str(os.getenv("DB_TEMP_STORE", db_cfg.get("temp_store", "MEMORY"))).upper(),
+        "pool_size": _coerce_int(os.getenv("DB_POOL_SIZE", db_cfg.get("pool_size", 5)), 5),
+        "pool_timeout": _coerce_float(os.getenv("DB_POOL_TIMEOUT", db_cfg.get("pool_timeout", 10.0)), 10.0),
+        "instrument_queries": str(os.getenv(
+            "DB_INSTRUMENT_QUERIES",
+            str(db_cfg.get("instrument_queries", True)),
+        )).lower() == "true",
+        "slow_query_ms": _coerce_float(os.getenv("DB_SLOW_QUERY_MS", db_cfg.get("slow_query_ms", 50.0)), 50.0),
+        "sql_headers": str(os.getenv("DB_SQL_HEADERS", str(db_cfg.get("sql_headers", False)))).lower() == "true",
+    }
+    today_cfg = config.get("today", {})
+    config["today"] = {
+        "prefetch_cards": max(
+            0,
+            _coerce_int(os.getenv("TODAY_PREFETCH_CARDS", today_cfg.get("prefetch_cards", 3)), 3),
+        ),
+    }
+    scheduling_cfg = config.get("scheduling", {})
+    config["scheduling"] = {
+        "load_balance": str(os.getenv(
+            "SCHEDULING_LOAD_BALANCE",
+            str(scheduling_cfg.get("load_balance", False)),
+        )).lower() == "true",
+        "daily_target": max(
+            0,
+            _coerce_int(os.getenv("SCHEDULING_DAILY_TARGET", scheduling_cfg.get("daily_target", 30)), 30),
+        ),
+    }
     return config
 
 def get_config_value(section: str, key: str, default: Optional[Any] = None) -> Any:
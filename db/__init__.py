@@ -1,3 +1,4 @@
-from .database import init_db, get_conn
+from .database import init_db, get_conn, get_db
+from .async_db import AsyncDatabase, get_async_db
 
-__all__ = ['init_db', 'get_conn']
+__all__ = ['init_db', 'get_conn', 'get_db', 'AsyncDatabase', 'get_async_db']
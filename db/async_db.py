@@ -0,0 +1,93 @@
+"""Async facade that keeps blocking sqlite3 calls off the event loop."""
+import asyncio
+import contextvars
+import functools
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, TypeVar
+
+from . import database
+
+T = TypeVar("T")
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Dedicated worker threads for SQL, sized to the connection pool."""
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        return _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=database.get_pool().max_size,
+                thread_name_prefix="memcoach-db",
+            )
+        return _EXECUTOR
+
+
+def shutdown_db_executor() -> None:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is not None:
+            _EXECUTOR.shutdown(wait=True)
+        _EXECUTOR = None
+
+
+async def run_in_db_thread(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run fn on the DB executor, carrying context variables like asyncio.to_thread."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_db_executor(), call)
+
+
+class AsyncDatabase:
+    """Wraps one pooled connection; every call runs on the DB executor.
+
+    Calls are awaited one at a time per request, so the connection is never
+    used from two threads at once.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call fn(conn, *args, **kwargs) off the event loop."""
+        return await run_in_db_thread(fn, self.conn, *args, **kwargs)
+
+    async def execute(self, sql: str, params: Iterable[Any] = ()) -> int:
+        """Execute a statement and return the affected row count."""
+        def _execute(conn: sqlite3.Connection) -> int:
+            return conn.execute(sql, tuple(params)).rowcount
+        return await self.run(_execute)
+
+    async def fetchone(self, sql: str, params: Iterable[Any] = ()) -> Optional[sqlite3.Row]:
+        def _fetchone(conn: sqlite3.Connection) -> Optional[sqlite3.Row]:
+            return conn.execute(sql, tuple(params)).fetchone()
+        return await self.run(_fetchone)
+
+    async def fetchall(self, sql: str, params: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        def _fetchall(conn: sqlite3.Connection) -> List[sqlite3.Row]:
+            return conn.execute(sql, tuple(params)).fetchall()
+        return await self.run(_fetchall)
+
+    async def commit(self) -> None:
+        await run_in_db_thread(self.conn.commit)
+
+
+async def get_async_db():
+    """FastAPI dependency yielding an AsyncDatabase backed by a pooled connection.
+
+    Waiting for a free connection happens on the default thread pool so that
+    blocked waiters never starve the DB executor serving queries.
+    """
+    pool = database.get_pool()
+    conn = await asyncio.to_thread(pool.acquire)
+    try:
+        yield AsyncDatabase(conn)
+    finally:
+        await asyncio.to_thread(pool.release, conn)
@@ -1,267 +1,41 @@
 import io
 import json
+import queue
 import sqlite3
+import threading
+import time
 import zipfile
 from contextlib import contextmanager
 from datetime import date, datetime, timezone
 from pathlib import Path
+from typing import List, Optional
 
-from config import CONFIG_PATH
-from .schema import SCHEMA_SQL, INDEXES_SQL, SCHEMA_VERSION
-from utils.progress import compute_progress_from_reviews, upsert_card_progress
+from config import CONFIG_PATH, load_config
+from .instrumentation import SQL_METRICS, InstrumentedConnection
+from .migrations import AppliedMigration, get_schema_version, run_migrations
+from .schema import SCHEMA_VERSION
+from utils.deck_cache import DECK_CACHE
+from utils.review_sessions import REVIEW_SESSIONS
 
 CONFIG_DIR = Path.home() / ".memcoach"
 DB_PATH = CONFIG_DIR / "memcoach.db"
 BACKUP_DIR = CONFIG_DIR / "backups"
 BACKUP_KEEP = 7
 
-def init_db():
-    """Initialize the database by creating tables and indexes if they don't exist."""
+JOURNAL_MODES = {"WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"}
+SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+TEMP_STORE_MODES = {"DEFAULT", "FILE", "MEMORY"}
+
+def init_db() -> List[AppliedMigration]:
+    """Create or upgrade the database schema, then take the daily backup.
+
+    Returns the migrations applied on this start (empty on a warm start).
+    """
     CONFIG_DIR.mkdir(exist_ok=True)
     with get_conn() as conn:
-        conn.executescript(SCHEMA_SQL)
-        ensure_card_mastery_status(conn)
-        ensure_card_chunk_fields(conn)
-        ensure_soft_delete_columns(conn)
-        ensure_card_position(conn)
-        ensure_cards_fts(conn)
-        ensure_review_duration(conn)
-        ensure_review_hint_mode(conn)
-        ensure_deck_review_mode(conn)
-        ensure_review_review_mode(conn)
-        ensure_review_grading_fields(conn)
-        ensure_card_progress(conn)
-        ensure_assignment_defaults(conn)
-        ensure_deck_mastery_rules(conn)
-        ensure_bible_verses_table(conn)
-        ensure_schema_version(conn)
-        conn.executescript(INDEXES_SQL)
-        conn.commit()
+        applied = run_migrations(conn)
     run_daily_backup()
-
-def ensure_card_progress(conn: sqlite3.Connection) -> None:
-    """Ensure card_progress table exists and backfill from reviews if empty."""
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='card_progress'"
-    )
-    if not cursor.fetchone():
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS card_progress (
-                kid_id INTEGER NOT NULL,
-                card_id INTEGER NOT NULL,
-                interval_days INTEGER NOT NULL DEFAULT 1,
-                due_date TEXT NOT NULL DEFAULT (date('now')),
-                ease_factor REAL NOT NULL DEFAULT 2.5,
-                streak INTEGER NOT NULL DEFAULT 0,
-                mastery_status TEXT NOT NULL DEFAULT 'new' CHECK(mastery_status IN ('new', 'learning', 'mastered')),
-                last_review_ts TEXT,
-                PRIMARY KEY (kid_id, card_id),
-                FOREIGN KEY (kid_id) REFERENCES kids (id) ON DELETE CASCADE,
-                FOREIGN KEY (card_id) REFERENCES cards (id) ON DELETE CASCADE
-            )
-            """
-        )
-    cursor.execute("SELECT COUNT(*) FROM card_progress")
-    if (cursor.fetchone() or [0])[0]:
-        return
-    cursor.execute("SELECT DISTINCT kid_id, card_id FROM reviews")
-    pairs = cursor.fetchall()
-    if not pairs:
-        return
-    for row in pairs:
-        progress = compute_progress_from_reviews(conn, row["kid_id"], row["card_id"])
-        if not progress:
-            continue
-        upsert_card_progress(
-            conn,
-            kid_id=row["kid_id"],
-            card_id=row["card_id"],
-            interval_days=progress.interval_days,
-            due_date=progress.due_date,
-            ease_factor=progress.ease_factor,
-            streak=progress.streak,
-            mastery_status=progress.mastery_status,
-            last_review_ts=progress.last_review_ts,
-        )
-
-def ensure_card_mastery_status(conn: sqlite3.Connection) -> None:
-    """Ensure cards table has mastery_status column for existing installs."""
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(cards)")
-    columns = {row[1] for row in cursor.fetchall()}
-    if "mastery_status" not in columns:
-        cursor.execute(
-            "ALTER TABLE cards ADD COLUMN mastery_status TEXT NOT NULL DEFAULT 'new'"
-        )
-
-def ensure_card_chunk_fields(conn: sqlite3.Connection) -> None:
-    """Ensure cards table has chunking columns for long texts."""
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(cards)")
-    columns = {row[1] for row in cursor.fetchall()}
-    if "text_id" not in columns:
-        cursor.execute("ALTER TABLE cards ADD COLUMN text_id INTEGER")
-    if "chunk_index" not in columns:
-        cursor.execute("ALTER TABLE cards ADD COLUMN chunk_index INTEGER")
-
-def ensure_soft_delete_columns(conn: sqlite3.Connection) -> None:
-    """Ensure tables have deleted_at columns for soft deletes."""
-    cursor = conn.cursor()
-    for table in ("kids", "decks", "cards", "texts"):
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = {row[1] for row in cursor.fetchall()}
-        if "deleted_at" not in columns:
-            cursor.execute(f"ALTER TABLE {table} ADD COLUMN deleted_at TEXT")
-
-def ensure_card_position(conn: sqlite3.Connection) -> None:
-    """Ensure cards table has position column and initialize existing rows."""
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(cards)")
-    columns = {row[1] for row in cursor.fetchall()}
-    if "position" not in columns:
-        cursor.execute("ALTER TABLE cards ADD COLUMN position INTEGER NOT NULL DEFAULT 0")
-    cursor.execute("UPDATE cards SET position = id WHERE position IS NULL OR position = 0")
-
-def ensure_cards_fts(conn: sqlite3.Connection) -> None:
-    """Ensure FTS table is populated for existing cards."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='cards_fts'")
-    if not cursor.fetchone():
-        return
-    cursor.execute("SELECT COUNT(*) FROM cards_fts")
-    fts_count = cursor.fetchone()[0] or 0
-    cursor.execute("SELECT COUNT(*) FROM cards")
-    cards_count = cursor.fetchone()[0] or 0
-    if fts_count < cards_count:
-        cursor.execute("INSERT INTO cards_fts(cards_fts) VALUES('rebuild')")
-
-def ensure_review_duration(conn: sqlite3.Connection) -> None:
-    """Ensure reviews table has duration_seconds column."""
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(reviews)")
-    columns = {row[1] for row in cursor.fetchall()}
-    if "duration_seconds" not in columns:
-        cursor.execute("ALTER TABLE reviews ADD COLUMN duration_seconds INTEGER")
-
-def ensure_review_hint_mode(conn: sqlite3.Connection) -> None:
-    """Ensure reviews table has hint_mode column."""
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(reviews)")
-    columns = {row[1] for row in cursor.fetchall()}
-    if "hint_mode" not in columns:
-        cursor.execute(
-            "ALTER TABLE reviews ADD COLUMN hint_mode TEXT NOT NULL DEFAULT 'none'"
-        )
-
-def ensure_deck_review_mode(conn: sqlite3.Connection) -> None:
-    """Ensure decks table has review_mode column."""
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(decks)")
-    columns = {row[1] for row in cursor.fetchall()}
-    if "review_mode" not in columns:
-        cursor.execute(
-            "ALTER TABLE decks ADD COLUMN review_mode TEXT NOT NULL DEFAULT 'free_recall'"
-        )
-
-def ensure_review_review_mode(conn: sqlite3.Connection) -> None:
-    """Ensure reviews table has review_mode column."""
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(reviews)")
-    columns = {row[1] for row in cursor.fetchall()}
-    if "review_mode" not in columns:
-        cursor.execute(
-            "ALTER TABLE reviews ADD COLUMN review_mode TEXT NOT NULL DEFAULT 'free_recall'"
-        )
-
-def ensure_review_grading_fields(conn: sqlite3.Connection) -> None:
-    """Ensure reviews table has grading metadata columns."""
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(reviews)")
-    columns = {row[1] for row in cursor.fetchall()}
-    if "auto_grade" not in columns:
-        cursor.execute("ALTER TABLE reviews ADD COLUMN auto_grade TEXT")
-    if "final_grade" not in columns:
-        cursor.execute("ALTER TABLE reviews ADD COLUMN final_grade TEXT")
-    if "graded_by" not in columns:
-        cursor.execute("ALTER TABLE reviews ADD COLUMN graded_by TEXT NOT NULL DEFAULT 'auto'")
-
-def ensure_assignment_defaults(conn: sqlite3.Connection) -> None:
-    """Ensure default assignments exist for all kid/deck pairs."""
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT OR IGNORE INTO assignments (kid_id, deck_id)
-        SELECT k.id, d.id
-        FROM kids k
-        CROSS JOIN decks d
-        WHERE k.deleted_at IS NULL AND d.deleted_at IS NULL
-        """
-    )
-
-def ensure_deck_mastery_rules(conn: sqlite3.Connection) -> None:
-    """Ensure deck mastery rules table exists and defaults are seeded."""
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='deck_mastery_rules'"
-    )
-    if not cursor.fetchone():
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS deck_mastery_rules (
-                deck_id INTEGER PRIMARY KEY,
-                consecutive_grades INTEGER NOT NULL DEFAULT 3,
-                min_ease_factor REAL NOT NULL DEFAULT 2.5,
-                min_interval_days INTEGER NOT NULL DEFAULT 7,
-                FOREIGN KEY (deck_id) REFERENCES decks (id) ON DELETE CASCADE
-            )
-            """
-        )
-    cursor.execute(
-        """
-        INSERT OR IGNORE INTO deck_mastery_rules (deck_id)
-        SELECT id FROM decks WHERE deleted_at IS NULL
-        """
-    )
-
-def ensure_bible_verses_table(conn: sqlite3.Connection) -> None:
-    """Ensure bible_verses table exists for local scripture lookups."""
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='bible_verses'"
-    )
-    if cursor.fetchone():
-        return
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS bible_verses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            translation TEXT NOT NULL,
-            book TEXT NOT NULL,
-            chapter INTEGER NOT NULL,
-            verse INTEGER NOT NULL,
-            text TEXT NOT NULL
-        )
-        """
-    )
-
-def get_schema_version(conn: sqlite3.Connection) -> int:
-    """Read the SQLite schema version from PRAGMA user_version."""
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA user_version")
-    row = cursor.fetchone()
-    return int(row[0]) if row else 0
-
-def set_schema_version(conn: sqlite3.Connection, version: int) -> None:
-    """Set the SQLite schema version via PRAGMA user_version."""
-    conn.execute(f"PRAGMA user_version = {int(version)}")
-
-def ensure_schema_version(conn: sqlite3.Connection) -> None:
-    """Ensure the current schema version is written to the database."""
-    current = get_schema_version(conn)
-    if current != SCHEMA_VERSION:
-        set_schema_version(conn, SCHEMA_VERSION)
+    return applied
 
 def get_schema_version_from_db() -> int:
     """Get the schema version from the on-disk database."""
@@ -283,6 +57,7 @@ def create_backup_archive_bytes(schema_version: int) -> bytes:
         raise FileNotFoundError("memcoach.db not found")
     if not CONFIG_PATH.exists():
         raise FileNotFoundError("config.toml not found")
+    checkpoint_wal()
     manifest = build_backup_manifest(schema_version)
     buffer = io.BytesIO()
     with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
@@ -298,6 +73,7 @@ def create_backup_archive_file(destination: Path, schema_version: int) -> None:
         raise FileNotFoundError("memcoach.db not found")
     if not CONFIG_PATH.exists():
         raise FileNotFoundError("config.toml not found")
+    checkpoint_wal()
     manifest = build_backup_manifest(schema_version)
     destination.parent.mkdir(parents=True, exist_ok=True)
     with zipfile.ZipFile(destination, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
@@ -324,18 +100,264 @@ def run_daily_backup() -> None:
     for old_backup in existing[BACKUP_KEEP:]:
         old_backup.unlink(missing_ok=True)
 
+def checkpoint_wal() -> None:
+    """Fold the WAL file back into memcoach.db so the file on disk is complete."""
+    if not DB_PATH.exists():
+        return
+    with get_conn() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def restore_database(source: Path) -> None:
+    """Copy a backup's database over memcoach.db with SQLite's backup API.
+
+    The pages are written under SQLite's own locks, so connections other
+    requests still hold read the restored data next instead of losing their
+    -wal/-shm files.
+    """
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    source_conn = sqlite3.connect(source)
+    try:
+        with get_conn() as conn:
+            source_conn.backup(conn)
+    finally:
+        source_conn.close()
+
+def _pool_settings() -> dict:
+    config = load_config()
+    return config.get("database", {})
+
+class ConnectionPool:
+    """Thread-safe pool of warm SQLite connections for a single database file."""
+
+    def __init__(self, path: Path, settings: dict):
+        self.path = Path(path)
+        self.settings = settings
+        self.max_size = max(1, int(settings.get("pool_size", 5)))
+        self.timeout = max(0.0, float(settings.get("pool_timeout", 10.0)))
+        self.instrumented = bool(settings.get("instrument_queries", True))
+        SQL_METRICS.configure(settings)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        settings = self.settings
+        busy_timeout = max(0, int(settings.get("busy_timeout", 5000)))
+        conn = sqlite3.connect(
+            self.path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            timeout=busy_timeout / 1000,
+            factory=InstrumentedConnection if self.instrumented else sqlite3.Connection,
+        )
+        conn.row_factory = sqlite3.Row
+        journal_mode = str(settings.get("journal_mode", "WAL")).upper()
+        if journal_mode not in JOURNAL_MODES:
+            journal_mode = "WAL"
+        synchronous = str(settings.get("synchronous", "NORMAL")).upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            synchronous = "NORMAL"
+        temp_store = str(settings.get("temp_store", "MEMORY")).upper()
+        if temp_store not in TEMP_STORE_MODES:
+            temp_store = "MEMORY"
+        conn.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+        conn.execute(f"PRAGMA cache_size = {int(settings.get('cache_size', -16000))}")
+        conn.execute(f"PRAGMA mmap_size = {max(0, int(settings.get('mmap_size', 0)))}")
+        conn.execute(f"PRAGMA temp_store = {temp_store}")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Borrow a connection, opening a new one while under pool_size."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        started = time.perf_counter()
+        waited = False
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+        if conn is None:
+            with self._lock:
+                can_create = self._created < self.max_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                waited = True
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise sqlite3.OperationalError(
+                        f"Timed out after {self.timeout:g}s waiting for a database connection"
+                    )
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+            if waited:
+                self._waits += 1
+                self._wait_total += elapsed
+                self._wait_max = max(self._wait_max, elapsed)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection, rolling back anything left uncommitted."""
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        if self._closed:
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+            self._discarded += 1
+
+    def close(self) -> None:
+        """Close idle connections; connections still in use close on release."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "max_size": self.max_size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_ms_total": round(self._wait_total * 1000, 3),
+                "wait_ms_avg": round(self._wait_total * 1000 / self._waits, 3) if self._waits else 0.0,
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+            }
+
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+def _clear_cached_rows() -> None:
+    """Forget deck metadata and review sessions read from the old database."""
+    DECK_CACHE.invalidate_all()
+    REVIEW_SESSIONS.invalidate_all()
+
+def get_pool() -> ConnectionPool:
+    """Return the pool for the current DB_PATH, rebuilding it if the path moved."""
+    global _POOL
+    pool = _POOL
+    if pool is not None and pool.path == Path(DB_PATH):
+        return pool
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.path != Path(DB_PATH):
+            if _POOL is not None:
+                _POOL.close()
+            _clear_cached_rows()
+            _POOL = ConnectionPool(DB_PATH, _pool_settings())
+        return _POOL
+
+def close_pool() -> None:
+    """Close all pooled connections (e.g. before swapping the database file)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.close()
+        _POOL = None
+        _clear_cached_rows()
+
+def get_pool_stats() -> dict:
+    """Pool size and wait-time counters for monitoring."""
+    pool = _POOL
+    if pool is None:
+        return {"path": str(DB_PATH), "max_size": 0, "open": 0, "in_use": 0, "idle": 0}
+    return pool.stats()
+
 @contextmanager
 def get_conn():
-    """Context manager for SQLite connection, using row_factory for dict-like rows."""
-    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+    """Context manager that borrows a pooled SQLite connection (rows are sqlite3.Row)."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+@contextmanager
+def get_background_conn():
+    """A dedicated connection, opened with the pool's settings, for background jobs.
+
+    Rollover, LLM confirmation and FSRS fits use this so they never hold one
+    of the pool_size connections that request handlers wait on.
+    """
+    conn = get_pool()._connect()
     try:
         yield conn
     finally:
         conn.close()
 
+@contextmanager
+def write_transaction(conn: sqlite3.Connection):
+    """Run the block as one write: BEGIN IMMEDIATE and commit, or roll back on error.
+
+    Inside a transaction the caller already opened, the block runs in a
+    SAVEPOINT instead; an error undoes only the block, and committing is
+    left to the caller.
+    """
+    if conn.in_transaction:
+        conn.execute("SAVEPOINT write_transaction")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK TO write_transaction")
+            conn.execute("RELEASE write_transaction")
+            raise
+        conn.execute("RELEASE write_transaction")
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
 def get_db():
-    """FastAPI dependency that yields a DB connection and closes it afterwards."""
+    """FastAPI dependency that yields a pooled DB connection and returns it afterwards."""
     with get_conn() as conn:
         yield conn
@@ -0,0 +1,242 @@
+"""SQL timing for pooled connections.
+
+The pool opens connections with InstrumentedConnection. Its cursors time
+every execute() and fetch*() call and report to two places:
+
+* the QueryStats bound to the current request (a ContextVar set by the HTTP
+  middleware in main.py; run_in_db_thread copies it into worker threads), and
+* SQL_METRICS, the process-wide aggregate behind /admin/metrics/sql.
+
+Statements that cross slow_query_ms get their EXPLAIN QUERY PLAN captured
+once, on the same connection and with the same parameters.
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+SLOW_STATEMENTS_PER_REQUEST = 5
+MAX_TRACKED_STATEMENTS = 500
+_WHITESPACE_RE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT", "REPLACE")
+
+
+def normalize_sql(sql: str) -> str:
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+@dataclass
+class StatementTiming:
+    sql: str
+    ms: float = 0.0
+    plan: Optional[List[str]] = None
+
+
+@dataclass
+class QueryStats:
+    """Statements issued while handling one request."""
+
+    count: int = 0
+    total_ms: float = 0.0
+    statements: List[StatementTiming] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_statement(self, timing: StatementTiming) -> None:
+        with self._lock:
+            self.count += 1
+            self.statements.append(timing)
+
+    def add_time(self, ms: float) -> None:
+        with self._lock:
+            self.total_ms += ms
+
+    def slowest(self, limit: int = SLOW_STATEMENTS_PER_REQUEST) -> List[StatementTiming]:
+        with self._lock:
+            return sorted(self.statements, key=lambda item: item.ms, reverse=True)[:limit]
+
+
+_request_stats: ContextVar[Optional[QueryStats]] = ContextVar("memcoach_query_stats", default=None)
+
+
+def begin_query_stats() -> Tuple[QueryStats, Token]:
+    stats = QueryStats()
+    return stats, _request_stats.set(stats)
+
+
+def end_query_stats(token: Token) -> None:
+    _request_stats.reset(token)
+
+
+class SqlMetrics:
+    """Process-wide per-statement and per-route SQL counters."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.slow_query_ms = 50.0
+        self.headers_enabled = False
+        self.reset()
+
+    def configure(self, settings: Dict[str, Any]) -> None:
+        self.slow_query_ms = max(0.0, float(settings.get("slow_query_ms", 50.0)))
+        self.headers_enabled = bool(settings.get("sql_headers", False))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements: Dict[str, Dict[str, Any]] = {}
+            self._routes: Dict[str, Dict[str, Any]] = {}
+            self._since = time.time()
+
+    def record_execute(self, sql: str) -> None:
+        with self._lock:
+            entry = self._statements.get(sql)
+            if entry is None:
+                if len(self._statements) >= MAX_TRACKED_STATEMENTS:
+                    return
+                entry = {"sql": sql, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "slow": 0, "plan": None}
+                self._statements[sql] = entry
+            entry["count"] += 1
+
+    def record_time(self, timing: StatementTiming, ms: float, became_slow: bool) -> None:
+        with self._lock:
+            entry = self._statements.get(timing.sql)
+            if entry is None:
+                return
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], timing.ms)
+            if became_slow:
+                entry["slow"] += 1
+            if timing.plan is not None:
+                entry["plan"] = timing.plan
+
+    def record_request(self, route: str, stats: QueryStats) -> None:
+        with self._lock:
+            entry = self._routes.setdefault(
+                route,
+                {"route": route, "requests": 0, "queries": 0, "sql_ms": 0.0, "max_queries": 0, "max_sql_ms": 0.0},
+            )
+            entry["requests"] += 1
+            entry["queries"] += stats.count
+            entry["sql_ms"] += stats.total_ms
+            entry["max_queries"] = max(entry["max_queries"], stats.count)
+            entry["max_sql_ms"] = max(entry["max_sql_ms"], stats.total_ms)
+
+    def snapshot(self, limit: int = 50) -> Dict[str, Any]:
+        with self._lock:
+            statements = [dict(entry) for entry in self._statements.values()]
+            routes = [dict(entry) for entry in self._routes.values()]
+            since = self._since
+        for entry in statements:
+            entry["avg_ms"] = entry["total_ms"] / entry["count"] if entry["count"] else 0.0
+        for entry in routes:
+            requests = entry["requests"] or 1
+            entry["avg_queries"] = entry["queries"] / requests
+            entry["avg_sql_ms"] = entry["sql_ms"] / requests
+        statements.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        routes.sort(key=lambda entry: entry["sql_ms"], reverse=True)
+        return {
+            "since": since,
+            "slow_query_ms": self.slow_query_ms,
+            "statements": statements[:limit],
+            "routes": routes,
+        }
+
+
+SQL_METRICS = SqlMetrics()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times execute() and fetch*() against the current statement."""
+
+    _timing: Optional[StatementTiming] = None
+    _params: Any = ()
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add(started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._add(started)
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(*args, **kwargs)
+        finally:
+            self._add(started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._add(started)
+
+    def _begin(self, sql: str, parameters: Any) -> None:
+        timing = StatementTiming(sql=normalize_sql(sql))
+        self._timing = timing
+        self._params = parameters
+        SQL_METRICS.record_execute(timing.sql)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.add_statement(timing)
+
+    def _add(self, started: float) -> None:
+        timing = self._timing
+        if timing is None:
+            return
+        ms = (time.perf_counter() - started) * 1000
+        was_slow = timing.ms > SQL_METRICS.slow_query_ms
+        timing.ms += ms
+        became_slow = not was_slow and timing.ms > SQL_METRICS.slow_query_ms
+        if became_slow and timing.plan is None and self._params is not None:
+            timing.plan = explain_query_plan(self.connection, timing.sql, self._params)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.add_time(ms)
+        SQL_METRICS.record_time(timing, ms, became_slow)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are timed."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def explain_query_plan(conn: sqlite3.Connection, sql: str, parameters: Any) -> Optional[List[str]]:
+    """EXPLAIN QUERY PLAN detail lines, or None for statements that can't be explained."""
+    if not sql.upper().startswith(_EXPLAINABLE):
+        return None
+    try:
+        cursor = sqlite3.Connection.cursor(conn)
+        rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    return [str(row[3]) for row in rows]
@@ -0,0 +1,627 @@
+"""Ordered schema migrations keyed on PRAGMA user_version.
+
+Each migration runs once, inside its own transaction, and bumps
+user_version when it commits. A database already at SCHEMA_VERSION is left
+untouched apart from reading user_version, so warm starts do no table scans.
+"""
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+from utils.days import sql_day_number
+from utils.durations import rebuild_durations
+from .schema import (
+    CARD_TAG_LIST_SQL,
+    CHUNK_COUNT_TRIGGERS_SQL,
+    DAILY_QUEUE_SQL,
+    DAILY_QUEUE_TRIGGERS_SQL,
+    DECK_DURATIONS_SQL,
+    DECK_TAG_LIST_SQL,
+    INDEXES_SQL,
+    SCHEDULER_PARAMS_SQL,
+    SCHEMA_SQL,
+    SCHEMA_VERSION,
+    TAG_LIST_TRIGGERS_SQL,
+)
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+@dataclass(frozen=True)
+class AppliedMigration:
+    version: int
+    name: str
+    seconds: float
+
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int, name: str):
+    """Register fn as the step that upgrades the schema to `version`."""
+    def register(fn: Callable[[sqlite3.Connection], None]):
+        MIGRATIONS.append(Migration(version=version, name=name, apply=fn))
+        MIGRATIONS.sort(key=lambda item: item.version)
+        return fn
+    return register
+
+def split_sql_script(script: str) -> List[str]:
+    """Split a multi-statement script so it can run inside one transaction.
+
+    executescript() commits before it runs, so migrations execute statement
+    by statement instead. Trigger bodies are kept whole.
+    """
+    statements: List[str] = []
+    buffer = ""
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statement = buffer.strip()
+            if statement:
+                statements.append(statement)
+            buffer = ""
+    return statements
+
+def execute_script(conn: sqlite3.Connection, script: str) -> None:
+    for statement in split_sql_script(script):
+        conn.execute(statement)
+
+def ensure_card_progress(conn: sqlite3.Connection) -> None:
+    """Ensure card_progress table exists; migration 20 backfills it from reviews."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='card_progress'"
+    )
+    if not cursor.fetchone():
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS card_progress (
+                kid_id INTEGER NOT NULL,
+                card_id INTEGER NOT NULL,
+                interval_days INTEGER NOT NULL DEFAULT 1,
+                due_date TEXT NOT NULL DEFAULT (date('now')),
+                ease_factor REAL NOT NULL DEFAULT 2.5,
+                streak INTEGER NOT NULL DEFAULT 0,
+                mastery_status TEXT NOT NULL DEFAULT 'new' CHECK(mastery_status IN ('new', 'learning', 'mastered')),
+                last_review_ts TEXT,
+                PRIMARY KEY (kid_id, card_id),
+                FOREIGN KEY (kid_id) REFERENCES kids (id) ON DELETE CASCADE,
+                FOREIGN KEY (card_id) REFERENCES cards (id) ON DELETE CASCADE
+            )
+            """
+        )
+
+def ensure_card_mastery_status(conn: sqlite3.Connection) -> None:
+    """Ensure cards table has mastery_status column for existing installs."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(cards)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "mastery_status" not in columns:
+        cursor.execute(
+            "ALTER TABLE cards ADD COLUMN mastery_status TEXT NOT NULL DEFAULT 'new'"
+        )
+
+def ensure_card_chunk_fields(conn: sqlite3.Connection) -> None:
+    """Ensure cards table has chunking columns for long texts."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(cards)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "text_id" not in columns:
+        cursor.execute("ALTER TABLE cards ADD COLUMN text_id INTEGER")
+    if "chunk_index" not in columns:
+        cursor.execute("ALTER TABLE cards ADD COLUMN chunk_index INTEGER")
+
+def ensure_soft_delete_columns(conn: sqlite3.Connection) -> None:
+    """Ensure tables have deleted_at columns for soft deletes."""
+    cursor = conn.cursor()
+    for table in ("kids", "decks", "cards", "texts"):
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = {row[1] for row in cursor.fetchall()}
+        if "deleted_at" not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN deleted_at TEXT")
+
+def ensure_card_position(conn: sqlite3.Connection) -> None:
+    """Ensure cards table has position column and initialize existing rows."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(cards)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "position" not in columns:
+        cursor.execute("ALTER TABLE cards ADD COLUMN position INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("UPDATE cards SET position = id WHERE position IS NULL OR position = 0")
+
+def ensure_cards_fts(conn: sqlite3.Connection) -> None:
+    """Ensure FTS table is populated for existing cards."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='cards_fts'")
+    if not cursor.fetchone():
+        return
+    # cards_fts is an external-content table, so COUNT(*) on it reads cards;
+    # the docsize shadow table holds one row per indexed card.
+    cursor.execute("SELECT COUNT(*) FROM cards_fts_docsize")
+    fts_count = cursor.fetchone()[0] or 0
+    cursor.execute("SELECT COUNT(*) FROM cards")
+    cards_count = cursor.fetchone()[0] or 0
+    if fts_count < cards_count:
+        cursor.execute("INSERT INTO cards_fts(cards_fts) VALUES('rebuild')")
+
+def ensure_review_duration(conn: sqlite3.Connection) -> None:
+    """Ensure reviews table has duration_seconds column."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(reviews)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "duration_seconds" not in columns:
+        cursor.execute("ALTER TABLE reviews ADD COLUMN duration_seconds INTEGER")
+
+def ensure_review_hint_mode(conn: sqlite3.Connection) -> None:
+    """Ensure reviews table has hint_mode column."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(reviews)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "hint_mode" not in columns:
+        cursor.execute(
+            "ALTER TABLE reviews ADD COLUMN hint_mode TEXT NOT NULL DEFAULT 'none'"
+        )
+
+def ensure_deck_review_mode(conn: sqlite3.Connection) -> None:
+    """Ensure decks table has review_mode column."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(decks)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "review_mode" not in columns:
+        cursor.execute(
+            "ALTER TABLE decks ADD COLUMN review_mode TEXT NOT NULL DEFAULT 'free_recall'"
+        )
+
+def ensure_review_review_mode(conn: sqlite3.Connection) -> None:
+    """Ensure reviews table has review_mode column."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(reviews)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "review_mode" not in columns:
+        cursor.execute(
+            "ALTER TABLE reviews ADD COLUMN review_mode TEXT NOT NULL DEFAULT 'free_recall'"
+        )
+
+def ensure_review_grading_fields(conn: sqlite3.Connection) -> None:
+    """Ensure reviews table has grading metadata columns."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(reviews)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "auto_grade" not in columns:
+        cursor.execute("ALTER TABLE reviews ADD COLUMN auto_grade TEXT")
+    if "final_grade" not in columns:
+        cursor.execute("ALTER TABLE reviews ADD COLUMN final_grade TEXT")
+    if "graded_by" not in columns:
+        cursor.execute("ALTER TABLE reviews ADD COLUMN graded_by TEXT NOT NULL DEFAULT 'auto'")
+
+def ensure_assignment_defaults(conn: sqlite3.Connection) -> None:
+    """Ensure default assignments exist for all kid/deck pairs."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO assignments (kid_id, deck_id)
+        SELECT k.id, d.id
+        FROM kids k
+        CROSS JOIN decks d
+        WHERE k.deleted_at IS NULL AND d.deleted_at IS NULL
+        """
+    )
+
+def ensure_deck_mastery_rules(conn: sqlite3.Connection) -> None:
+    """Ensure deck mastery rules table exists and defaults are seeded."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='deck_mastery_rules'"
+    )
+    if not cursor.fetchone():
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS deck_mastery_rules (
+                deck_id INTEGER PRIMARY KEY,
+                consecutive_grades INTEGER NOT NULL DEFAULT 3,
+                min_ease_factor REAL NOT NULL DEFAULT 2.5,
+                min_interval_days INTEGER NOT NULL DEFAULT 7,
+                FOREIGN KEY (deck_id) REFERENCES decks (id) ON DELETE CASCADE
+            )
+            """
+        )
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO deck_mastery_rules (deck_id)
+        SELECT id FROM decks WHERE deleted_at IS NULL
+        """
+    )
+
+def ensure_bible_verses_table(conn: sqlite3.Connection) -> None:
+    """Ensure bible_verses table exists for local scripture lookups."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='bible_verses'"
+    )
+    if cursor.fetchone():
+        return
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bible_verses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            translation TEXT NOT NULL,
+            book TEXT NOT NULL,
+            chapter INTEGER NOT NULL,
+            verse INTEGER NOT NULL,
+            text TEXT NOT NULL
+        )
+        """
+    )
+
+def ensure_due_day_columns(conn: sqlite3.Connection) -> None:
+    """Ensure cards and card_progress have the integer due_day column."""
+    cursor = conn.cursor()
+    for table in ("cards", "card_progress"):
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = {row[1] for row in cursor.fetchall()}
+        if "due_day" not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN due_day INTEGER")
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Read the SQLite schema version from PRAGMA user_version."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    row = cursor.fetchone()
+    return int(row[0]) if row else 0
+
+def set_schema_version(conn: sqlite3.Connection, version: int) -> None:
+    """Set the SQLite schema version via PRAGMA user_version."""
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+
+def run_migrations(conn: sqlite3.Connection) -> List[AppliedMigration]:
+    """Apply every registered migration newer than the database's user_version."""
+    current = get_schema_version(conn)
+    if current >= SCHEMA_VERSION:
+        if current > SCHEMA_VERSION:
+            logger.warning(
+                "Database schema version %s is newer than this app (%s); skipping migrations",
+                current,
+                SCHEMA_VERSION,
+            )
+        return []
+    applied: List[AppliedMigration] = []
+    for step in MIGRATIONS:
+        if step.version <= current:
+            continue
+        started = time.perf_counter()
+        conn.execute("BEGIN")
+        try:
+            step.apply(conn)
+            set_schema_version(conn, step.version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("Migration %s (%s) failed", step.version, step.name)
+            raise
+        elapsed = time.perf_counter() - started
+        logger.info("Applied migration %s (%s) in %.1f ms", step.version, step.name, elapsed * 1000)
+        applied.append(AppliedMigration(version=step.version, name=step.name, seconds=elapsed))
+        current = step.version
+    return applied
+
+@migration(9, "baseline schema")
+def migrate_baseline(conn: sqlite3.Connection) -> None:
+    """Create the v9 schema, or bring an older install up to it."""
+    execute_script(conn, SCHEMA_SQL)
+    ensure_card_mastery_status(conn)
+    ensure_card_chunk_fields(conn)
+    ensure_soft_delete_columns(conn)
+    # Index existing cards before the position backfill fires the cards_au trigger.
+    ensure_cards_fts(conn)
+    ensure_card_position(conn)
+    ensure_review_duration(conn)
+    ensure_review_hint_mode(conn)
+    ensure_deck_review_mode(conn)
+    ensure_review_review_mode(conn)
+    ensure_review_grading_fields(conn)
+    ensure_card_progress(conn)
+    ensure_assignment_defaults(conn)
+    ensure_deck_mastery_rules(conn)
+    ensure_bible_verses_table(conn)
+    execute_script(conn, INDEXES_SQL)
+
+@migration(10, "integer due days")
+def migrate_due_days(conn: sqlite3.Connection) -> None:
+    """Store due dates as indexed day numbers so due queues can range-scan."""
+    ensure_due_day_columns(conn)
+    # Only prompt/full_text feed the FTS index; don't rewrite it on other updates.
+    conn.execute("DROP TRIGGER IF EXISTS cards_au")
+    conn.execute(
+        """
+        CREATE TRIGGER cards_au AFTER UPDATE OF prompt, full_text ON cards BEGIN
+            INSERT INTO cards_fts(cards_fts, rowid, prompt, full_text)
+            VALUES ('delete', old.id, old.prompt, old.full_text);
+            INSERT INTO cards_fts(rowid, prompt, full_text)
+            VALUES (new.id, new.prompt, new.full_text);
+        END
+        """
+    )
+    conn.execute(f"UPDATE card_progress SET due_day = {sql_day_number('due_date')}")
+    conn.execute(f"UPDATE cards SET due_day = {sql_day_number('due_date')}")
+    conn.execute("DROP INDEX IF EXISTS idx_card_progress_kid_due")
+    conn.execute("DROP INDEX IF EXISTS idx_cards_due")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_card_progress_kid_due_day ON card_progress (kid_id, due_day)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cards_due_day ON cards (due_day)")
+
+@migration(11, "review day key")
+def migrate_review_day(conn: sqlite3.Connection) -> None:
+    """Key reviews by local day so "reviewed today" is an indexed lookup."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(reviews)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "review_day" not in columns:
+        cursor.execute("ALTER TABLE reviews ADD COLUMN review_day INTEGER")
+    # ts holds both datetime('now') (UTC, no offset) and UTC isoformat values;
+    # julianday() reads both as UTC before shifting to local time.
+    local_day = sql_day_number("ts", "'localtime'")
+    cursor.execute(f"UPDATE reviews SET review_day = {local_day} WHERE review_day IS NULL")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reviews_kid_day_card ON reviews (kid_id, review_day, card_id)"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_kid_ts ON reviews (kid_id, ts)")
+
+@migration(12, "cached tag lists")
+def migrate_tag_lists(conn: sqlite3.Connection) -> None:
+    """Cache each card's and deck's tag names so listings skip GROUP_CONCAT joins."""
+    cursor = conn.cursor()
+    for table in ("cards", "decks"):
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = {row[1] for row in cursor.fetchall()}
+        if "tag_list" not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN tag_list TEXT NOT NULL DEFAULT ''")
+    execute_script(conn, TAG_LIST_TRIGGERS_SQL)
+    cursor.execute(
+        f"UPDATE cards SET tag_list = {CARD_TAG_LIST_SQL.format(card_id='cards.id')} "
+        "WHERE id IN (SELECT card_id FROM card_tags)"
+    )
+    cursor.execute(
+        f"UPDATE decks SET tag_list = {DECK_TAG_LIST_SQL.format(deck_id='decks.id')} "
+        "WHERE id IN (SELECT deck_id FROM deck_tags)"
+    )
+
+@migration(13, "stored chunk counts")
+def migrate_chunk_counts(conn: sqlite3.Connection) -> None:
+    """Keep a live chunk count on texts for "Part N of M" labels."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(texts)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "chunk_count" not in columns:
+        cursor.execute("ALTER TABLE texts ADD COLUMN chunk_count INTEGER NOT NULL DEFAULT 0")
+    execute_script(conn, CHUNK_COUNT_TRIGGERS_SQL)
+    cursor.execute(
+        """
+        UPDATE texts SET chunk_count = (
+            SELECT COUNT(*) FROM cards c
+            WHERE c.text_id = texts.id AND c.deleted_at IS NULL
+        )
+        """
+    )
+
+@migration(14, "review client ids")
+def migrate_review_client_ids(conn: sqlite3.Connection) -> None:
+    """Let batch-synced reviews carry a client-generated id so retries are idempotent."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(reviews)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "client_id" not in columns:
+        cursor.execute("ALTER TABLE reviews ADD COLUMN client_id TEXT")
+    cursor.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_kid_client_id
+        ON reviews (kid_id, client_id) WHERE client_id IS NOT NULL
+        """
+    )
+
+@migration(15, "background llm grading status")
+def migrate_review_llm_status(conn: sqlite3.Connection) -> None:
+    """Track borderline reviews waiting on a background LLM confirmation."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(reviews)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "llm_status" not in columns:
+        cursor.execute(
+            """
+            ALTER TABLE reviews ADD COLUMN llm_status TEXT
+            CHECK(llm_status IN ('pending', 'confirmed', 'changed', 'failed', 'skipped'))
+            """
+        )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reviews_llm_pending ON reviews (id) WHERE llm_status = 'pending'"
+    )
+
+@migration(16, "materialized daily queue")
+def migrate_daily_queue(conn: sqlite3.Connection) -> None:
+    """Per-kid ranked today plans, rebuilt lazily when their marker is invalidated."""
+    execute_script(conn, DAILY_QUEUE_SQL)
+    execute_script(conn, DAILY_QUEUE_TRIGGERS_SQL)
+
+@migration(17, "review duration averages")
+def migrate_duration_averages(conn: sqlite3.Connection) -> None:
+    """Store per-card and per-deck duration averages instead of scanning reviews for estimates."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(card_progress)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "duration_ewma" not in columns:
+        cursor.execute("ALTER TABLE card_progress ADD COLUMN duration_ewma REAL")
+    execute_script(conn, DECK_DURATIONS_SQL)
+    rebuild_durations(conn)
+
+@migration(18, "review progress snapshots")
+def migrate_review_snapshots(conn: sqlite3.Connection) -> None:
+    """Store the SM-2 state after each review so replays can start from any review."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(reviews)")
+    columns = {row[1] for row in cursor.fetchall()}
+    for name, column_type in (
+        ("after_interval_days", "INTEGER"),
+        ("after_ease_factor", "REAL"),
+        ("after_streak", "INTEGER"),
+        ("after_due_date", "TEXT"),
+        ("after_mastery_status", "TEXT"),
+    ):
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE reviews ADD COLUMN {name} {column_type}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_kid_card_ts ON reviews (kid_id, card_id, ts)")
+
+@migration(19, "per-deck schedulers")
+def migrate_schedulers(conn: sqlite3.Connection) -> None:
+    """Let decks pick SM-2 or FSRS, and store FSRS memory state and per-kid weights."""
+    cursor = conn.cursor()
+    for table, name, column_type in (
+        ("decks", "scheduler", "TEXT NOT NULL DEFAULT 'sm2' CHECK(scheduler IN ('sm2', 'fsrs'))"),
+        ("card_progress", "stability", "REAL"),
+        ("card_progress", "difficulty", "REAL"),
+        ("reviews", "after_stability", "REAL"),
+        ("reviews", "after_difficulty", "REAL"),
+    ):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if name not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+    execute_script(conn, SCHEDULER_PARAMS_SQL)
+
+@migration(20, "card progress backfill")
+def migrate_card_progress_backfill(conn: sqlite3.Connection) -> None:
+    """Replay SM-2 over the review log for cards without progress and reviews without snapshots.
+
+    The replay is spelled out in SQL rather than calling utils.progress, so
+    this step keeps doing what it did when it shipped as the app's replay
+    code changes. Pairs on FSRS decks are left to the app's own replays.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TEMP TABLE backfill_reviews AS
+        SELECT r.id,
+               r.kid_id,
+               r.card_id,
+               c.deck_id,
+               ROW_NUMBER() OVER (PARTITION BY r.kid_id, r.card_id ORDER BY julianday(r.ts), r.id) AS n,
+               COUNT(*) OVER (PARTITION BY r.kid_id, r.card_id) AS reviews,
+               r.ts,
+               COALESCE(date(r.ts), date('now', 'localtime')) AS review_date,
+               CASE COALESCE(r.final_grade, r.grade) WHEN 'perfect' THEN 4 WHEN 'good' THEN 3 ELSE 0 END AS quality,
+               CAST(MIN(MAX(r.duration_seconds, 1), 600) AS REAL) AS duration
+        FROM reviews r
+        JOIN cards c ON c.id = r.card_id
+        JOIN decks d ON d.id = c.deck_id AND d.scheduler = 'sm2'
+        WHERE NOT EXISTS (
+            SELECT 1 FROM card_progress p WHERE p.kid_id = r.kid_id AND p.card_id = r.card_id
+        ) OR EXISTS (
+            SELECT 1 FROM reviews missing
+            WHERE missing.kid_id = r.kid_id AND missing.card_id = r.card_id AND missing.after_interval_days IS NULL
+        )
+        """
+    )
+    cursor.execute("CREATE INDEX backfill_reviews_step ON backfill_reviews (kid_id, card_id, n)")
+    # utils/sm2.py sm2_step; round() there rounds half to even.
+    scaled = "s.interval_days * s.ease_factor"
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE backfill_steps AS
+        WITH RECURSIVE steps (kid_id, card_id, n, interval_days, ease_factor, streak, duration_ewma) AS (
+            SELECT DISTINCT kid_id, card_id, 0, 1, 2.5, 0, NULL FROM backfill_reviews
+            UNION ALL
+            SELECT b.kid_id,
+                   b.card_id,
+                   b.n,
+                   CASE
+                       WHEN b.quality < 3 THEN 1
+                       WHEN s.interval_days = 1 THEN CASE WHEN b.quality >= 4 THEN 6 ELSE 1 END
+                       ELSE MAX(1, CAST({scaled} AS INTEGER) + CASE
+                           WHEN {scaled} - CAST({scaled} AS INTEGER) > 0.5 THEN 1
+                           WHEN {scaled} - CAST({scaled} AS INTEGER) = 0.5 THEN CAST({scaled} AS INTEGER) % 2
+                           ELSE 0
+                       END)
+                   END,
+                   MAX(1.3, s.ease_factor + (0.1 - (5 - b.quality) * (0.08 + (5 - b.quality) * 0.02))),
+                   CASE WHEN b.quality < 3 THEN 0 ELSE s.streak + 1 END,
+                   CASE
+                       WHEN b.duration IS NULL THEN s.duration_ewma
+                       ELSE COALESCE(s.duration_ewma + 0.3 * (b.duration - s.duration_ewma), b.duration)
+                   END
+            FROM steps s
+            JOIN backfill_reviews b ON b.kid_id = s.kid_id AND b.card_id = s.card_id AND b.n = s.n + 1
+        )
+        SELECT b.id,
+               b.kid_id,
+               b.card_id,
+               b.n = b.reviews AS is_last,
+               b.ts,
+               s.interval_days,
+               s.ease_factor,
+               s.streak,
+               s.duration_ewma,
+               date(b.review_date, '+' || s.interval_days || ' days') AS due_date,
+               CASE
+                   WHEN s.streak <= 0 THEN 'new'
+                   WHEN s.streak >= COALESCE(m.consecutive_grades, 3)
+                        AND s.ease_factor >= COALESCE(m.min_ease_factor, 2.5)
+                        AND s.interval_days >= COALESCE(m.min_interval_days, 7) THEN 'mastered'
+                   ELSE 'learning'
+               END AS mastery_status
+        FROM steps s
+        JOIN backfill_reviews b ON b.kid_id = s.kid_id AND b.card_id = s.card_id AND b.n = s.n
+        LEFT JOIN deck_mastery_rules m ON m.deck_id = b.deck_id
+        """
+    )
+    cursor.execute(
+        """
+        UPDATE reviews
+        SET after_interval_days = s.interval_days,
+            after_ease_factor = s.ease_factor,
+            after_streak = s.streak,
+            after_due_date = s.due_date,
+            after_mastery_status = s.mastery_status
+        FROM backfill_steps s
+        WHERE reviews.id = s.id AND reviews.after_interval_days IS NULL
+        """
+    )
+    cursor.execute(
+        f"""
+        INSERT OR IGNORE INTO card_progress (
+            kid_id, card_id, interval_days, due_date, due_day, ease_factor, streak,
+            mastery_status, last_review_ts, duration_ewma
+        )
+        SELECT kid_id, card_id, interval_days, due_date, {sql_day_number('due_date')}, ease_factor, streak,
+               mastery_status, ts, duration_ewma
+        FROM backfill_steps
+        WHERE is_last
+        """
+    )
+    cursor.execute("DROP TABLE backfill_steps")
+    cursor.execute("DROP TABLE backfill_reviews")
+
+@migration(21, "review due offsets")
+def migrate_review_due_offsets(conn: sqlite3.Connection) -> None:
+    """Store how many days load balancing moved each review's due date, so replays keep it."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(reviews)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "due_offset_days" not in columns:
+        cursor.execute("ALTER TABLE reviews ADD COLUMN due_offset_days INTEGER NOT NULL DEFAULT 0")
+
+@migration(22, "uniform review timestamps")
+def migrate_review_timestamps(conn: sqlite3.Connection) -> None:
+    """Rewrite ISO review timestamps in SQLite's datetime() format so ts orders and compares as text."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE reviews SET ts = datetime(ts) WHERE ts LIKE '____-__-__T%' AND datetime(ts) IS NOT NULL"
+    )
+    cursor.execute(
+        """
+        UPDATE card_progress SET last_review_ts = datetime(last_review_ts)
+        WHERE last_review_ts LIKE '____-__-__T%' AND datetime(last_review_ts) IS NOT NULL
+        """
+    )
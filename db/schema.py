@@ -1,6 +1,6 @@
 # SQL schema for MemCoach database
 
-SCHEMA_VERSION = 9
+SCHEMA_VERSION = 22
 
 SCHEMA_SQL = """
 -- Kids
@@ -15,6 +15,8 @@ CREATE TABLE IF NOT EXISTS decks (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT UNIQUE NOT NULL,
     review_mode TEXT NOT NULL DEFAULT 'free_recall' CHECK(review_mode IN ('free_recall', 'recitation', 'cloze', 'first_letters')),
+    scheduler TEXT NOT NULL DEFAULT 'sm2' CHECK(scheduler IN ('sm2', 'fsrs')),
+    tag_list TEXT NOT NULL DEFAULT '',
     deleted_at TEXT
 );
 
@@ -57,6 +59,7 @@ CREATE TABLE IF NOT EXISTS texts (
     full_text TEXT NOT NULL,
     chunk_strategy TEXT NOT NULL DEFAULT 'lines',
     delimiter TEXT,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
     created_at TEXT NOT NULL DEFAULT (datetime('now')),
     deleted_at TEXT,
     FOREIGN KEY (deck_id) REFERENCES decks (id) ON DELETE CASCADE
@@ -72,10 +75,12 @@ CREATE TABLE IF NOT EXISTS cards (
     chunk_index INTEGER,
     interval_days INTEGER NOT NULL DEFAULT 1,
     due_date TEXT NOT NULL DEFAULT (date('now')),
+    due_day INTEGER,
     ease_factor REAL NOT NULL DEFAULT 2.5,
     streak INTEGER NOT NULL DEFAULT 0,
     mastery_status TEXT NOT NULL DEFAULT 'new' CHECK(mastery_status IN ('new', 'learning', 'mastered')),
     position INTEGER NOT NULL DEFAULT 0,
+    tag_list TEXT NOT NULL DEFAULT '',
     deleted_at TEXT,
     FOREIGN KEY (deck_id) REFERENCES decks (id) ON DELETE CASCADE,
     FOREIGN KEY (text_id) REFERENCES texts (id) ON DELETE SET NULL
@@ -87,10 +92,15 @@ CREATE TABLE IF NOT EXISTS card_progress (
     card_id INTEGER NOT NULL,
     interval_days INTEGER NOT NULL DEFAULT 1,
     due_date TEXT NOT NULL DEFAULT (date('now')),
+    due_day INTEGER,
     ease_factor REAL NOT NULL DEFAULT 2.5,
     streak INTEGER NOT NULL DEFAULT 0,
     mastery_status TEXT NOT NULL DEFAULT 'new' CHECK(mastery_status IN ('new', 'learning', 'mastered')),
     last_review_ts TEXT,
+    duration_ewma REAL,
+    -- FSRS memory state (NULL on SM-2 decks)
+    stability REAL,
+    difficulty REAL,
     PRIMARY KEY (kid_id, card_id),
     FOREIGN KEY (kid_id) REFERENCES kids (id) ON DELETE CASCADE,
     FOREIGN KEY (card_id) REFERENCES cards (id) ON DELETE CASCADE
@@ -114,7 +124,7 @@ CREATE TRIGGER IF NOT EXISTS cards_ad AFTER DELETE ON cards BEGIN
     VALUES ('delete', old.id, old.prompt, old.full_text);
 END;
 
-CREATE TRIGGER IF NOT EXISTS cards_au AFTER UPDATE ON cards BEGIN
+CREATE TRIGGER IF NOT EXISTS cards_au AFTER UPDATE OF prompt, full_text ON cards BEGIN
     INSERT INTO cards_fts(cards_fts, rowid, prompt, full_text)
     VALUES ('delete', old.id, old.prompt, old.full_text);
     INSERT INTO cards_fts(rowid, prompt, full_text)
@@ -149,6 +159,7 @@ CREATE TABLE IF NOT EXISTS reviews (
     card_id INTEGER NOT NULL,
     kid_id INTEGER NOT NULL,
     ts TEXT NOT NULL DEFAULT (datetime('now')),
+    review_day INTEGER,
     grade TEXT NOT NULL CHECK(grade IN ('perfect', 'good', 'fail')),
     auto_grade TEXT CHECK(auto_grade IN ('perfect', 'good', 'fail')),
     final_grade TEXT CHECK(final_grade IN ('perfect', 'good', 'fail')),
@@ -157,6 +168,16 @@ CREATE TABLE IF NOT EXISTS reviews (
     hint_mode TEXT NOT NULL DEFAULT 'none',
     user_text TEXT,
     duration_seconds INTEGER,
+    client_id TEXT,
+    llm_status TEXT CHECK(llm_status IN ('pending', 'confirmed', 'changed', 'failed', 'skipped')),
+    -- Scheduler state right after this review
+    after_interval_days INTEGER,
+    after_ease_factor REAL,
+    after_streak INTEGER,
+    after_due_date TEXT,
+    after_mastery_status TEXT,
+    after_stability REAL,
+    after_difficulty REAL,
     FOREIGN KEY (card_id) REFERENCES cards (id) ON DELETE CASCADE,
     FOREIGN KEY (kid_id) REFERENCES kids (id) ON DELETE CASCADE
 );
@@ -174,8 +195,6 @@ CREATE TABLE IF NOT EXISTS bible_verses (
 
 # Indexes for performance
 INDEXES_SQL = """
-CREATE INDEX IF NOT EXISTS idx_cards_due ON cards (due_date);
-CREATE INDEX IF NOT EXISTS idx_card_progress_kid_due ON card_progress (kid_id, due_date);
 CREATE INDEX IF NOT EXISTS idx_card_progress_card ON card_progress (card_id);
 CREATE INDEX IF NOT EXISTS idx_cards_deck ON cards (deck_id);
 CREATE INDEX IF NOT EXISTS idx_cards_text ON cards (text_id, chunk_index);
@@ -199,3 +218,193 @@ CREATE INDEX IF NOT EXISTS idx_card_tags_tag ON card_tags (tag_id);
 CREATE INDEX IF NOT EXISTS idx_bible_verses_lookup ON bible_verses (translation, book, chapter, verse);
 CREATE INDEX IF NOT EXISTS idx_bible_verses_book ON bible_verses (book, chapter, verse);
 """
+
+# Comma-separated, name-ordered tag names cached on cards.tag_list / decks.tag_list
+CARD_TAG_LIST_SQL = """(
+    SELECT COALESCE(GROUP_CONCAT(name, ','), '') FROM (
+        SELECT t.name FROM card_tags ct JOIN tags t ON t.id = ct.tag_id
+        WHERE ct.card_id = {card_id} ORDER BY t.name
+    )
+)"""
+
+DECK_TAG_LIST_SQL = """(
+    SELECT COALESCE(GROUP_CONCAT(name, ','), '') FROM (
+        SELECT t.name FROM deck_tags dt JOIN tags t ON t.id = dt.tag_id
+        WHERE dt.deck_id = {deck_id} ORDER BY t.name
+    )
+)"""
+
+TAG_LIST_TRIGGERS_SQL = f"""
+CREATE TRIGGER IF NOT EXISTS card_tags_ai AFTER INSERT ON card_tags BEGIN
+    UPDATE cards SET tag_list = {CARD_TAG_LIST_SQL.format(card_id="new.card_id")} WHERE id = new.card_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS card_tags_ad AFTER DELETE ON card_tags BEGIN
+    UPDATE cards SET tag_list = {CARD_TAG_LIST_SQL.format(card_id="old.card_id")} WHERE id = old.card_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS card_tags_au AFTER UPDATE ON card_tags BEGIN
+    UPDATE cards SET tag_list = {CARD_TAG_LIST_SQL.format(card_id="cards.id")}
+    WHERE id IN (old.card_id, new.card_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS deck_tags_ai AFTER INSERT ON deck_tags BEGIN
+    UPDATE decks SET tag_list = {DECK_TAG_LIST_SQL.format(deck_id="new.deck_id")} WHERE id = new.deck_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS deck_tags_ad AFTER DELETE ON deck_tags BEGIN
+    UPDATE decks SET tag_list = {DECK_TAG_LIST_SQL.format(deck_id="old.deck_id")} WHERE id = old.deck_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS deck_tags_au AFTER UPDATE ON deck_tags BEGIN
+    UPDATE decks SET tag_list = {DECK_TAG_LIST_SQL.format(deck_id="decks.id")}
+    WHERE id IN (old.deck_id, new.deck_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tags_au AFTER UPDATE OF name ON tags BEGIN
+    UPDATE cards SET tag_list = {CARD_TAG_LIST_SQL.format(card_id="cards.id")}
+    WHERE id IN (SELECT card_id FROM card_tags WHERE tag_id = new.id);
+    UPDATE decks SET tag_list = {DECK_TAG_LIST_SQL.format(deck_id="decks.id")}
+    WHERE id IN (SELECT deck_id FROM deck_tags WHERE tag_id = new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tags_ad AFTER DELETE ON tags BEGIN
+    UPDATE cards SET tag_list = {CARD_TAG_LIST_SQL.format(card_id="cards.id")}
+    WHERE id IN (SELECT card_id FROM card_tags WHERE tag_id = old.id);
+    UPDATE decks SET tag_list = {DECK_TAG_LIST_SQL.format(deck_id="decks.id")}
+    WHERE id IN (SELECT deck_id FROM deck_tags WHERE tag_id = old.id);
+END;
+"""
+
+# texts.chunk_count: live (not soft-deleted) chunk cards per long text
+CHUNK_COUNT_TRIGGERS_SQL = """
+CREATE TRIGGER IF NOT EXISTS cards_chunk_ai AFTER INSERT ON cards
+WHEN new.text_id IS NOT NULL AND new.deleted_at IS NULL BEGIN
+    UPDATE texts SET chunk_count = chunk_count + 1 WHERE id = new.text_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_chunk_ad AFTER DELETE ON cards
+WHEN old.text_id IS NOT NULL AND old.deleted_at IS NULL BEGIN
+    UPDATE texts SET chunk_count = chunk_count - 1 WHERE id = old.text_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_chunk_au AFTER UPDATE OF text_id, deleted_at ON cards
+WHEN old.text_id IS NOT new.text_id OR (old.deleted_at IS NULL) != (new.deleted_at IS NULL) BEGIN
+    UPDATE texts SET chunk_count = chunk_count - 1
+    WHERE id = old.text_id AND old.deleted_at IS NULL;
+    UPDATE texts SET chunk_count = chunk_count + 1
+    WHERE id = new.text_id AND new.deleted_at IS NULL;
+END;
+"""
+
+# Materialized today queues: one ranked plan per kid for the current day. A
+# daily_queue_runs row marks a kid's plan as built; the triggers delete the
+# markers of affected kids when assignments, cards, decks, texts or progress
+# change in a way that could alter the plan, so the next read rebuilds it.
+DAILY_QUEUE_SQL = """
+CREATE TABLE IF NOT EXISTS daily_queue_runs (
+    kid_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    built_at TEXT NOT NULL DEFAULT (datetime('now')),
+    card_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kid_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS daily_queue (
+    kid_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    card_id INTEGER NOT NULL,
+    deck_id INTEGER NOT NULL,
+    bucket TEXT NOT NULL CHECK(bucket IN ('new', 'review')),
+    due_day INTEGER NOT NULL,
+    PRIMARY KEY (kid_id, day, rank)
+) WITHOUT ROWID;
+"""
+
+DECK_QUEUE_KIDS_SQL = "(SELECT kid_id FROM assignments WHERE deck_id = {deck_id})"
+
+DAILY_QUEUE_TRIGGERS_SQL = f"""
+CREATE TRIGGER IF NOT EXISTS assignments_queue_ai AFTER INSERT ON assignments BEGIN
+    DELETE FROM daily_queue_runs WHERE kid_id = new.kid_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS assignments_queue_au AFTER UPDATE ON assignments BEGIN
+    DELETE FROM daily_queue_runs WHERE kid_id IN (old.kid_id, new.kid_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS assignments_queue_ad AFTER DELETE ON assignments BEGIN
+    DELETE FROM daily_queue_runs WHERE kid_id = old.kid_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS kids_queue_au AFTER UPDATE OF deleted_at ON kids BEGIN
+    DELETE FROM daily_queue_runs WHERE kid_id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS decks_queue_au AFTER UPDATE OF name, review_mode, deleted_at ON decks BEGIN
+    DELETE FROM daily_queue_runs WHERE kid_id IN {DECK_QUEUE_KIDS_SQL.format(deck_id="new.id")};
+END;
+
+CREATE TRIGGER IF NOT EXISTS texts_queue_au AFTER UPDATE OF deleted_at ON texts BEGIN
+    DELETE FROM daily_queue_runs WHERE kid_id IN {DECK_QUEUE_KIDS_SQL.format(deck_id="new.deck_id")};
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_queue_ai AFTER INSERT ON cards BEGIN
+    DELETE FROM daily_queue_runs WHERE kid_id IN {DECK_QUEUE_KIDS_SQL.format(deck_id="new.deck_id")};
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_queue_ad AFTER DELETE ON cards BEGIN
+    DELETE FROM daily_queue_runs WHERE kid_id IN {DECK_QUEUE_KIDS_SQL.format(deck_id="old.deck_id")};
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_queue_au AFTER UPDATE OF deck_id, text_id, deleted_at ON cards BEGIN
+    DELETE FROM daily_queue_runs
+    WHERE kid_id IN (SELECT kid_id FROM assignments WHERE deck_id IN (old.deck_id, new.deck_id));
+END;
+
+-- Progress written by today's own review doesn't matter: reviewed cards are
+-- filtered out when the plan is read. Anything else that moves a card across
+-- the plan's day (offline sync of older reviews, resets) invalidates it.
+CREATE TRIGGER IF NOT EXISTS card_progress_queue_ai AFTER INSERT ON card_progress BEGIN
+    DELETE FROM daily_queue_runs
+    WHERE kid_id = new.kid_id AND NOT EXISTS (
+        SELECT 1 FROM reviews r
+        WHERE r.kid_id = new.kid_id AND r.review_day = daily_queue_runs.day AND r.card_id = new.card_id
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS card_progress_queue_au AFTER UPDATE OF due_day, mastery_status ON card_progress
+WHEN old.due_day IS NOT new.due_day OR old.mastery_status IS NOT new.mastery_status BEGIN
+    DELETE FROM daily_queue_runs
+    WHERE kid_id = new.kid_id AND NOT EXISTS (
+        SELECT 1 FROM reviews r
+        WHERE r.kid_id = new.kid_id AND r.review_day = daily_queue_runs.day AND r.card_id = new.card_id
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS card_progress_queue_ad AFTER DELETE ON card_progress BEGIN
+    DELETE FROM daily_queue_runs WHERE kid_id = old.kid_id;
+END;
+"""
+
+# Per-kid, per-deck review duration average (utils.durations)
+DECK_DURATIONS_SQL = """
+CREATE TABLE IF NOT EXISTS deck_durations (
+    kid_id INTEGER NOT NULL,
+    deck_id INTEGER NOT NULL,
+    duration_ewma REAL NOT NULL,
+    samples INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kid_id, deck_id)
+);
+"""
+
+SCHEDULER_PARAMS_SQL = """
+CREATE TABLE IF NOT EXISTS scheduler_params (
+    kid_id INTEGER PRIMARY KEY,
+    weights TEXT NOT NULL,
+    reviews INTEGER NOT NULL DEFAULT 0,
+    log_loss REAL,
+    fitted_at TEXT,
+    FOREIGN KEY (kid_id) REFERENCES kids (id) ON DELETE CASCADE
+);
+"""
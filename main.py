@@ -1,4 +1,6 @@
 import argparse
+import asyncio
+import contextlib
 import uvicorn
 from fastapi import FastAPI, Request, Depends
 from fastapi.staticfiles import StaticFiles
@@ -6,17 +8,25 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from contextlib import asynccontextmanager
 
+import os
 import sys
+import time
 from pathlib import Path
 
 # Add project root to path for package imports
 base_dir = Path(__file__).parent
 sys.path.insert(0, str(base_dir))
 
-from db.database import init_db, get_db
+from db.database import init_db, get_db, get_conn, close_pool
+from db.async_db import AsyncDatabase, get_async_db, shutdown_db_executor
+from db.instrumentation import SQL_METRICS, begin_query_stats, end_query_stats
 from config import load_config, CONFIG_DIR
-from routes import kids, decks, cards, review, stats, plan, backups, trash, search, parent, kid_mode, today, reports, stt, bible  # Import routers
+from routes import kids, decks, cards, review, stats, plan, backups, trash, search, parent, kid_mode, today, reports, stt, bible, metrics  # Import routers
 from utils.auth import is_parent_unlocked, get_parent_pin_hash
+from utils.fsrs_jobs import FSRS_FITS, evaluate_schedulers
+from utils.llm_jobs import LLM_JOBS
+from utils.mastery import reevaluate_deck_mastery
+from utils.progress import rebuild_card_progress
 
 templates = Jinja2Templates(directory=str(base_dir / "templates"))
 app = FastAPI(title="MemCoach", description="Local-first memorization app for kids")
@@ -33,6 +43,7 @@ app.include_router(stats.router, prefix="/stats", tags=["stats"])
 app.include_router(reports.router, prefix="/reports", tags=["reports"])
 app.include_router(plan.router, prefix="/plan", tags=["plan"])
 app.include_router(backups.router, prefix="/admin", tags=["admin"])
+app.include_router(metrics.router, prefix="/admin", tags=["admin"])
 app.include_router(trash.router, prefix="/trash", tags=["trash"])
 app.include_router(search.router, tags=["search"])
 app.include_router(parent.router, prefix="/parent", tags=["parent"])
@@ -47,16 +58,33 @@ async def parent_session_middleware(request: Request, call_next):
     response = await call_next(request)
     return response
 
+@app.middleware("http")
+async def sql_metrics_middleware(request: Request, call_next):
+    stats, token = begin_query_stats()
+    try:
+        response = await call_next(request)
+    finally:
+        end_query_stats(token)
+    route = request.scope.get("route")
+    SQL_METRICS.record_request(f"{request.method} {getattr(route, 'path', request.url.path)}", stats)
+    if SQL_METRICS.headers_enabled:
+        response.headers["X-SQL-Queries"] = str(stats.count)
+        response.headers["X-SQL-Time-Ms"] = f"{stats.total_ms:.2f}"
+        slowest = stats.slowest(1)
+        if slowest:
+            response.headers["X-SQL-Slowest-Ms"] = f"{slowest[0].ms:.2f}"
+        response.headers["Server-Timing"] = f'sql;dur={stats.total_ms:.2f};desc="{stats.count} queries"'
+    return response
+
 # Dependency for DB connection
 def get_db_conn():
     yield from get_db()
 
 # Home page - list kids
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request, conn = Depends(get_db_conn)):
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM kids WHERE deleted_at IS NULL ORDER BY name")
-    kids_list = [dict(row) for row in cursor.fetchall()]
+async def home(request: Request, db: AsyncDatabase = Depends(get_async_db)):
+    rows = await db.fetchall("SELECT id, name FROM kids WHERE deleted_at IS NULL ORDER BY name")
+    kids_list = [dict(row) for row in rows]
     return templates.TemplateResponse("index.html", {"request": request, "kids": kids_list})
 
 # First-run init
@@ -65,8 +93,21 @@ async def lifespan(app: FastAPI):
     # Startup: init DB and config
     load_config()  # Ensures config exists
     init_db()
+    # Borderline grades left pending by the last shutdown get their LLM check now
+    with get_conn() as conn:
+        LLM_JOBS.resume_pending(conn)
+    # Kids on FSRS decks get their weights (re)fitted in the background, then daily
+    FSRS_FITS.start()
+    rollover = asyncio.create_task(today.daily_queue_rollover())
     yield
-    # Shutdown if needed
+    rollover.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await rollover
+    # Shutdown: finish the LLM job in progress, drain DB workers, then close pooled connections so the WAL is checkpointed
+    LLM_JOBS.stop()
+    FSRS_FITS.stop()
+    shutdown_db_executor()
+    close_pool()
 
 app.router.lifespan_context = lifespan  # For auto init on start
 
@@ -74,13 +115,67 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="MemCoach App")
     parser.add_argument("--init", action="store_true", help="Initialize DB and config")
     parser.add_argument("--dev", action="store_true", help="Run in dev mode with reload")
+    parser.add_argument(
+        "--rebuild-progress",
+        action="store_true",
+        help="Recompute every kid's card progress from the review log",
+    )
+    parser.add_argument(
+        "--reevaluate-mastery",
+        action="store_true",
+        help="Re-check every card's mastery status against its deck's current rules",
+    )
+    parser.add_argument(
+        "--evaluate-schedulers",
+        action="store_true",
+        help="Compare SM-2 and FSRS on each kid's most recent reviews",
+    )
     args = parser.parse_args()
+    if args.rebuild_progress:
+        load_config()
+        init_db()
+        started = time.perf_counter()
+        with get_conn() as conn:
+            written = rebuild_card_progress(conn)
+            conn.commit()
+        print(f"Rebuilt {written} progress rows in {time.perf_counter() - started:.2f} s")
+        exit(0)
+    if args.reevaluate_mastery:
+        load_config()
+        init_db()
+        with get_conn() as conn:
+            deck_ids = [row[0] for row in conn.execute("SELECT id FROM decks WHERE deleted_at IS NULL ORDER BY id")]
+            changed = sum(reevaluate_deck_mastery(conn, deck_id) for deck_id in deck_ids)
+            conn.commit()
+        print(f"Re-evaluated {len(deck_ids)} decks; {changed} mastery statuses changed")
+        exit(0)
+    if args.evaluate_schedulers:
+        load_config()
+        init_db()
+        with get_conn() as conn:
+            results = evaluate_schedulers(conn)
+        print("Log-loss on each kid's newest 20% of reviews (lower is better).")
+        print("Reviews/day at current intervals; FSRS aims for the recall SM-2 achieved.")
+        print(f"{'kid':>5} {'test':>7} {'sm2':>7} {'fsrs':>7} {'fitted':>7} {'recall':>7} {'sm2/d':>8} {'fsrs/d':>8}")
+        for row in results:
+            print(
+                f"{row.kid_id:>5} {row.test_reviews:>7} {row.sm2_log_loss:>7.4f} {row.fsrs_default_log_loss:>7.4f} "
+                f"{row.fsrs_fitted_log_loss:>7.4f} {row.observed_retention:>7.1%} "
+                f"{row.sm2_reviews_per_day:>8.1f} {row.fsrs_reviews_per_day:>8.1f}"
+            )
+        if not results:
+            print("No kid has enough reviews to evaluate yet")
+        exit(0)
     if args.init:
         load_config()  # Ensures config is copied if missing
-        init_db()
+        applied = init_db()
+        for step in applied:
+            print(f"Applied migration {step.version} ({step.name}) in {step.seconds * 1000:.1f} ms")
         print("DB initialized and config copied to ~/.memcoach/")
         exit(0)
     # Run server
     port = 8000
     reload = args.dev
+    if args.dev:
+        os.environ.setdefault("DB_SQL_HEADERS", "true")
     uvicorn.run("main:app", host="127.0.0.1", port=port, reload=reload, log_level="info")
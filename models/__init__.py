@@ -1,6 +1,7 @@
 from .kid import Kid, KidCreate
 from .deck import Deck, DeckCreate
 from .card import Card, CardCreate
-from .review import Review, ReviewCreate, Grade
+from .review import Review, ReviewCreate, Grade, ReviewBatch, ReviewBatchItem, ReviewBatchResponse, ReviewBatchResult, ReviewBatchStatus
 
-__all__ = ['Kid', 'KidCreate', 'Deck', 'DeckCreate', 'Card', 'CardCreate', 'Review', 'ReviewCreate', 'Grade']
+__all__ = ['Kid', 'KidCreate', 'Deck', 'DeckCreate', 'Card', 'CardCreate', 'Review', 'ReviewCreate', 'Grade',
+           'ReviewBatch', 'ReviewBatchItem', 'ReviewBatchResponse', 'ReviewBatchResult', 'ReviewBatchStatus']
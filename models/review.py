@@ -1,5 +1,6 @@
-from pydantic import BaseModel, validator
-from typing import Optional
+from pydantic import BaseModel, Field, validator
+from typing import List, Optional
+from datetime import datetime
 from enum import Enum
 
 class Grade(str, Enum):
@@ -25,3 +26,38 @@ class Review(ReviewCreate):
 
     class Config:
         from_attributes = True
+
+MAX_BATCH_REVIEWS = 500
+
+class ReviewBatchItem(BaseModel):
+    """One review answered on a device, possibly while offline."""
+
+    client_id: str = Field(..., min_length=1, max_length=64)
+    card_id: int
+    reviewed_at: datetime
+    user_text: str = ""
+    hint_mode: str = "none"
+    parent_grade: Optional[int] = Field(None, ge=0, le=5)
+    duration_seconds: Optional[int] = Field(None, ge=0)
+
+class ReviewBatch(BaseModel):
+    kid_id: int
+    reviews: List[ReviewBatchItem] = Field(..., max_length=MAX_BATCH_REVIEWS)
+
+class ReviewBatchStatus(str, Enum):
+    RECORDED = "recorded"
+    DUPLICATE = "duplicate"
+    REJECTED = "rejected"
+
+class ReviewBatchResult(BaseModel):
+    client_id: str
+    status: ReviewBatchStatus
+    review_id: Optional[int] = None
+    grade: Optional[Grade] = None
+    detail: Optional[str] = None
+
+class ReviewBatchResponse(BaseModel):
+    recorded: int
+    duplicates: int
+    rejected: int
+    results: List[ReviewBatchResult]
@@ -9,6 +9,7 @@ from .backups import router as backups_router
 from .today import router as today_router
 from .reports import router as reports_router
 from .stt import router as stt_router
+from .metrics import router as metrics_router
 
 __all__ = [
     'kids_router',
@@ -21,4 +22,5 @@ __all__ = [
     'today_router',
     'reports_router',
     'stt_router',
+    'metrics_router',
 ]
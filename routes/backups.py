@@ -16,9 +16,12 @@ from db.database import (
     create_backup_archive_bytes,
     create_backup_archive_file,
     get_schema_version_from_db,
+    restore_database,
 )
 from db.schema import SCHEMA_VERSION
 from utils.auth import require_parent_session
+from utils.deck_cache import DECK_CACHE
+from utils.review_sessions import REVIEW_SESSIONS
 
 router = APIRouter(dependencies=[Depends(require_parent_session)])
 base_dir = Path(__file__).resolve().parent.parent
@@ -73,8 +76,11 @@ async def restore_backup(file: UploadFile = File(...)):
                 if not temp_db.exists() or not temp_config.exists():
                     raise HTTPException(status_code=400, detail="Backup payload invalid")
                 CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-                temp_db.replace(DB_PATH)
+                REVIEW_SESSIONS.invalidate_all()
+                restore_database(temp_db)
                 temp_config.replace(CONFIG_PATH)
+                # After the swap, so a deck read while it ran is not kept.
+                DECK_CACHE.invalidate_all()
     except zipfile.BadZipFile as exc:
         raise HTTPException(status_code=400, detail="Invalid zip archive") from exc
     return RedirectResponse(url="/admin/backup/manage", status_code=status.HTTP_303_SEE_OTHER)
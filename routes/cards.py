@@ -8,8 +8,10 @@ import sqlite3
 import json
 from typing import Optional, List, Dict, Any
 import re
+from datetime import date
 from utils.auth import require_parent_session
 from utils.bible import get_translation_index
+from utils.review_sessions import REVIEW_SESSIONS
 from utils.tags import parse_tag_names, set_card_tags
 
 router = APIRouter(dependencies=[Depends(require_parent_session)])
@@ -57,12 +59,9 @@ def get_cards_for_deck(cursor, deck_id: int, kid_id: Optional[int] = None) -> Li
                 c.streak,
                 c.due_date,
                 c.position,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE c.deck_id = ? AND c.deleted_at IS NULL
-            GROUP BY c.id
             ORDER BY c.position, c.id
             """,
             (deck_id,),
@@ -77,13 +76,10 @@ def get_cards_for_deck(cursor, deck_id: int, kid_id: Optional[int] = None) -> Li
                 COALESCE(cp.streak, c.streak) AS streak,
                 COALESCE(cp.due_date, c.due_date) AS due_date,
                 c.position,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
             LEFT JOIN card_progress cp ON cp.card_id = c.id AND cp.kid_id = ?
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE c.deck_id = ? AND c.deleted_at IS NULL
-            GROUP BY c.id
             ORDER BY c.position, c.id
             """,
             (kid_id, deck_id),
@@ -125,7 +121,7 @@ def split_long_text(text: str, strategy: str, delimiter: Optional[str]) -> List[
     return [part.strip() for part in parts if part.strip()]
 
 @router.get("/{deck_id}/add", response_class=HTMLResponse)
-async def add_card_form(deck_id: int, request: Request, kid_id: Optional[int] = None, conn = Depends(get_db)):
+def add_card_form(deck_id: int, request: Request, kid_id: Optional[int] = None, conn = Depends(get_db)):
     """Form to add card manually or upload txt file to deck."""
     cursor = conn.cursor()
     cursor.execute("SELECT id, name FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
@@ -164,6 +160,7 @@ async def add_cards(
 ):
     """Add single manual card, long text chunks, catechism Q&A, or multiple from uploaded TXT file."""
     cursor = conn.cursor()
+    today = date.today()
     added = 0
     try:
         cursor.execute("SELECT id FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
@@ -207,9 +204,9 @@ async def add_cards(
                 p_text = f"{cat['name']} Q{q['number']}: {q['question']}"
                 f_text = q['answer']
                 cursor.execute("""
-                    INSERT INTO cards (deck_id, prompt, full_text, interval_days, due_date, ease_factor, streak, mastery_status, position)
-                    VALUES (?, ?, ?, 1, date('now'), 2.5, 0, 'new', ?)
-                """, (deck_id, p_text, f_text, start_position + i))
+                    INSERT INTO cards (deck_id, prompt, full_text, interval_days, due_date, due_day, ease_factor, streak, mastery_status, position)
+                    VALUES (?, ?, ?, 1, ?, ?, 2.5, 0, 'new', ?)
+                """, (deck_id, p_text, f_text, today.isoformat(), today.toordinal(), start_position + i))
             added = len(selected)
 
         elif card_mode == "long":
@@ -234,10 +231,10 @@ async def add_cards(
                 prompt_text = f"{long_text_title.strip()} (Part {index})"
                 cursor.execute(
                     """
-                    INSERT INTO cards (deck_id, prompt, full_text, text_id, chunk_index, interval_days, due_date, ease_factor, streak, mastery_status, position)
-                    VALUES (?, ?, ?, ?, ?, 1, date('now'), 2.5, 0, 'new', ?)
+                    INSERT INTO cards (deck_id, prompt, full_text, text_id, chunk_index, interval_days, due_date, due_day, ease_factor, streak, mastery_status, position)
+                    VALUES (?, ?, ?, ?, ?, 1, ?, ?, 2.5, 0, 'new', ?)
                     """,
-                    (deck_id, prompt_text, chunk, text_id, index, start_position + index - 1),
+                    (deck_id, prompt_text, chunk, text_id, index, today.isoformat(), today.toordinal(), start_position + index - 1),
                 )
             added = len(chunks)
         elif card_mode == "file":
@@ -256,9 +253,9 @@ async def add_cards(
                 p = f"{prompt_base_clean} {i}".strip() if len(blocks) > 1 else prompt_base_clean
                 f_text = block
                 cursor.execute("""
-                    INSERT INTO cards (deck_id, prompt, full_text, interval_days, due_date, ease_factor, streak, mastery_status, position)
-                    VALUES (?, ?, ?, 1, date('now'), 2.5, 0, 'new', ?)
-                """, (deck_id, p, f_text, start_position + i - 1))
+                    INSERT INTO cards (deck_id, prompt, full_text, interval_days, due_date, due_day, ease_factor, streak, mastery_status, position)
+                    VALUES (?, ?, ?, 1, ?, ?, 2.5, 0, 'new', ?)
+                """, (deck_id, p, f_text, today.isoformat(), today.toordinal(), start_position + i - 1))
                 added += 1
         elif card_mode == "manual":
             if not prompt or not full_text:
@@ -266,16 +263,17 @@ async def add_cards(
             position = get_next_card_position(cursor, deck_id)
             cursor.execute(
                 """
-                INSERT INTO cards (deck_id, prompt, full_text, interval_days, due_date, ease_factor, streak, mastery_status, position)
-                VALUES (?, ?, ?, 1, date('now'), 2.5, 0, 'new', ?)
+                INSERT INTO cards (deck_id, prompt, full_text, interval_days, due_date, due_day, ease_factor, streak, mastery_status, position)
+                VALUES (?, ?, ?, 1, ?, ?, 2.5, 0, 'new', ?)
                 """,
-                (deck_id, prompt, full_text, position),
+                (deck_id, prompt, full_text, today.isoformat(), today.toordinal(), position),
             )
             added = 1
         else:
              raise HTTPException(status_code=400, detail="Invalid card mode")
 
         conn.commit()
+        REVIEW_SESSIONS.invalidate_deck(deck_id)
         redirect_target = f"/kids/{kid_id}/decks" if kid_id else "/decks"
         return RedirectResponse(url=redirect_target, status_code=status.HTTP_303_SEE_OTHER)
     except HTTPException:
@@ -284,7 +282,7 @@ async def add_cards(
         raise HTTPException(status_code=500, detail=f"Failed to add cards: {str(e)}")
 
 @router.get("/{deck_id}/cards/{card_id}/row", response_class=HTMLResponse)
-async def card_row(
+def card_row(
     deck_id: int,
     card_id: int,
     request: Request,
@@ -302,13 +300,10 @@ async def card_row(
                 COALESCE(cp.streak, c.streak) AS streak,
                 COALESCE(cp.due_date, c.due_date) AS due_date,
                 c.position,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
             LEFT JOIN card_progress cp ON cp.card_id = c.id AND cp.kid_id = ?
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE c.id = ? AND c.deck_id = ? AND c.deleted_at IS NULL
-            GROUP BY c.id
             """,
             (kid_id, card_id, deck_id),
         )
@@ -322,12 +317,9 @@ async def card_row(
                 c.streak,
                 c.due_date,
                 c.position,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE c.id = ? AND c.deck_id = ? AND c.deleted_at IS NULL
-            GROUP BY c.id
             """,
             (card_id, deck_id),
         )
@@ -347,7 +339,7 @@ async def card_row(
     )
 
 @router.post("/{deck_id}/cards/{card_id}/tags", response_class=HTMLResponse)
-async def update_card_tags(
+def update_card_tags(
     deck_id: int,
     card_id: int,
     request: Request,
@@ -365,6 +357,7 @@ async def update_card_tags(
     tag_names = parse_tag_names(tags)
     set_card_tags(conn, card_id, tag_names)
     conn.commit()
+    REVIEW_SESSIONS.invalidate_deck(deck_id)
     if kid_id is not None:
         cursor.execute(
             """
@@ -375,13 +368,10 @@ async def update_card_tags(
                 COALESCE(cp.streak, c.streak) AS streak,
                 COALESCE(cp.due_date, c.due_date) AS due_date,
                 c.position,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
             LEFT JOIN card_progress cp ON cp.card_id = c.id AND cp.kid_id = ?
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE c.id = ? AND c.deck_id = ? AND c.deleted_at IS NULL
-            GROUP BY c.id
             """,
             (kid_id, card_id, deck_id),
         )
@@ -395,12 +385,9 @@ async def update_card_tags(
                 c.streak,
                 c.due_date,
                 c.position,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE c.id = ? AND c.deck_id = ? AND c.deleted_at IS NULL
-            GROUP BY c.id
             """,
             (card_id, deck_id),
         )
@@ -420,7 +407,7 @@ async def update_card_tags(
     )
 
 @router.get("/{deck_id}/cards/{card_id}/edit", response_class=HTMLResponse)
-async def edit_card_form(
+def edit_card_form(
     deck_id: int,
     card_id: int,
     request: Request,
@@ -441,7 +428,7 @@ async def edit_card_form(
     )
 
 @router.post("/{deck_id}/cards/{card_id}/edit", response_class=HTMLResponse)
-async def edit_card(
+def edit_card(
     deck_id: int,
     card_id: int,
     request: Request,
@@ -466,6 +453,7 @@ async def edit_card(
     if cursor.rowcount == 0:
         raise HTTPException(status_code=404, detail="Card not found")
     conn.commit()
+    REVIEW_SESSIONS.invalidate_deck(deck_id)
     if kid_id is not None:
         cursor.execute(
             """
@@ -476,13 +464,10 @@ async def edit_card(
                 COALESCE(cp.streak, c.streak) AS streak,
                 COALESCE(cp.due_date, c.due_date) AS due_date,
                 c.position,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
             LEFT JOIN card_progress cp ON cp.card_id = c.id AND cp.kid_id = ?
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE c.id = ? AND c.deck_id = ? AND c.deleted_at IS NULL
-            GROUP BY c.id
             """,
             (kid_id, card_id, deck_id),
         )
@@ -496,12 +481,9 @@ async def edit_card(
                 c.streak,
                 c.due_date,
                 c.position,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE c.id = ? AND c.deck_id = ? AND c.deleted_at IS NULL
-            GROUP BY c.id
             """,
             (card_id, deck_id),
         )
@@ -519,7 +501,7 @@ async def edit_card(
     )
 
 @router.post("/{deck_id}/cards/{card_id}/delete", response_class=HTMLResponse)
-async def delete_card(deck_id: int, card_id: int, conn = Depends(get_db)):
+def delete_card(deck_id: int, card_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute(
         "UPDATE cards SET deleted_at = datetime('now') WHERE id = ? AND deck_id = ? AND deleted_at IS NULL",
@@ -528,10 +510,11 @@ async def delete_card(deck_id: int, card_id: int, conn = Depends(get_db)):
     if cursor.rowcount == 0:
         raise HTTPException(status_code=404, detail="Card not found")
     conn.commit()
+    REVIEW_SESSIONS.invalidate_deck(deck_id)
     return HTMLResponse("")
 
 @router.post("/{deck_id}/cards/{card_id}/move", response_class=HTMLResponse)
-async def move_card(
+def move_card(
     deck_id: int,
     card_id: int,
     request: Request,
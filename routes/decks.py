@@ -5,8 +5,13 @@ from pathlib import Path
 from db.database import get_db
 from models.deck import DeckCreate
 import sqlite3
-from utils.mastery import mastery_percent
+from utils.mastery import get_deck_mastery_rules, mastery_percent, reevaluate_deck_mastery
+from utils.progress import replay_deck_progress
 from utils.auth import require_parent_session
+from utils.fsrs_jobs import FSRS_FITS
+from utils.deck_cache import DECK_CACHE
+from utils.review_sessions import REVIEW_SESSIONS
+from utils.schedulers import SCHEDULER_NAMES
 from typing import Optional
 from utils.tags import parse_tag_names, set_deck_tags
 
@@ -20,7 +25,7 @@ async def new_deck_form(request: Request):
     return templates.TemplateResponse("decks/new.html", {"request": request})
 
 @router.post("/new")
-async def create_deck(name: str = Form(..., description="Deck name"), conn = Depends(get_db)):
+def create_deck(name: str = Form(..., description="Deck name"), conn = Depends(get_db)):
     """Create new deck in DB."""
     if not name or not name.strip():
         raise HTTPException(status_code=400, detail="Name is required")
@@ -38,12 +43,13 @@ async def create_deck(name: str = Form(..., description="Deck name"), conn = Dep
             (deck_id,),
         )
         conn.commit()
+        DECK_CACHE.invalidate_deck(deck_id)
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Deck with this name already exists")
 
 @router.get("/", response_class=HTMLResponse)
-async def list_decks(
+def list_decks(
     request: Request,
     tag: list[str] = Query(default=[]),
     conn = Depends(get_db),
@@ -71,12 +77,9 @@ async def list_decks(
     where_clause = " AND ".join(filters)
     cursor.execute(
         f"""
-        SELECT d.id, d.name, GROUP_CONCAT(t.name, ',') AS tags
+        SELECT d.id, d.name, d.tag_list AS tags
         FROM decks d
-        LEFT JOIN deck_tags dt ON dt.deck_id = d.id
-        LEFT JOIN tags t ON t.id = dt.tag_id
         WHERE {where_clause}
-        GROUP BY d.id
         ORDER BY d.name
         """,
         params,
@@ -101,13 +104,19 @@ async def list_decks(
     )
 
 @router.get("/{deck_id}", response_class=HTMLResponse)
-async def deck_detail(deck_id: int, request: Request, kid_id: Optional[int] = None, conn = Depends(get_db)):
+def deck_detail(
+    deck_id: int,
+    request: Request,
+    kid_id: Optional[int] = None,
+    mastery_changed: Optional[int] = None,
+    conn = Depends(get_db),
+):
     cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
+    cursor.execute("SELECT id, name, scheduler FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
     deck_row = cursor.fetchone()
     if not deck_row:
         raise HTTPException(status_code=404, detail="Deck not found")
-    deck = {"id": deck_row[0], "name": deck_row[1]}
+    deck = {"id": deck_row[0], "name": deck_row[1], "scheduler": deck_row[2]}
     cursor.execute(
         """
         SELECT t.name
@@ -130,12 +139,9 @@ async def deck_detail(deck_id: int, request: Request, kid_id: Optional[int] = No
                 c.streak,
                 c.due_date,
                 c.position,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE c.deck_id = ? AND c.deleted_at IS NULL
-            GROUP BY c.id
             ORDER BY c.position, c.id
             """,
             (deck_id,),
@@ -150,13 +156,10 @@ async def deck_detail(deck_id: int, request: Request, kid_id: Optional[int] = No
                 COALESCE(cp.streak, c.streak) AS streak,
                 COALESCE(cp.due_date, c.due_date) AS due_date,
                 c.position,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
             LEFT JOIN card_progress cp ON cp.card_id = c.id AND cp.kid_id = ?
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE c.deck_id = ? AND c.deleted_at IS NULL
-            GROUP BY c.id
             ORDER BY c.position, c.id
             """,
             (kid_id, deck_id),
@@ -194,11 +197,13 @@ async def deck_detail(deck_id: int, request: Request, kid_id: Optional[int] = No
             "deck_tags": deck_tag_names,
             "deck_tags_text": deck_tags_text,
             "card_tags": card_tags,
+            "mastery_rules": get_deck_mastery_rules(conn, deck_id),
+            "mastery_changed": mastery_changed,
         },
     )
 
 @router.get("/{deck_id}/row", response_class=HTMLResponse)
-async def deck_row(deck_id: int, request: Request, conn = Depends(get_db)):
+def deck_row(deck_id: int, request: Request, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("SELECT id, name FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
     deck = cursor.fetchone()
@@ -207,7 +212,7 @@ async def deck_row(deck_id: int, request: Request, conn = Depends(get_db)):
     return templates.TemplateResponse("decks/deck_row.html", {"request": request, "deck": dict(deck)})
 
 @router.get("/{deck_id}/edit", response_class=HTMLResponse)
-async def edit_deck_form(deck_id: int, request: Request, conn = Depends(get_db)):
+def edit_deck_form(deck_id: int, request: Request, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("SELECT id, name FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
     deck = cursor.fetchone()
@@ -216,7 +221,7 @@ async def edit_deck_form(deck_id: int, request: Request, conn = Depends(get_db))
     return templates.TemplateResponse("decks/deck_edit_form.html", {"request": request, "deck": dict(deck)})
 
 @router.post("/{deck_id}/edit", response_class=HTMLResponse)
-async def edit_deck(deck_id: int, request: Request, name: str = Form(...), conn = Depends(get_db)):
+def edit_deck(deck_id: int, request: Request, name: str = Form(...), conn = Depends(get_db)):
     if not name or not name.strip():
         raise HTTPException(status_code=400, detail="Name is required")
     cursor = conn.cursor()
@@ -228,6 +233,7 @@ async def edit_deck(deck_id: int, request: Request, name: str = Form(...), conn
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Deck not found")
         conn.commit()
+        DECK_CACHE.invalidate_deck(deck_id)
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Deck with this name already exists")
     cursor.execute("SELECT id, name FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
@@ -235,7 +241,7 @@ async def edit_deck(deck_id: int, request: Request, name: str = Form(...), conn
     return templates.TemplateResponse("decks/deck_row.html", {"request": request, "deck": dict(deck)})
 
 @router.post("/{deck_id}/delete", response_class=HTMLResponse)
-async def delete_deck(deck_id: int, conn = Depends(get_db)):
+def delete_deck(deck_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute(
         "UPDATE decks SET deleted_at = datetime('now') WHERE id = ? AND deleted_at IS NULL",
@@ -252,10 +258,12 @@ async def delete_deck(deck_id: int, conn = Depends(get_db)):
         (deck_id,),
     )
     conn.commit()
+    REVIEW_SESSIONS.invalidate_deck(deck_id)
+    DECK_CACHE.invalidate_deck(deck_id)
     return HTMLResponse("")
 
 @router.post("/{deck_id}/tags")
-async def update_deck_tags(
+def update_deck_tags(
     deck_id: int,
     tags: str = Form(""),
     kid_id: Optional[int] = Form(None),
@@ -270,3 +278,74 @@ async def update_deck_tags(
     conn.commit()
     redirect_target = f"/decks/{deck_id}?kid_id={kid_id}" if kid_id else f"/decks/{deck_id}"
     return RedirectResponse(url=redirect_target, status_code=status.HTTP_303_SEE_OTHER)
+
+@router.post("/{deck_id}/scheduler")
+def update_deck_scheduler(
+    deck_id: int,
+    scheduler: str = Form(...),
+    kid_id: Optional[int] = Form(None),
+    conn = Depends(get_db),
+):
+    """Switch the deck between SM-2 and FSRS and replay its cards' progress under the new one."""
+    if scheduler not in SCHEDULER_NAMES:
+        raise HTTPException(status_code=400, detail="Unknown scheduler")
+    cursor = conn.cursor()
+    cursor.execute("SELECT scheduler FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
+    row = cursor.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    if row[0] != scheduler:
+        cursor.execute("UPDATE decks SET scheduler = ? WHERE id = ?", (scheduler, deck_id))
+        replay_deck_progress(conn, deck_id)
+        # Due dates moved, so today's materialized plans for the deck's kids are stale.
+        cursor.execute(
+            "DELETE FROM daily_queue_runs WHERE kid_id IN (SELECT kid_id FROM assignments WHERE deck_id = ?)",
+            (deck_id,),
+        )
+        conn.commit()
+        REVIEW_SESSIONS.invalidate_deck(deck_id)
+        DECK_CACHE.invalidate_deck(deck_id)
+        if scheduler == "fsrs":
+            FSRS_FITS.request()
+    redirect_target = f"/decks/{deck_id}?kid_id={kid_id}" if kid_id else f"/decks/{deck_id}"
+    return RedirectResponse(url=redirect_target, status_code=status.HTTP_303_SEE_OTHER)
+
+@router.post("/{deck_id}/mastery-rules")
+def update_deck_mastery_rules(
+    deck_id: int,
+    consecutive_grades: int = Form(...),
+    min_ease_factor: float = Form(...),
+    min_interval_days: int = Form(...),
+    kid_id: Optional[int] = Form(None),
+    conn = Depends(get_db),
+):
+    """Save the deck's mastery rules and re-evaluate every kid's card statuses against them."""
+    if consecutive_grades < 1 or min_ease_factor <= 0 or min_interval_days < 1:
+        raise HTTPException(status_code=400, detail="Invalid mastery rules")
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
+    if not cursor.fetchone():
+        raise HTTPException(status_code=404, detail="Deck not found")
+    rules = {
+        "consecutive_grades": consecutive_grades,
+        "min_ease_factor": min_ease_factor,
+        "min_interval_days": min_interval_days,
+    }
+    cursor.execute(
+        """
+        INSERT INTO deck_mastery_rules (deck_id, consecutive_grades, min_ease_factor, min_interval_days)
+        VALUES (:deck_id, :consecutive_grades, :min_ease_factor, :min_interval_days)
+        ON CONFLICT(deck_id) DO UPDATE SET
+            consecutive_grades = excluded.consecutive_grades,
+            min_ease_factor = excluded.min_ease_factor,
+            min_interval_days = excluded.min_interval_days
+        """,
+        {**rules, "deck_id": deck_id},
+    )
+    changed = reevaluate_deck_mastery(conn, deck_id, rules)
+    conn.commit()
+    DECK_CACHE.invalidate_deck(deck_id)
+    redirect_target = f"/decks/{deck_id}?mastery_changed={changed}"
+    if kid_id:
+        redirect_target += f"&kid_id={kid_id}"
+    return RedirectResponse(url=redirect_target, status_code=status.HTTP_303_SEE_OTHER)
@@ -3,7 +3,7 @@ from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
 
-from db.database import get_db
+from db.async_db import AsyncDatabase, get_async_db
 
 router = APIRouter()
 base_dir = Path(__file__).resolve().parent.parent
@@ -11,22 +11,19 @@ templates = Jinja2Templates(directory=str(base_dir / "templates"))
 
 
 @router.get("/", response_class=HTMLResponse)
-async def kid_mode_home(request: Request, conn=Depends(get_db)):
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM kids WHERE deleted_at IS NULL ORDER BY name")
-    kids = [dict(row) for row in cursor.fetchall()]
+async def kid_mode_home(request: Request, db: AsyncDatabase = Depends(get_async_db)):
+    rows = await db.fetchall("SELECT id, name FROM kids WHERE deleted_at IS NULL ORDER BY name")
+    kids = [dict(row) for row in rows]
     return templates.TemplateResponse("kid_mode.html", {"request": request, "kids": kids})
 
 
 @router.get("/{kid_id}", response_class=HTMLResponse)
-async def kid_mode_decks(kid_id: int, request: Request, conn=Depends(get_db)):
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM kids WHERE id = ? AND deleted_at IS NULL", (kid_id,))
-    kid_row = cursor.fetchone()
+async def kid_mode_decks(kid_id: int, request: Request, db: AsyncDatabase = Depends(get_async_db)):
+    kid_row = await db.fetchone("SELECT id, name FROM kids WHERE id = ? AND deleted_at IS NULL", (kid_id,))
     if not kid_row:
         raise HTTPException(status_code=404, detail="Kid not found")
     kid = {"id": kid_row[0], "name": kid_row[1]}
-    cursor.execute(
+    rows = await db.fetchall(
         """
         SELECT d.id, d.name
         FROM decks d
@@ -34,7 +31,7 @@ async def kid_mode_decks(kid_id: int, request: Request, conn=Depends(get_db)):
         ORDER BY d.name
         """
     )
-    decks = [dict(row) for row in cursor.fetchall()]
+    decks = [dict(row) for row in rows]
     return templates.TemplateResponse(
         "kid_mode_decks.html",
         {"request": request, "kid": kid, "decks": decks},
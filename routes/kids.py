@@ -13,7 +13,7 @@ base_dir = Path(__file__).resolve().parent.parent
 templates = Jinja2Templates(directory=str(base_dir / "templates"))
 
 @router.get("/", response_class=HTMLResponse)
-async def list_kids(request: Request, conn = Depends(get_db)):
+def list_kids(request: Request, conn = Depends(get_db)):
     """List all kids."""
     cursor = conn.cursor()
     cursor.execute("SELECT id, name FROM kids WHERE deleted_at IS NULL ORDER BY name")
@@ -26,7 +26,7 @@ async def new_kid_form(request: Request):
     return templates.TemplateResponse("kids/new.html", {"request": request})
 
 @router.post("/new")
-async def create_kid(name: str = Form(..., description="Kid's name"), conn = Depends(get_db)):
+def create_kid(name: str = Form(..., description="Kid's name"), conn = Depends(get_db)):
     """Create a new kid in DB."""
     if not name or not name.strip():
         raise HTTPException(status_code=400, detail="Name is required")
@@ -45,7 +45,7 @@ async def create_kid(name: str = Form(..., description="Kid's name"), conn = Dep
         raise HTTPException(status_code=400, detail="Kid with this name already exists")
 
 @router.get("/{kid_id}/decks", response_class=HTMLResponse)
-async def kid_decks(
+def kid_decks(
     kid_id: int,
     request: Request,
     tag: list[str] = Query(default=[]),
@@ -79,12 +79,9 @@ async def kid_decks(
     where_clause = " AND ".join(filters)
     cursor.execute(
         f"""
-        SELECT d.id, d.name, GROUP_CONCAT(t.name, ',') AS tags
+        SELECT d.id, d.name, d.tag_list AS tags
         FROM decks d
-        LEFT JOIN deck_tags dt ON dt.deck_id = d.id
-        LEFT JOIN tags t ON t.id = dt.tag_id
         WHERE {where_clause}
-        GROUP BY d.id
         ORDER BY d.name
         """,
         params,
@@ -115,7 +112,7 @@ async def kid_decks(
     )
 
 @router.get("/{kid_id}/row", response_class=HTMLResponse)
-async def kid_row(kid_id: int, request: Request, conn = Depends(get_db)):
+def kid_row(kid_id: int, request: Request, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("SELECT id, name FROM kids WHERE id = ? AND deleted_at IS NULL", (kid_id,))
     kid = cursor.fetchone()
@@ -124,7 +121,7 @@ async def kid_row(kid_id: int, request: Request, conn = Depends(get_db)):
     return templates.TemplateResponse("kids/kid_row.html", {"request": request, "kid": dict(kid)})
 
 @router.get("/{kid_id}/edit", response_class=HTMLResponse)
-async def edit_kid_form(kid_id: int, request: Request, conn = Depends(get_db)):
+def edit_kid_form(kid_id: int, request: Request, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("SELECT id, name FROM kids WHERE id = ? AND deleted_at IS NULL", (kid_id,))
     kid = cursor.fetchone()
@@ -133,7 +130,7 @@ async def edit_kid_form(kid_id: int, request: Request, conn = Depends(get_db)):
     return templates.TemplateResponse("kids/kid_edit_form.html", {"request": request, "kid": dict(kid)})
 
 @router.post("/{kid_id}/edit", response_class=HTMLResponse)
-async def edit_kid(kid_id: int, request: Request, name: str = Form(...), conn = Depends(get_db)):
+def edit_kid(kid_id: int, request: Request, name: str = Form(...), conn = Depends(get_db)):
     if not name or not name.strip():
         raise HTTPException(status_code=400, detail="Name is required")
     cursor = conn.cursor()
@@ -152,7 +149,7 @@ async def edit_kid(kid_id: int, request: Request, name: str = Form(...), conn =
     return templates.TemplateResponse("kids/kid_row.html", {"request": request, "kid": dict(kid)})
 
 @router.post("/{kid_id}/delete", response_class=HTMLResponse)
-async def delete_kid(kid_id: int, conn = Depends(get_db)):
+def delete_kid(kid_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute(
         "UPDATE kids SET deleted_at = datetime('now') WHERE id = ? AND deleted_at IS NULL",
@@ -0,0 +1,62 @@
+from datetime import datetime
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, Request, status
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.templating import Jinja2Templates
+
+from db.database import get_pool_stats
+from db.instrumentation import SQL_METRICS
+from utils.auth import require_parent_session
+from utils.deck_cache import DECK_CACHE
+from utils.fsrs_jobs import FSRS_FITS
+from utils.llm_jobs import LLM_JOBS
+from utils.review_sessions import REVIEW_SESSIONS
+
+router = APIRouter(dependencies=[Depends(require_parent_session)])
+base_dir = Path(__file__).resolve().parent.parent
+templates = Jinja2Templates(directory=str(base_dir / "templates"))
+
+
+@router.get("/metrics/pool")
+async def pool_metrics():
+    """Connection pool size and wait-time counters."""
+    return JSONResponse(get_pool_stats())
+
+
+@router.get("/metrics/deck-cache")
+async def deck_cache_metrics():
+    """Deck metadata cache hit/miss, invalidation and discarded-load counters."""
+    return JSONResponse(DECK_CACHE.stats())
+
+
+@router.get("/metrics/review-sessions")
+async def review_session_metrics():
+    """Live deck review sessions and their created/resumed/expired counters."""
+    return JSONResponse(REVIEW_SESSIONS.stats())
+
+
+@router.get("/metrics/llm-jobs")
+async def llm_job_metrics():
+    """Background LLM confirmation queue depth and outcome counters."""
+    return JSONResponse(LLM_JOBS.stats())
+
+
+@router.get("/metrics/scheduler-fits")
+async def scheduler_fit_metrics():
+    """Background FSRS weight fit runs, outcomes and the last fit's duration."""
+    return JSONResponse(FSRS_FITS.stats())
+
+
+@router.get("/metrics/sql", response_class=HTMLResponse)
+async def sql_metrics(request: Request):
+    """Aggregated statement and per-route SQL timings since start (or last reset)."""
+    snapshot = SQL_METRICS.snapshot()
+    snapshot["since"] = datetime.fromtimestamp(snapshot["since"])
+    return templates.TemplateResponse("admin/sql_metrics.html", {"request": request, **snapshot})
+
+
+@router.post("/metrics/sql/reset")
+async def reset_sql_metrics():
+    SQL_METRICS.reset()
+    return RedirectResponse(url="/admin/metrics/sql", status_code=status.HTTP_303_SEE_OTHER)
@@ -1,4 +1,4 @@
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional
 
@@ -6,31 +6,22 @@ from fastapi import APIRouter, Depends, Form, Request, Query, status, HTTPExcept
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 
-from db.database import get_db
+from db.async_db import AsyncDatabase, get_async_db
 from utils.auth import require_parent_session
+from utils.days import date_from_day_number, today_number
+from utils.simulator import load_simulation_inputs, simulate_due_load, weekly_load
 
 router = APIRouter(dependencies=[Depends(require_parent_session)])
 base_dir = Path(__file__).resolve().parent.parent
 templates = Jinja2Templates(directory=str(base_dir / "templates"))
 
 
-def _parse_date(value: Optional[str]) -> Optional[date]:
-    if not value:
-        return None
-    return datetime.strptime(value, "%Y-%m-%d").date()
-
-
 def _week_starts(anchor: date, weeks: int = 8) -> List[date]:
     week_start = anchor - timedelta(days=anchor.weekday())
     return [week_start + timedelta(weeks=offset) for offset in range(weeks)]
 
 
-@router.get("/", response_class=HTMLResponse)
-async def plan_view(
-    request: Request,
-    kid_id: Optional[int] = Query(default=None),
-    conn=Depends(get_db),
-):
+def _load_plan(conn, kid_id: Optional[int]) -> dict:
     cursor = conn.cursor()
     cursor.execute("SELECT id, name FROM kids WHERE deleted_at IS NULL ORDER BY name")
     kids = [{"id": row[0], "name": row[1]} for row in cursor.fetchall()]
@@ -56,27 +47,28 @@ async def plan_view(
     }
 
     card_rows = []
+    today_day = today_number()
     if selected_kid:
         cursor.execute(
             """
             SELECT c.id, c.deck_id, c.prompt, c.full_text,
-                   COALESCE(cp.due_date, date('now')) AS due_date,
+                   COALESCE(cp.due_day, ?) AS due_day,
                    d.name
             FROM cards c
             JOIN decks d ON c.deck_id = d.id
             LEFT JOIN card_progress cp ON cp.card_id = c.id AND cp.kid_id = ?
-            WHERE date(COALESCE(cp.due_date, date('now'))) >= date('now')
+            WHERE (cp.due_day IS NULL OR cp.due_day >= ?)
             AND c.deleted_at IS NULL
             AND d.deleted_at IS NULL
-            ORDER BY d.name, date(COALESCE(cp.due_date, date('now')))
+            ORDER BY d.name, COALESCE(cp.due_day, ?)
             """,
-            (kid_id,),
+            (today_day, kid_id, today_day, today_day),
         )
         card_rows = cursor.fetchall()
 
     cards_by_deck: Dict[int, List[dict]] = {deck["id"]: [] for deck in decks}
     for row in card_rows:
-        due = _parse_date(row[4])
+        due = date_from_day_number(row[4]) if row[4] is not None else None
         cards_by_deck.setdefault(row[1], []).append(
             {
                 "id": row[0],
@@ -123,16 +115,45 @@ async def plan_view(
             }
         )
 
-    return templates.TemplateResponse(
-        "plan.html",
-        {
-            "request": request,
-            "deck_views": deck_views,
-            "week_labels": week_labels,
-            "kids": kids,
-            "selected_kid": selected_kid,
-        },
-    )
+    return {
+        "deck_views": deck_views,
+        "week_labels": week_labels,
+        "kids": kids,
+        "selected_kid": selected_kid,
+    }
+
+
+def _load_projection(conn, kid_id: Optional[int]) -> dict:
+    """Simulated load and deck mastery dates for one kid, or every kid when kid_id is None."""
+    result = simulate_due_load(load_simulation_inputs(conn, kid_id))
+    return {
+        "weeks": weekly_load(result),
+        "deck_forecasts": result.decks,
+        "runs": result.runs,
+        "horizon_days": len(result.days),
+        "show_kid": kid_id is None,
+    }
+
+
+@router.get("/", response_class=HTMLResponse)
+async def plan_view(
+    request: Request,
+    kid_id: Optional[int] = Query(default=None),
+    db: AsyncDatabase = Depends(get_async_db),
+):
+    plan = await db.run(_load_plan, kid_id)
+    return templates.TemplateResponse("plan.html", {"request": request, **plan})
+
+
+@router.get("/projection", response_class=HTMLResponse)
+async def plan_projection(
+    request: Request,
+    kid_id: Optional[int] = Query(default=None),
+    db: AsyncDatabase = Depends(get_async_db),
+):
+    """HTMX partial with the Monte Carlo load projection (loaded after the page)."""
+    projection = await db.run(_load_projection, kid_id)
+    return templates.TemplateResponse("partials/plan_projection.html", {"request": request, **projection})
 
 
 @router.post("/settings")
@@ -141,12 +162,11 @@ async def update_plan_settings(
     weekly_goal: Optional[int] = Form(None),
     target_date: Optional[str] = Form(None),
     kid_id: Optional[int] = Form(None),
-    conn=Depends(get_db),
+    db: AsyncDatabase = Depends(get_async_db),
 ):
     cleaned_goal = int(weekly_goal) if weekly_goal not in (None, "") else None
     cleaned_target = target_date or None
-    cursor = conn.cursor()
-    cursor.execute(
+    await db.execute(
         """
         INSERT INTO deck_plans (deck_id, weekly_goal, target_date)
         VALUES (?, ?, ?)
@@ -156,6 +176,6 @@ async def update_plan_settings(
         """,
         (deck_id, cleaned_goal, cleaned_target),
     )
-    conn.commit()
+    await db.commit()
     redirect_url = f"/plan?kid_id={kid_id}" if kid_id else "/plan"
     return RedirectResponse(url=redirect_url, status_code=status.HTTP_303_SEE_OTHER)
@@ -7,7 +7,7 @@ from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
-from db.database import get_db
+from db.async_db import AsyncDatabase, get_async_db
 from utils.auth import require_parent_session
 from utils.grading import token_diff
 
@@ -164,9 +164,9 @@ def _load_weekly_report(conn, week_start: date) -> dict:
 async def weekly_report(
     request: Request,
     week_start: date = Query(default_factory=lambda: date.today() - timedelta(days=7)),
-    conn=Depends(get_db),
+    db: AsyncDatabase = Depends(get_async_db),
 ):
-    report = _load_weekly_report(conn, week_start)
+    report = await db.run(_load_weekly_report, week_start)
     return templates.TemplateResponse(
         "reports/weekly.html",
         {
@@ -180,9 +180,9 @@ async def weekly_report(
 async def weekly_report_export(
     format: str = Query("csv", pattern="^(csv|pdf)$"),
     week_start: date = Query(default_factory=lambda: date.today() - timedelta(days=7)),
-    conn=Depends(get_db),
+    db: AsyncDatabase = Depends(get_async_db),
 ):
-    report = _load_weekly_report(conn, week_start)
+    report = await db.run(_load_weekly_report, week_start)
     if format == "pdf":
         lines = [
             "MemCoach Weekly Report",
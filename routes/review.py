@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, Form, Request, HTTPException, status
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-from db.database import get_db
-from utils.grading import grade_recall, token_diff
+from db.async_db import AsyncDatabase, get_async_db
+from utils.grading import grade_recall_deferred, token_diff
 from utils.hints import (
     build_hint_text,
     build_cloze_text,
@@ -11,19 +11,29 @@ from utils.hints import (
     normalize_hint_mode,
     HINT_MODE_OPTIONS,
 )
-from utils.sm2 import update_sm2, map_grade_to_quality
-from utils.mastery import mastery_status_from_rules, get_deck_mastery_rules
-from utils.progress import (
-    compute_progress_from_reviews,
-    default_progress,
-    get_card_progress,
-    upsert_card_progress,
+from utils.days import today_number
+from utils.deck_cache import DECK_CACHE, cached_deck
+from utils.sm2 import map_grade_to_quality
+from utils.progress import due_card_filter, replay_card_progress
+from utils.llm_jobs import LLM_JOBS
+from utils.load_balance import balance_target
+from utils.review_sessions import REVIEW_SESSIONS, ReviewSession, new_session_seed, seeded_shuffle
+from utils.reviews import (
+    BatchReview,
+    existing_client_reviews,
+    grade_from_parent_quality,
+    load_batch_cards,
+    not_reviewed_on_day_filter,
+    parse_duration_seconds,
+    record_review,
+    record_review_batch,
 )
 from config import load_config
-from utils.auth import require_parent_session
+from models.review import ReviewBatch, ReviewBatchResponse, ReviewBatchResult, ReviewBatchStatus
+from utils.auth import is_parent_unlocked, require_parent_session
 from utils.search import normalize_fts_query
 import sqlite3
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from datetime import datetime, timezone
 
 router = APIRouter()
@@ -32,46 +42,71 @@ templates = Jinja2Templates(directory=str(base_dir / "templates"))
 templates.env.globals["token_diff"] = token_diff
 
 def get_deck_review_mode(conn, deck_id: int) -> str:
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT review_mode FROM decks WHERE id = ? AND deleted_at IS NULL",
-        (deck_id,),
-    )
-    row = cursor.fetchone()
-    if not row:
+    deck = DECK_CACHE.get(conn, deck_id)
+    if deck is None:
         raise HTTPException(status_code=404, detail="Deck not found")
-    return row[0] or "free_recall"
+    return deck.review_mode
 
-def get_next_card_for_review(
+REVIEW_CARD_COLUMNS = """
+    c.*,
+    COALESCE(cp.due_date, date('now')) AS due_date,
+    COALESCE(cp.interval_days, 1) AS interval_days,
+    COALESCE(cp.ease_factor, 2.5) AS ease_factor,
+    COALESCE(cp.streak, 0) AS streak,
+    COALESCE(cp.mastery_status, 'new') AS mastery_status,
+    t.title AS text_title,
+    COALESCE(t.chunk_count, 0) AS text_total,
+    c.tag_list AS tags
+"""
+
+
+def review_filters(
+    group_texts: bool,
+    search_query: Optional[str],
+    tag_filters: Optional[List[str]],
+) -> Tuple[bool, Optional[str], Tuple[str, ...]]:
+    """Normalized filter key a review session is resolved for."""
+    return group_texts, (search_query or None), tuple(tag_filters or ())
+
+
+def resolve_review_card_ids(
+    conn,
     kid_id: int,
     deck_id: int,
-    conn,
-    group_texts: bool = False,
-    search_query: Optional[str] = None,
-    tag_filters: Optional[List[str]] = None,
-) -> Optional[Dict]:
-    """Get next due card for kid and deck (simple: due and not reviewed today)."""
+    today: int,
+    filters: Tuple[bool, Optional[str], Tuple[str, ...]],
+    seed: str,
+) -> List[int]:
+    """Ordered ids of the due, not-yet-reviewed cards matching the session filters.
+
+    This is the only place the FTS MATCH and tag filters run for a session.
+    Without group_texts, cards due the same day are shuffled by seeded_shuffle
+    instead of ORDER BY random(), so SQLite returns them in index order.
+    """
+    group_texts, search_query, tag_filters = filters
     cursor = conn.cursor()
-    filters = [
+    due_sql, due_params = due_card_filter(kid_id, today, deck_id)
+    reviewed_sql, reviewed_params = not_reviewed_on_day_filter(kid_id, today)
+    conditions = [
         "c.deck_id = ?",
-        "date(COALESCE(cp.due_date, date('now'))) <= date('now')",
+        due_sql,
         "c.deleted_at IS NULL",
         "(c.text_id IS NULL OR t.deleted_at IS NULL)",
-        "NOT EXISTS (SELECT 1 FROM reviews r WHERE r.card_id = c.id AND r.kid_id = ? AND date(r.ts) = date('now'))",
+        reviewed_sql,
     ]
-    params: List[object] = [deck_id, kid_id]
+    params: List[object] = [deck_id, *due_params, *reviewed_params]
     fts_join = ""
     if search_query:
         fts_query = normalize_fts_query(search_query)
         if fts_query == "":
-            return None
+            return []
         if fts_query:
-            filters.append("cards_fts MATCH ?")
+            conditions.append("cards_fts MATCH ?")
             params.append(fts_query)
             fts_join = "JOIN cards_fts ON cards_fts.rowid = c.id"
     if tag_filters:
         placeholders = ",".join("?" for _ in tag_filters)
-        filters.append(
+        conditions.append(
             f"""
             c.id IN (
                 SELECT ct2.card_id
@@ -85,63 +120,119 @@ def get_next_card_for_review(
         )
         params.extend(tag_filters)
         params.append(len(tag_filters))
-    where_clause = " AND ".join(filters)
+    where_clause = " AND ".join(conditions)
     order_clause = (
-        "ORDER BY date(COALESCE(cp.due_date, date('now'))) ASC, (c.text_id IS NULL), c.text_id, c.chunk_index"
+        "ORDER BY due_day ASC, (c.text_id IS NULL), c.text_id, c.chunk_index"
         if group_texts
-        else "ORDER BY date(COALESCE(cp.due_date, date('now'))) ASC, random()"
+        else ""
     )
     cursor.execute(
         f"""
-        SELECT
-            c.*,
-            COALESCE(cp.due_date, date('now')) AS due_date,
-            COALESCE(cp.interval_days, 1) AS interval_days,
-            COALESCE(cp.ease_factor, 2.5) AS ease_factor,
-            COALESCE(cp.streak, 0) AS streak,
-            COALESCE(cp.mastery_status, 'new') AS mastery_status,
-            t.title AS text_title,
-            (
-                SELECT COUNT(*) FROM cards c2 WHERE c2.text_id = c.text_id
-            ) AS text_total,
-            (
-                SELECT GROUP_CONCAT(t2.name, ',')
-                FROM card_tags ct2
-                JOIN tags t2 ON t2.id = ct2.tag_id
-                WHERE ct2.card_id = c.id
-            ) AS tags
+        SELECT c.id, COALESCE(cp.due_day, ?) AS due_day
         FROM cards c
         LEFT JOIN texts t ON t.id = c.text_id
         LEFT JOIN card_progress cp ON cp.card_id = c.id AND cp.kid_id = ?
         {fts_join}
         WHERE {where_clause}
         {order_clause}
-        LIMIT 1
         """,
-        [kid_id, *params],
+        [today, kid_id, *params],
+    )
+    rows = [(row[0], row[1]) for row in cursor.fetchall()]
+    if group_texts:
+        return [card_id for card_id, _ in rows]
+    return seeded_shuffle(rows, seed)
+
+
+def fetch_review_card(conn, kid_id: int, deck_id: int, card_id: int, today: int) -> Optional[Dict]:
+    """Display row for a session card, or None if it was deleted or reviewed since."""
+    reviewed_sql, reviewed_params = not_reviewed_on_day_filter(kid_id, today)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT {REVIEW_CARD_COLUMNS}
+        FROM cards c
+        LEFT JOIN texts t ON t.id = c.text_id
+        LEFT JOIN card_progress cp ON cp.card_id = c.id AND cp.kid_id = ?
+        WHERE c.id = ?
+            AND c.deck_id = ?
+            AND c.deleted_at IS NULL
+            AND (c.text_id IS NULL OR t.deleted_at IS NULL)
+            AND {reviewed_sql}
+        """,
+        [kid_id, card_id, deck_id, *reviewed_params],
     )
     row = cursor.fetchone()
-    if row:
-        card = dict(row)
-        card["tags"] = [tag for tag in (card.get("tags") or "").split(",") if tag]
-        return card
-    return None
+    if not row:
+        return None
+    card = dict(row)
+    card["tags"] = [tag for tag in (card.get("tags") or "").split(",") if tag]
+    return card
+
+
+def get_next_card_for_review(
+    conn,
+    kid_id: int,
+    deck_id: int,
+    session_id: Optional[str] = None,
+    group_texts: bool = False,
+    search_query: Optional[str] = None,
+    tag_filters: Optional[List[str]] = None,
+    seed: Optional[str] = None,
+) -> Tuple[ReviewSession, Optional[Dict]]:
+    """Next card of the kid's review session, resolving a new session if needed.
+
+    `seed` fixes the shuffle of a newly resolved session (random otherwise).
+    """
+    today = today_number()
+    filters = review_filters(group_texts, search_query, tag_filters)
+    session = REVIEW_SESSIONS.get(session_id, kid_id, deck_id, today, filters)
+    if session is None:
+        seed = seed or new_session_seed()
+        card_ids = resolve_review_card_ids(conn, kid_id, deck_id, today, filters, seed)
+        session = REVIEW_SESSIONS.create(kid_id, deck_id, today, filters, card_ids, seed)
+    while True:
+        card_id = REVIEW_SESSIONS.head(session)
+        if card_id is None:
+            return session, None
+        card = fetch_review_card(conn, kid_id, deck_id, card_id, today)
+        if card:
+            return session, card
+        REVIEW_SESSIONS.discard_card(session, card_id)
+
+
+@router.get("/llm/{review_id}", response_class=HTMLResponse)
+async def llm_verdict_status(review_id: int, request: Request, db: AsyncDatabase = Depends(get_async_db)):
+    """HTMX poll target: the background LLM confirmation of a borderline grade."""
+    row = await db.fetchone(
+        "SELECT id, final_grade, graded_by, llm_status FROM reviews WHERE id = ?",
+        (review_id,),
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="Review not found")
+    return templates.TemplateResponse(
+        "partials/llm_verdict.html",
+        {
+            "request": request,
+            "review_id": row["id"],
+            "llm_status": row["llm_status"],
+            "final_grade": row["final_grade"],
+        },
+    )
+
 
 @router.get("/{kid_id}/{deck_id}", response_class=HTMLResponse)
-async def start_review(kid_id: int, deck_id: int, request: Request, conn = Depends(get_db)):
+async def start_review(kid_id: int, deck_id: int, request: Request, db: AsyncDatabase = Depends(get_async_db)):
     """Start review session for kid and deck."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM kids WHERE id = ? AND deleted_at IS NULL", (kid_id,))
-    kid_row = cursor.fetchone()
+    kid_row = await db.fetchone("SELECT id, name FROM kids WHERE id = ? AND deleted_at IS NULL", (kid_id,))
     if not kid_row:
         raise HTTPException(status_code=404, detail="Kid not found")
     kid = {"id": kid_row[0], "name": kid_row[1]}
-    cursor.execute("SELECT id, name, review_mode FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
-    deck_row = cursor.fetchone()
-    if not deck_row:
+    deck_meta = await cached_deck(db, deck_id)
+    if deck_meta is None:
         raise HTTPException(status_code=404, detail="Deck not found")
-    deck = {"id": deck_row[0], "name": deck_row[1], "review_mode": deck_row[2] or "free_recall"}
-    cursor.execute(
+    deck = {"id": deck_meta.id, "name": deck_meta.name, "review_mode": deck_meta.review_mode}
+    tag_rows = await db.fetchall(
         """
         SELECT DISTINCT t.name
         FROM tags t
@@ -152,17 +243,18 @@ async def start_review(kid_id: int, deck_id: int, request: Request, conn = Depen
         """,
         (deck_id,),
     )
-    deck_tags = [row[0] for row in cursor.fetchall()]
+    deck_tags = [row[0] for row in tag_rows]
     hint_mode = normalize_hint_mode(request.query_params.get("hint_mode"))
     group_texts = request.query_params.get("group_texts") == "1"
     apply_filters = request.query_params.get("apply_filters") == "1"
     search_query = (request.query_params.get("q") or "").strip()
     selected_tags = [tag for tag in request.query_params.getlist("tag") if tag]
     review_mode = deck["review_mode"]
-    card = get_next_card_for_review(
+    session, card = await db.run(
+        get_next_card_for_review,
         kid_id,
         deck_id,
-        conn,
+        seed=(request.query_params.get("seed") or "").strip() or None,
         group_texts=group_texts,
         search_query=search_query if apply_filters else None,
         tag_filters=selected_tags if apply_filters else None,
@@ -191,22 +283,24 @@ async def start_review(kid_id: int, deck_id: int, request: Request, conn = Depen
             "apply_filters": apply_filters,
             "search_query": search_query,
             "selected_tags": selected_tags,
+            "session_id": session.id,
         },
     )
 
 @router.get("/next")
-async def next_card(kid_id: int, deck_id: int, request: Request, conn = Depends(get_db)):
+async def next_card(kid_id: int, deck_id: int, request: Request, db: AsyncDatabase = Depends(get_async_db)):
     """HTMX endpoint for next card partial."""
     hint_mode = normalize_hint_mode(request.query_params.get("hint_mode"))
     group_texts = request.query_params.get("group_texts") == "1"
     apply_filters = request.query_params.get("apply_filters") == "1"
     search_query = (request.query_params.get("q") or "").strip()
     selected_tags = [tag for tag in request.query_params.getlist("tag") if tag]
-    review_mode = get_deck_review_mode(conn, deck_id)
-    card = get_next_card_for_review(
+    review_mode = await db.run(get_deck_review_mode, deck_id)
+    session, card = await db.run(
+        get_next_card_for_review,
         kid_id,
         deck_id,
-        conn,
+        session_id=request.query_params.get("session"),
         group_texts=group_texts,
         search_query=search_query if apply_filters else None,
         tag_filters=selected_tags if apply_filters else None,
@@ -230,6 +324,7 @@ async def next_card(kid_id: int, deck_id: int, request: Request, conn = Depends(
                 "apply_filters": apply_filters,
                 "search_query": search_query,
                 "selected_tags": selected_tags,
+                "session_id": session.id,
             },
         )
     else:
@@ -240,11 +335,9 @@ async def next_card(kid_id: int, deck_id: int, request: Request, conn = Depends(
 
 
 @router.get("/hint", response_class=HTMLResponse)
-async def hint_text(card_id: int, hint_mode: str = "none", conn = Depends(get_db)):
+async def hint_text(card_id: int, hint_mode: str = "none", db: AsyncDatabase = Depends(get_async_db)):
     """HTMX endpoint for hint text updates."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT full_text FROM cards WHERE id = ? AND deleted_at IS NULL", (card_id,))
-    card_row = cursor.fetchone()
+    card_row = await db.fetchone("SELECT full_text FROM cards WHERE id = ? AND deleted_at IS NULL", (card_id,))
     if not card_row:
         raise HTTPException(status_code=404, detail="Card not found")
     full_text = card_row[0]
@@ -266,18 +359,16 @@ async def submit_review(
     apply_filters: str = Form("0"),
     q: Optional[str] = Form(None),
     tag: List[str] = Form([]),
-    conn = Depends(get_db),
+    session: Optional[str] = Form(None),
+    db: AsyncDatabase = Depends(get_async_db),
 ):
     """HTMX endpoint to grade recall, update card/review, return result partial."""
     config = load_config()
-    cursor = conn.cursor()
-    cursor.execute("SELECT review_mode FROM decks WHERE id = ? AND deleted_at IS NULL", (deck_id,))
-    deck_row = cursor.fetchone()
-    if not deck_row:
+    deck = await cached_deck(db, deck_id)
+    if deck is None:
         raise HTTPException(status_code=404, detail="Deck not found")
-    review_mode = deck_row[0] or "free_recall"
-    cursor.execute("SELECT * FROM cards WHERE id = ? AND deleted_at IS NULL", (card_id,))
-    card_row = cursor.fetchone()
+    review_mode = deck.review_mode
+    card_row = await db.fetchone("SELECT * FROM cards WHERE id = ? AND deleted_at IS NULL", (card_id,))
     if not card_row:
         raise HTTPException(status_code=404, detail="Card not found")
     card = dict(card_row)
@@ -303,71 +394,46 @@ async def submit_review(
         auto_grade = None
         final_grade = grade
         graded_by = "parent"
+        llm_status = None
     else:
-        auto_grade = grade_recall(full_text, user_text, config)
+        # Borderline answers keep their Levenshtein grade for now; the LLM
+        # confirms them in the background (utils.llm_jobs).
+        auto_grade, llm_status = grade_recall_deferred(full_text, user_text, config)
         final_grade = auto_grade
         graded_by = "auto"
         quality = map_grade_to_quality(final_grade)
-    progress = get_card_progress(conn, kid_id, card_id) or default_progress()
-    new_interval, new_ef, new_streak, new_due = update_sm2(
-        progress.interval_days, progress.ease_factor, quality, progress.streak
-    )
-    mastery_rules = get_deck_mastery_rules(conn, deck_id)
-    mastery_status = mastery_status_from_rules(
-        new_streak,
-        new_ef,
-        new_interval,
-        mastery_rules,
-    )
-    review_ts = datetime.now(timezone.utc).isoformat()
-    duration_seconds = None
-    if started_at:
-        try:
-            started = datetime.fromisoformat(started_at)
-            if started.tzinfo is None:
-                started = started.replace(tzinfo=timezone.utc)
-            duration_seconds = max(0, int((datetime.now(timezone.utc) - started).total_seconds()))
-        except ValueError:
-            duration_seconds = None
-    cursor.execute("""
-        INSERT INTO reviews (
-            card_id,
-            kid_id,
-            grade,
-            auto_grade,
-            final_grade,
-            graded_by,
-            review_mode,
-            user_text,
-            hint_mode,
-            duration_seconds
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        card_id,
-        kid_id,
-        final_grade,
-        auto_grade,
-        final_grade,
-        graded_by,
-        review_mode,
-        user_text,
-        hint_mode,
-        duration_seconds,
-    ))
-    review_id = cursor.lastrowid
-    upsert_card_progress(
-        conn,
+    review_id = await db.run(
+        record_review,
         kid_id=kid_id,
         card_id=card_id,
-        interval_days=new_interval,
-        due_date=new_due.isoformat(),
-        ease_factor=new_ef,
-        streak=new_streak,
-        mastery_status=mastery_status,
-        last_review_ts=review_ts,
+        deck_id=deck_id,
+        quality=quality,
+        final_grade=final_grade,
+        auto_grade=auto_grade,
+        graded_by=graded_by,
+        review_mode=review_mode,
+        user_text=user_text,
+        hint_mode=hint_mode,
+        duration_seconds=parse_duration_seconds(started_at),
+        llm_status=llm_status,
+        balance_target=balance_target(config),
     )
-    conn.commit()
+    if llm_status == "pending":
+        LLM_JOBS.submit(review_id)
+    selected_tags = [t for t in tag if t]
+    review_session = REVIEW_SESSIONS.get(
+        session,
+        kid_id,
+        deck_id,
+        today_number(),
+        review_filters(
+            group_texts == "1",
+            (q or "").strip() if apply_filters == "1" else None,
+            selected_tags if apply_filters == "1" else None,
+        ),
+    )
+    if review_session is not None:
+        REVIEW_SESSIONS.discard_card(review_session, card_id)
     color_class = {
         'perfect': 'bg-green-100 border-green-400 text-green-800',
         'good': 'bg-yellow-100 border-yellow-400 text-yellow-800',
@@ -389,27 +455,121 @@ async def submit_review(
             "hint_mode": hint_mode,
             "group_texts": group_texts == "1",
             "review_id": review_id,
+            "llm_status": llm_status,
             "apply_filters": apply_filters == "1",
             "search_query": (q or "").strip(),
-            "selected_tags": [t for t in tag if t],
+            "selected_tags": selected_tags,
+            "session_id": review_session.id if review_session else session,
         },
     )
 
-@router.post("/override", response_class=HTMLResponse)
-async def override_review_grade(
-    request: Request,
-    review_id: int = Form(...),
-    grade: str = Form(...),
-    group_texts: str = Form("0"),
-    apply_filters: str = Form("0"),
-    q: Optional[str] = Form(None),
-    tag: List[str] = Form([]),
-    conn = Depends(get_db),
-):
-    """HTMX endpoint to override auto-grade with parent input."""
-    require_parent_session(request)
-    if grade not in {"perfect", "good", "fail"}:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid grade")
+def _grade_batch(items: List[Dict], config: Dict) -> List[BatchReview]:
+    """Grade accepted batch items; borderline answers are confirmed later by the LLM."""
+    graded: List[BatchReview] = []
+    for entry in items:
+        item, card = entry["item"], entry["card"]
+        if card["review_mode"] == "recitation":
+            quality = item.parent_grade
+            final_grade = grade_from_parent_quality(quality)
+            auto_grade = None
+            graded_by = "parent"
+            llm_status = None
+        else:
+            auto_grade, llm_status = grade_recall_deferred(card["full_text"], item.user_text, config)
+            final_grade = auto_grade
+            quality = map_grade_to_quality(final_grade)
+            graded_by = "auto"
+        graded.append(
+            BatchReview(
+                client_id=item.client_id,
+                card_id=card["id"],
+                deck_id=card["deck_id"],
+                reviewed_at=item.reviewed_at,
+                quality=quality,
+                final_grade=final_grade,
+                auto_grade=auto_grade,
+                graded_by=graded_by,
+                review_mode=card["review_mode"],
+                user_text=item.user_text,
+                hint_mode=normalize_hint_mode(item.hint_mode),
+                duration_seconds=item.duration_seconds,
+                llm_status=llm_status,
+            )
+        )
+    return graded
+
+@router.post("/batch", response_model=ReviewBatchResponse)
+async def submit_review_batch(batch: ReviewBatch, request: Request, db: AsyncDatabase = Depends(get_async_db)):
+    """Sync reviews answered offline in one request.
+
+    Each review carries a client-generated id; ids already stored are reported
+    as duplicates, so a device can safely resend a batch after a dropped
+    connection. Accepted reviews are written in one transaction.
+    """
+    kid_id = batch.kid_id
+    kid_row = await db.fetchone("SELECT id FROM kids WHERE id = ? AND deleted_at IS NULL", (kid_id,))
+    if not kid_row:
+        raise HTTPException(status_code=404, detail="Kid not found")
+    cards = await db.run(load_batch_cards, [item.card_id for item in batch.reviews])
+    stored = await db.run(existing_client_reviews, kid_id, [item.client_id for item in batch.reviews])
+    parent_unlocked = is_parent_unlocked(request)
+    accepted: List[Dict] = []
+    rejected: Dict[str, str] = {}
+    seen = set(stored)
+    for item in batch.reviews:
+        if item.client_id in seen:
+            continue
+        seen.add(item.client_id)
+        card = cards.get(item.card_id)
+        if card is None:
+            rejected[item.client_id] = "Card not found"
+        elif card["review_mode"] == "recitation" and (item.parent_grade is None or not parent_unlocked):
+            rejected[item.client_id] = "Parent grade required"
+        else:
+            accepted.append({"item": item, "card": card})
+    config = load_config()
+    graded = _grade_batch(accepted, config)
+    written = await db.run(record_review_batch, kid_id, graded, balance_target(config)) if graded else {}
+    for review in graded:
+        if review.llm_status == "pending" and review.client_id in written:
+            LLM_JOBS.submit(written[review.client_id])
+    grades = {review.client_id: review.final_grade for review in graded}
+    raced = [review.client_id for review in graded if review.client_id not in written]
+    if raced:
+        # Another request stored these between our check and our transaction.
+        stored.update(await db.run(existing_client_reviews, kid_id, raced))
+
+    results: List[ReviewBatchResult] = []
+    reported = set()
+    for item in batch.reviews:
+        client_id = item.client_id
+        if client_id in written and client_id not in reported:
+            result = ReviewBatchResult(
+                client_id=client_id,
+                status=ReviewBatchStatus.RECORDED,
+                review_id=written[client_id],
+                grade=grades[client_id],
+            )
+        elif client_id in rejected and client_id not in reported:
+            result = ReviewBatchResult(
+                client_id=client_id, status=ReviewBatchStatus.REJECTED, detail=rejected[client_id]
+            )
+        else:
+            review_id, grade = stored.get(client_id) or (written.get(client_id), grades.get(client_id))
+            result = ReviewBatchResult(
+                client_id=client_id, status=ReviewBatchStatus.DUPLICATE, review_id=review_id, grade=grade
+            )
+        reported.add(client_id)
+        results.append(result)
+    return ReviewBatchResponse(
+        recorded=sum(result.status == ReviewBatchStatus.RECORDED for result in results),
+        duplicates=sum(result.status == ReviewBatchStatus.DUPLICATE for result in results),
+        rejected=sum(result.status == ReviewBatchStatus.REJECTED for result in results),
+        results=results,
+    )
+
+def _apply_grade_override(conn, review_id: int, grade: str) -> Optional[sqlite3.Row]:
+    """Store the parent grade and replay the card's progress from that review on. Returns the review row."""
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -428,6 +588,7 @@ async def override_review_grade(
                r.auto_grade,
                r.final_grade,
                r.graded_by,
+               r.llm_status,
                c.full_text,
                c.deck_id
         FROM reviews r
@@ -438,21 +599,30 @@ async def override_review_grade(
     )
     row = cursor.fetchone()
     if not row:
-        raise HTTPException(status_code=404, detail="Review not found")
-    progress = compute_progress_from_reviews(conn, row["kid_id"], row["card_id"])
-    if progress:
-        upsert_card_progress(
-            conn,
-            kid_id=row["kid_id"],
-            card_id=row["card_id"],
-            interval_days=progress.interval_days,
-            due_date=progress.due_date,
-            ease_factor=progress.ease_factor,
-            streak=progress.streak,
-            mastery_status=progress.mastery_status,
-            last_review_ts=progress.last_review_ts,
-        )
+        return None
+    replay_card_progress(conn, row["kid_id"], row["card_id"], from_review_id=review_id)
     conn.commit()
+    return row
+
+@router.post("/override", response_class=HTMLResponse)
+async def override_review_grade(
+    request: Request,
+    review_id: int = Form(...),
+    grade: str = Form(...),
+    group_texts: str = Form("0"),
+    apply_filters: str = Form("0"),
+    q: Optional[str] = Form(None),
+    tag: List[str] = Form([]),
+    session: Optional[str] = Form(None),
+    db: AsyncDatabase = Depends(get_async_db),
+):
+    """HTMX endpoint to override auto-grade with parent input."""
+    require_parent_session(request)
+    if grade not in {"perfect", "good", "fail"}:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid grade")
+    row = await db.run(_apply_grade_override, review_id, grade)
+    if not row:
+        raise HTTPException(status_code=404, detail="Review not found")
     color_class = {
         "perfect": "bg-green-100 border-green-400 text-green-800",
         "good": "bg-yellow-100 border-yellow-400 text-yellow-800",
@@ -474,8 +644,10 @@ async def override_review_grade(
             "hint_mode": row["hint_mode"],
             "group_texts": group_texts == "1",
             "review_id": review_id,
+            "llm_status": row["llm_status"],
             "apply_filters": apply_filters == "1",
             "search_query": (q or "").strip(),
             "selected_tags": [t for t in tag if t],
+            "session_id": session,
         },
     )
@@ -2,8 +2,11 @@ from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-from db.database import get_db
+from db.async_db import AsyncDatabase, get_async_db
 from typing import List, Optional
+from utils.days import today_number
+from utils.progress import due_card_filter
+from utils.reviews import not_reviewed_on_day_filter
 from utils.search import normalize_fts_query
 
 router = APIRouter()
@@ -11,16 +14,14 @@ base_dir = Path(__file__).resolve().parent.parent
 templates = Jinja2Templates(directory=str(base_dir / "templates"))
 
 
-@router.get("/search", response_class=HTMLResponse)
-async def search_cards(
-    request: Request,
-    q: Optional[str] = None,
-    deck_id: Optional[int] = None,
-    kid_id: Optional[int] = None,
-    tag: List[str] = Query(default=[]),
-    due_today: bool = False,
-    conn = Depends(get_db),
-):
+def _find_cards(
+    conn,
+    q: Optional[str],
+    deck_id: Optional[int],
+    kid_id: Optional[int],
+    tag: List[str],
+    due_today: bool,
+) -> List[dict]:
     cursor = conn.cursor()
     filters = ["c.deleted_at IS NULL", "d.deleted_at IS NULL"]
     params: List[object] = []
@@ -29,32 +30,22 @@ async def search_cards(
         filters.append("c.deck_id = ?")
         params.append(deck_id)
 
+    today = today_number()
     if due_today:
         if kid_id is not None:
-            filters.append("date(COALESCE(cp.due_date, date('now'))) <= date('now')")
-            filters.append(
-                """
-                NOT EXISTS (
-                    SELECT 1 FROM reviews r
-                    WHERE r.card_id = c.id
-                    AND r.kid_id = ?
-                    AND date(r.ts) = date('now')
-                )
-                """
-            )
-            params.append(kid_id)
+            due_sql, due_params = due_card_filter(kid_id, today, deck_id)
+            filters.append(due_sql)
+            params.extend(due_params)
+            reviewed_sql, reviewed_params = not_reviewed_on_day_filter(kid_id, today)
+            filters.append(reviewed_sql)
+            params.extend(reviewed_params)
         else:
-            filters.append("c.due_date <= date('now')")
+            filters.append("c.due_day <= ?")
+            params.append(today)
 
     fts_query = normalize_fts_query(q)
     if q and fts_query == "":
-        return templates.TemplateResponse(
-            "partials/search_results.html",
-            {
-                "request": request,
-                "cards": [],
-            },
-        )
+        return []
     if fts_query:
         filters.append("cards_fts MATCH ?")
         params.append(fts_query)
@@ -91,16 +82,13 @@ async def search_cards(
                 COALESCE(cp.mastery_status, c.mastery_status) AS mastery_status,
                 c.deck_id,
                 d.name AS deck_name,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
             JOIN decks d ON d.id = c.deck_id
             LEFT JOIN card_progress cp ON cp.card_id = c.id AND cp.kid_id = ?
             {fts_join}
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE {where_clause}
-            GROUP BY c.id
-            ORDER BY date(COALESCE(cp.due_date, c.due_date)) ASC, c.id
+            ORDER BY COALESCE(cp.due_day, c.due_day) ASC, c.id
             LIMIT 100
             """,
             params,
@@ -116,15 +104,12 @@ async def search_cards(
                 c.mastery_status,
                 c.deck_id,
                 d.name AS deck_name,
-                GROUP_CONCAT(t.name, ',') AS tags
+                c.tag_list AS tags
             FROM cards c
             JOIN decks d ON d.id = c.deck_id
             {fts_join}
-            LEFT JOIN card_tags ct ON ct.card_id = c.id
-            LEFT JOIN tags t ON t.id = ct.tag_id
             WHERE {where_clause}
-            GROUP BY c.id
-            ORDER BY c.due_date ASC, c.id
+            ORDER BY c.due_day ASC, c.id
             LIMIT 100
             """,
             params,
@@ -133,7 +118,20 @@ async def search_cards(
     for row in cursor.fetchall():
         tags = [tag for tag in (row["tags"] or "").split(",") if tag]
         cards.append({**dict(row), "tags": tags})
+    return cards
 
+
+@router.get("/search", response_class=HTMLResponse)
+async def search_cards(
+    request: Request,
+    q: Optional[str] = None,
+    deck_id: Optional[int] = None,
+    kid_id: Optional[int] = None,
+    tag: List[str] = Query(default=[]),
+    due_today: bool = False,
+    db: AsyncDatabase = Depends(get_async_db),
+):
+    cards = await db.run(_find_cards, q, deck_id, kid_id, tag, due_today)
     return templates.TemplateResponse(
         "partials/search_results.html",
         {
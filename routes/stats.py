@@ -2,21 +2,19 @@ from fastapi import APIRouter, Depends, Request, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-from db.database import get_db
+from db.async_db import AsyncDatabase, get_async_db
 from utils.mastery import mastery_percent
 
 router = APIRouter()
 base_dir = Path(__file__).resolve().parent.parent
 templates = Jinja2Templates(directory=str(base_dir / "templates"))
 
-@router.get("/{kid_id}", response_class=HTMLResponse)
-async def kid_stats(kid_id: int, request: Request, conn = Depends(get_db)):
-    """Stats dashboard for kid: reviews count, success rate, decks activity."""
+def _load_kid_stats(conn, kid_id: int):
     cursor = conn.cursor()
     cursor.execute("SELECT name FROM kids WHERE id = ? AND deleted_at IS NULL", (kid_id,))
     kid_row = cursor.fetchone()
     if not kid_row:
-        raise HTTPException(status_code=404, detail="Kid not found")
+        return None
     kid_name = kid_row[0]
     cursor.execute("""
         SELECT grade, COUNT(*) FROM reviews WHERE kid_id = ? GROUP BY grade
@@ -70,8 +68,7 @@ async def kid_stats(kid_id: int, request: Request, conn = Depends(get_db)):
             "total": total,
             "percent_mastered": mastery_percent(mastered, total),
         })
-    return templates.TemplateResponse("stats.html", {
-        "request": request, 
+    return {
         "kid_name": kid_name, 
         "total_reviews": total_reviews, 
         "success_rate": round(success_rate, 1), 
@@ -79,4 +76,12 @@ async def kid_stats(kid_id: int, request: Request, conn = Depends(get_db)):
         "deck_stats": deck_stats, 
         "max_streak": max_streak,
         "deck_mastery": deck_mastery,
-    })
+    }
+
+@router.get("/{kid_id}", response_class=HTMLResponse)
+async def kid_stats(kid_id: int, request: Request, db: AsyncDatabase = Depends(get_async_db)):
+    """Stats dashboard for kid: reviews count, success rate, decks activity."""
+    stats = await db.run(_load_kid_stats, kid_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Kid not found")
+    return templates.TemplateResponse("stats.html", {"request": request, **stats})
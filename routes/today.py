@@ -1,3 +1,5 @@
+import asyncio
+import logging
 from datetime import date, datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
@@ -6,8 +8,9 @@ from fastapi import APIRouter, Depends, Form, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 
-from db.database import get_db
-from utils.grading import grade_recall
+from db import database
+from db.async_db import AsyncDatabase, get_async_db, run_in_db_thread
+from utils.grading import grade_recall_deferred
 from utils.hints import (
     HINT_MODE_OPTIONS,
     build_hint_text,
@@ -15,12 +18,18 @@ from utils.hints import (
     build_first_letters_text,
     normalize_hint_mode,
 )
-from utils.mastery import mastery_status_from_rules, get_deck_mastery_rules
-from utils.sm2 import map_grade_to_quality, update_sm2
-from utils.progress import default_progress, get_card_progress, upsert_card_progress
+from utils.llm_jobs import LLM_JOBS
+from utils.load_balance import balance_target
+from utils.sm2 import map_grade_to_quality
+from utils.reviews import parse_duration_seconds, record_review
 from utils.auth import require_parent_session
+from utils.days import seconds_until_next_day
+from utils.deck_cache import cached_deck
+from utils.durations import DEFAULT_DURATION_SECONDS, KID_PACE_SQL, estimate_card_seconds
 from config import load_config
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 base_dir = Path(__file__).resolve().parent.parent
 templates = Jinja2Templates(directory=str(base_dir / "templates"))
@@ -53,27 +62,27 @@ def format_days_of_week(value: Optional[str]) -> str:
     return ", ".join(labels)
 
 
-def assignment_is_active(assignment: Dict, today: date) -> bool:
-    if not assignment.get("enabled"):
-        return False
-    paused_until = assignment.get("paused_until")
-    if paused_until:
-        try:
-            paused_date = date.fromisoformat(paused_until.split("T")[0])
-        except ValueError:
-            paused_date = None
-        if paused_date and paused_date > today:
-            return False
-    days = parse_days_of_week(assignment.get("days_of_week"))
-    if days and today.weekday() not in days:
-        return False
-    return True
+# Evaluated per assignment row `a`; parameters are (today ISO date, today weekday).
+# Like parse_days_of_week, a days_of_week with no day 0-6 in it (NULL, empty,
+# malformed) means every day.
+ASSIGNMENT_ACTIVE_SQL = """
+    a.enabled = 1
+    AND COALESCE(date(substr(a.paused_until, 1, 10)) <= ?, 1)
+    AND (
+        SELECT instr(days, ',' || ? || ',') > 0
+            OR NOT (
+                instr(days, ',0,') OR instr(days, ',1,') OR instr(days, ',2,') OR instr(days, ',3,')
+                OR instr(days, ',4,') OR instr(days, ',5,') OR instr(days, ',6,')
+            )
+        FROM (SELECT ',' || REPLACE(COALESCE(a.days_of_week, ''), ' ', '') || ',' AS days)
+    )
+"""
 
 
-def fetch_assignments(conn, kid_id: int) -> List[Dict]:
+def fetch_assignments(conn, kid_id: int, today: date) -> List[Dict]:
     cursor = conn.cursor()
     cursor.execute(
-        """
+        f"""
         SELECT
             a.kid_id,
             a.deck_id,
@@ -82,21 +91,113 @@ def fetch_assignments(conn, kid_id: int) -> List[Dict]:
             a.new_cap,
             a.review_cap,
             a.paused_until,
-            d.name AS deck_name
+            d.name AS deck_name,
+            ({ASSIGNMENT_ACTIVE_SQL}) AS active
         FROM assignments a
         JOIN decks d ON d.id = a.deck_id
         WHERE a.kid_id = ? AND d.deleted_at IS NULL
         ORDER BY d.name
         """,
-        (kid_id,),
+        (today.isoformat(), today.weekday(), kid_id),
     )
     return [dict(row) for row in cursor.fetchall()]
 
 
-def fetch_due_cards(conn, kid_id: int, deck_id: int) -> List[Dict]:
+def fetch_today_queue(conn, kid_id: int, today: date) -> List[Dict]:
+    """Capped, ordered due cards across the kid's active assignments.
+
+    One statement: due candidates come from a range scan of card_progress
+    plus never-reviewed cards in active decks, assignments are checked by
+    primary key, and ROW_NUMBER() per deck and new-vs-review bucket applies
+    new_cap/review_cap. Only lightweight columns
+    are returned; fetch_queue_card loads the card that is actually shown.
+    """
+    today_day = today.toordinal()
     cursor = conn.cursor()
     cursor.execute(
-        """
+        f"""
+        WITH active AS (
+            SELECT a.deck_id
+            FROM assignments a
+            JOIN decks d ON d.id = a.deck_id
+            WHERE a.kid_id = ? AND d.deleted_at IS NULL AND {ASSIGNMENT_ACTIVE_SQL}
+        ),
+        due AS (
+            SELECT cp.card_id, cp.due_day, cp.mastery_status
+            FROM card_progress cp
+            WHERE cp.kid_id = ? AND cp.due_day <= ?
+            UNION ALL
+            SELECT fresh.id, NULL, 'new'
+            FROM active
+            JOIN cards fresh ON fresh.deck_id = active.deck_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM card_progress seen
+                WHERE seen.kid_id = ? AND seen.card_id = fresh.id
+            )
+        ),
+        ranked AS (
+            SELECT
+                c.id,
+                c.deck_id,
+                d.name AS deck_name,
+                d.review_mode,
+                a.new_cap,
+                a.review_cap,
+                COALESCE(due.due_day, ?) AS due_day,
+                due.mastery_status,
+                ROW_NUMBER() OVER (
+                    PARTITION BY c.deck_id, due.mastery_status = 'new'
+                    ORDER BY COALESCE(due.due_day, ?), c.id
+                ) AS bucket_rank
+            FROM due
+            JOIN cards c ON c.id = due.card_id
+            JOIN assignments a ON a.kid_id = ? AND a.deck_id = c.deck_id
+            JOIN decks d ON d.id = c.deck_id
+            LEFT JOIN texts t ON t.id = c.text_id
+            WHERE d.deleted_at IS NULL
+                AND {ASSIGNMENT_ACTIVE_SQL}
+                AND c.deleted_at IS NULL
+                AND (c.text_id IS NULL OR t.deleted_at IS NULL)
+                AND NOT EXISTS (
+                    SELECT 1 FROM reviews r
+                    WHERE r.kid_id = ? AND r.review_day = ? AND r.card_id = c.id
+                )
+        )
+        SELECT id, deck_id, deck_name, review_mode, due_day, mastery_status
+        FROM ranked
+        WHERE bucket_rank <= COALESCE(
+            MAX(CASE WHEN mastery_status = 'new' THEN new_cap ELSE review_cap END, 0),
+            bucket_rank
+        )
+        ORDER BY due_day, deck_name, id
+        """,
+        (
+            kid_id,
+            today.isoformat(),
+            today.weekday(),
+            kid_id,
+            today_day,
+            kid_id,
+            today_day,
+            today_day,
+            kid_id,
+            today.isoformat(),
+            today.weekday(),
+            kid_id,
+            today_day,
+        ),
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def fetch_queue_cards(conn, kid_id: int, card_ids: List[int]) -> List[Dict]:
+    """Full display rows (text, progress, tags) for queued cards, in the given order."""
+    if not card_ids:
+        return []
+    placeholders = ", ".join("?" for _ in card_ids)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
         SELECT
             c.*,
             COALESCE(cp.due_date, date('now')) AS due_date,
@@ -107,123 +208,319 @@ def fetch_due_cards(conn, kid_id: int, deck_id: int) -> List[Dict]:
             d.name AS deck_name,
             d.review_mode AS review_mode,
             t.title AS text_title,
-            (
-                SELECT COUNT(*) FROM cards c2 WHERE c2.text_id = c.text_id
-            ) AS text_total,
-            (
-                SELECT GROUP_CONCAT(t2.name, ',')
-                FROM card_tags ct2
-                JOIN tags t2 ON t2.id = ct2.tag_id
-                WHERE ct2.card_id = c.id
-            ) AS tags
+            COALESCE(t.chunk_count, 0) AS text_total,
+            c.tag_list AS tags
         FROM cards c
         JOIN decks d ON d.id = c.deck_id
         LEFT JOIN texts t ON t.id = c.text_id
         LEFT JOIN card_progress cp ON cp.card_id = c.id AND cp.kid_id = ?
-        WHERE c.deck_id = ?
-            AND date(COALESCE(cp.due_date, date('now'))) <= date('now')
-            AND c.deleted_at IS NULL
-            AND (c.text_id IS NULL OR t.deleted_at IS NULL)
-            AND NOT EXISTS (
-                SELECT 1 FROM reviews r
-                WHERE r.card_id = c.id
-                    AND r.kid_id = ?
-                    AND date(r.ts) = date('now')
-            )
-        ORDER BY date(COALESCE(cp.due_date, date('now'))) ASC, c.id ASC
+        WHERE c.id IN ({placeholders})
         """,
-        (kid_id, deck_id, kid_id),
+        (kid_id, *card_ids),
     )
-    cards = []
+    cards = {}
     for row in cursor.fetchall():
         card = dict(row)
         card["tags"] = [tag for tag in (card.get("tags") or "").split(",") if tag]
-        cards.append(card)
-    return cards
-
-
-def apply_caps(cards: List[Dict], new_cap: Optional[int], review_cap: Optional[int]) -> Tuple[List[Dict], int, int]:
-    new_cards = [card for card in cards if card.get("mastery_status") == "new"]
-    review_cards = [card for card in cards if card.get("mastery_status") != "new"]
-    if new_cap is not None:
-        new_cards = new_cards[: max(new_cap, 0)]
-    if review_cap is not None:
-        review_cards = review_cards[: max(review_cap, 0)]
-    selected = new_cards + review_cards
-    selected.sort(key=lambda card: (card.get("due_date") or "", card.get("deck_name") or "", card["id"]))
-    return selected, len(new_cards), len(review_cards)
-
-
-def build_today_queue(conn, kid_id: int) -> Tuple[List[Dict], List[Dict]]:
-    today = date.today()
-    assignments = fetch_assignments(conn, kid_id)
-    queue_cards: List[Dict] = []
+        cards[card["id"]] = card
+    return [cards[card_id] for card_id in card_ids if card_id in cards]
+
+
+def fetch_queue_card(conn, kid_id: int, card_id: int) -> Optional[Dict]:
+    cards = fetch_queue_cards(conn, kid_id, [card_id])
+    return cards[0] if cards else None
+
+
+def materialize_daily_queue(conn, kid_id: int, today: date) -> bool:
+    """Store the kid's ranked plan for today unless a current one exists. Returns True if built.
+
+    The plan is fetch_today_queue's result written to daily_queue under a
+    daily_queue_runs marker; triggers drop the marker when the inputs change.
+    Plans for earlier days are replaced.
+    """
+    day = today.toordinal()
+    marker_sql = "SELECT 1 FROM daily_queue_runs WHERE kid_id = ? AND day = ?"
+    if conn.execute(marker_sql, (kid_id, day)).fetchone():
+        return False
+    with database.write_transaction(conn):
+        if conn.execute(marker_sql, (kid_id, day)).fetchone():
+            return False
+        cards = fetch_today_queue(conn, kid_id, today)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM daily_queue WHERE kid_id = ?", (kid_id,))
+        cursor.execute("DELETE FROM daily_queue_runs WHERE kid_id = ?", (kid_id,))
+        cursor.executemany(
+            """
+            INSERT INTO daily_queue (kid_id, day, rank, card_id, deck_id, bucket, due_day)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    kid_id,
+                    day,
+                    rank,
+                    card["id"],
+                    card["deck_id"],
+                    "new" if card["mastery_status"] == "new" else "review",
+                    card["due_day"],
+                )
+                for rank, card in enumerate(cards, start=1)
+            ],
+        )
+        cursor.execute(
+            "INSERT INTO daily_queue_runs (kid_id, day, card_count) VALUES (?, ?, ?)",
+            (kid_id, day, len(cards)),
+        )
+    return True
+
+
+def fetch_daily_queue(conn, kid_id: int, today: date) -> List[Dict]:
+    """The kid's materialized plan for today, minus cards already reviewed today."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT dq.card_id AS id, dq.deck_id, d.name AS deck_name, d.review_mode, dq.due_day, dq.bucket
+        FROM daily_queue dq
+        JOIN decks d ON d.id = dq.deck_id
+        WHERE dq.kid_id = ? AND dq.day = ?
+            AND NOT EXISTS (
+                SELECT 1 FROM reviews r
+                WHERE r.kid_id = dq.kid_id AND r.review_day = dq.day AND r.card_id = dq.card_id
+            )
+        ORDER BY dq.rank
+        """,
+        (kid_id, today.toordinal()),
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def materialize_all_daily_queues(conn, today: Optional[date] = None) -> int:
+    """Build today's plan for every kid that lacks one (day rollover). Returns plans built."""
+    today = today or date.today()
+    kid_ids = [row[0] for row in conn.execute("SELECT id FROM kids WHERE deleted_at IS NULL ORDER BY id")]
+    return sum(materialize_daily_queue(conn, kid_id, today) for kid_id in kid_ids)
+
+
+def _materialize_all_in_background() -> int:
+    with database.get_background_conn() as conn:
+        return materialize_all_daily_queues(conn)
+
+
+async def daily_queue_rollover() -> None:
+    """Lifespan task: build every kid's plan at startup and just after each local midnight."""
+    while True:
+        try:
+            built = await run_in_db_thread(_materialize_all_in_background)
+            logger.info("Built %s daily queue(s)", built)
+        except Exception:
+            logger.exception("Daily queue rollover failed")
+        await asyncio.sleep(seconds_until_next_day() + 1)
+
+
+def build_today_queue(conn, kid_id: int, today: Optional[date] = None) -> Tuple[List[Dict], List[Dict]]:
+    today = today or date.today()
+    materialize_daily_queue(conn, kid_id, today)
+    assignments = fetch_assignments(conn, kid_id, today)
+    queue_cards = fetch_daily_queue(conn, kid_id, today)
+    counts: Dict[int, Dict[str, int]] = {}
+    for card in queue_cards:
+        deck_counts = counts.setdefault(card["deck_id"], {"new": 0, "review": 0})
+        deck_counts[card["bucket"]] += 1
     assignment_summaries: List[Dict] = []
     for assignment in assignments:
-        active = assignment_is_active(assignment, today)
-        deck_cards: List[Dict] = []
-        new_count = 0
-        review_count = 0
-        if active:
-            due_cards = fetch_due_cards(conn, kid_id, assignment["deck_id"])
-            deck_cards, new_count, review_count = apply_caps(
-                due_cards,
-                assignment.get("new_cap"),
-                assignment.get("review_cap"),
-            )
-            queue_cards.extend(deck_cards)
+        deck_counts = counts.get(assignment["deck_id"], {"new": 0, "review": 0})
         assignment_summaries.append(
             {
                 "deck_id": assignment["deck_id"],
                 "deck_name": assignment["deck_name"],
                 "enabled": bool(assignment.get("enabled")),
-                "active": active,
+                "active": bool(assignment["active"]),
                 "days_of_week": format_days_of_week(assignment.get("days_of_week")),
                 "new_cap": assignment.get("new_cap"),
                 "review_cap": assignment.get("review_cap"),
                 "paused_until": assignment.get("paused_until"),
-                "new_count": new_count,
-                "review_count": review_count,
-                "total_count": new_count + review_count,
+                "new_count": deck_counts["new"],
+                "review_count": deck_counts["review"],
+                "total_count": deck_counts["new"] + deck_counts["review"],
             }
         )
-    queue_cards.sort(key=lambda card: (card.get("due_date") or "", card.get("deck_name") or "", card["id"]))
     return assignment_summaries, queue_cards
 
 
-def get_recent_avg_duration(conn, kid_id: int) -> int:
+def next_today_cards(conn, kid_id: int, limit: int = 1) -> Tuple[List[Dict], List[Dict]]:
+    """Assignment summaries and the lightweight rows at the head of today's queue."""
+    assignments, queue_cards = build_today_queue(conn, kid_id)
+    return assignments, queue_cards[: max(limit, 0)]
+
+
+def next_today_card(conn, kid_id: int) -> Tuple[List[Dict], Optional[Dict]]:
+    """Assignment summaries and the full row of the card at the head of today's queue."""
+    assignments, head = next_today_cards(conn, kid_id)
+    card = fetch_queue_card(conn, kid_id, head[0]["id"]) if head else None
+    return assignments, card
+
+
+def load_upcoming_cards(conn, kid_id: int, limit: int, held_ids: List[int]) -> Tuple[List[Dict], bool]:
+    """Full rows for the prefetch batch the browser doesn't hold yet.
+
+    Returns (cards, append): when the ids the browser already holds are the
+    head of the queue only the rest of the batch is loaded and appended;
+    otherwise the whole batch is loaded and replaces what it holds.
+    """
+    _, head = next_today_cards(conn, kid_id, limit)
+    head_ids = [card["id"] for card in head]
+    append = bool(held_ids) and head_ids[: len(held_ids)] == held_ids
+    missing = head_ids[len(held_ids):] if append else head_ids
+    return fetch_queue_cards(conn, kid_id, missing), append
+
+
+def parse_card_ids(value: Optional[str]) -> List[int]:
+    ids: List[int] = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if item.isdigit():
+            ids.append(int(item))
+    return ids
+
+
+def card_view_context(card: Dict, hint_mode: str) -> Dict:
+    """Mode-specific text for partials/today_card.html, computed once per card."""
+    review_mode = card.get("review_mode") or "free_recall"
+    return {
+        "card": card,
+        "review_mode": review_mode,
+        "hint_text": build_hint_text(card["full_text"], hint_mode) if review_mode == "free_recall" else "",
+        "masked_text": build_cloze_text(card["full_text"]) if review_mode == "cloze" else "",
+        "initials_text": build_first_letters_text(card["full_text"]) if review_mode == "first_letters" else "",
+    }
+
+
+def fetch_household_today(conn, today: Optional[date] = None) -> List[Dict]:
+    """Today's capped new/review counts and time estimate for every kid.
+
+    One grouped statement over assignments x cards x card_progress (the
+    per-kid queue build would be one windowed query per kid). Counts follow
+    fetch_today_queue: due or never-seen cards in active assignments, minus
+    cards reviewed today, with new_cap/review_cap applied per deck. Time
+    estimates come from the stored duration averages (utils.durations): the
+    mean per-card estimate of each deck's due new and review cards times the
+    capped counts.
+    """
+    today = today or date.today()
+    today_day = today.toordinal()
     cursor = conn.cursor()
     cursor.execute(
-        """
-        SELECT AVG(duration_seconds) AS avg_duration
-        FROM (
-            SELECT duration_seconds
-            FROM reviews
-            WHERE kid_id = ? AND duration_seconds IS NOT NULL
-            ORDER BY ts DESC
-            LIMIT 20
+        f"""
+        WITH active AS (
+            SELECT a.kid_id, a.deck_id, d.name AS deck_name, a.new_cap, a.review_cap
+            FROM assignments a
+            JOIN kids k ON k.id = a.kid_id
+            JOIN decks d ON d.id = a.deck_id
+            WHERE k.deleted_at IS NULL AND d.deleted_at IS NULL AND {ASSIGNMENT_ACTIVE_SQL}
+        ),
+        due_counts AS (
+            SELECT
+                active.kid_id,
+                active.deck_id,
+                SUM(cp.card_id IS NULL OR cp.mastery_status = 'new') AS new_due,
+                SUM(cp.card_id IS NOT NULL AND cp.mastery_status != 'new') AS review_due,
+                AVG(CASE WHEN cp.card_id IS NULL OR cp.mastery_status = 'new'
+                    THEN COALESCE(cp.duration_ewma, dd.duration_ewma) END) AS new_seconds,
+                AVG(CASE WHEN cp.card_id IS NOT NULL AND cp.mastery_status != 'new'
+                    THEN COALESCE(cp.duration_ewma, dd.duration_ewma) END) AS review_seconds
+            FROM active
+            JOIN cards c ON c.deck_id = active.deck_id
+            LEFT JOIN texts t ON t.id = c.text_id
+            LEFT JOIN card_progress cp ON cp.kid_id = active.kid_id AND cp.card_id = c.id
+            LEFT JOIN deck_durations dd ON dd.kid_id = active.kid_id AND dd.deck_id = active.deck_id
+            WHERE c.deleted_at IS NULL
+                AND (c.text_id IS NULL OR t.deleted_at IS NULL)
+                AND (cp.card_id IS NULL OR cp.due_day <= ?)
+                AND NOT EXISTS (
+                    SELECT 1 FROM reviews r
+                    WHERE r.kid_id = active.kid_id AND r.review_day = ? AND r.card_id = c.id
+                )
+            GROUP BY active.kid_id, active.deck_id
         )
+        SELECT
+            k.id AS kid_id,
+            k.name AS kid_name,
+            active.deck_id,
+            active.deck_name,
+            CASE WHEN active.new_cap IS NULL THEN COALESCE(due_counts.new_due, 0)
+                 ELSE MIN(COALESCE(due_counts.new_due, 0), MAX(active.new_cap, 0)) END AS new_count,
+            CASE WHEN active.review_cap IS NULL THEN COALESCE(due_counts.review_due, 0)
+                 ELSE MIN(COALESCE(due_counts.review_due, 0), MAX(active.review_cap, 0)) END AS review_count,
+            due_counts.new_seconds,
+            due_counts.review_seconds,
+            {KID_PACE_SQL.format(kid_id="k.id")} AS pace
+        FROM kids k
+        LEFT JOIN active ON active.kid_id = k.id
+        LEFT JOIN due_counts ON due_counts.kid_id = active.kid_id AND due_counts.deck_id = active.deck_id
+        WHERE k.deleted_at IS NULL
+        ORDER BY k.name, active.deck_name
         """,
-        (kid_id,),
+        (today.isoformat(), today.weekday(), today_day, today_day),
     )
-    row = cursor.fetchone()
-    if not row or row[0] is None:
-        return 30
-    return max(int(row[0]), 1)
+    kids: Dict[int, Dict] = {}
+    for row in cursor.fetchall():
+        kid = kids.get(row["kid_id"])
+        if kid is None:
+            kid = kids[row["kid_id"]] = {
+                "id": row["kid_id"],
+                "name": row["kid_name"],
+                "assignments": [],
+                "total_due": 0,
+                "estimated_seconds": 0.0,
+                "pace": row["pace"] or DEFAULT_DURATION_SECONDS,
+            }
+        if row["deck_id"] is None:
+            continue
+        total = row["new_count"] + row["review_count"]
+        kid["estimated_seconds"] += row["new_count"] * (row["new_seconds"] or kid["pace"])
+        kid["estimated_seconds"] += row["review_count"] * (row["review_seconds"] or kid["pace"])
+        kid["assignments"].append(
+            {
+                "deck_id": row["deck_id"],
+                "deck_name": row["deck_name"],
+                "new_count": row["new_count"],
+                "review_count": row["review_count"],
+                "total_count": total,
+            }
+        )
+        kid["total_due"] += total
+    for kid in kids.values():
+        kid["estimated_seconds"] = int(round(kid.pop("estimated_seconds")))
+        pace = kid.pop("pace")
+        kid["avg_duration"] = round(kid["estimated_seconds"] / kid["total_due"]) if kid["total_due"] else round(pace)
+    return list(kids.values())
+
+
+@router.get("/today", response_class=HTMLResponse)
+async def household_today(request: Request, db: AsyncDatabase = Depends(get_async_db)):
+    """Every kid's due counts on one page (wall-tablet dashboard)."""
+    kids = await db.run(fetch_household_today)
+    return templates.TemplateResponse("household_today.html", {"request": request, "kids": kids})
+
+
+# Registered before /today/{kid_id} so "overview" isn't parsed as a kid id.
+@router.get("/today/overview", response_class=HTMLResponse)
+async def household_today_overview(request: Request, db: AsyncDatabase = Depends(get_async_db)):
+    """Refresh target for the household page."""
+    kids = await db.run(fetch_household_today)
+    return templates.TemplateResponse("partials/household_today.html", {"request": request, "kids": kids})
 
 
 @router.get("/today/{kid_id}", response_class=HTMLResponse)
-async def today_view(kid_id: int, request: Request, conn=Depends(get_db)):
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM kids WHERE id = ? AND deleted_at IS NULL", (kid_id,))
-    kid_row = cursor.fetchone()
+async def today_view(kid_id: int, request: Request, db: AsyncDatabase = Depends(get_async_db)):
+    kid_row = await db.fetchone("SELECT id, name FROM kids WHERE id = ? AND deleted_at IS NULL", (kid_id,))
     if not kid_row:
         raise HTTPException(status_code=404, detail="Kid not found")
     kid = {"id": kid_row[0], "name": kid_row[1]}
-    assignments, queue_cards = build_today_queue(conn, kid_id)
+    assignments, queue_cards = await db.run(build_today_queue, kid_id)
     total_due = len(queue_cards)
-    avg_duration = get_recent_avg_duration(conn, kid_id)
-    estimated_seconds = total_due * avg_duration
+    estimated_seconds = await db.run(estimate_card_seconds, kid_id, queue_cards)
+    avg_duration = round(estimated_seconds / total_due) if total_due else DEFAULT_DURATION_SECONDS
     return templates.TemplateResponse(
         "today.html",
         {
@@ -239,8 +536,8 @@ async def today_view(kid_id: int, request: Request, conn=Depends(get_db)):
 
 
 @router.get("/today/{kid_id}/queue", response_class=HTMLResponse)
-async def today_queue(kid_id: int, request: Request, conn=Depends(get_db)):
-    assignments, queue_cards = build_today_queue(conn, kid_id)
+async def today_queue(kid_id: int, request: Request, db: AsyncDatabase = Depends(get_async_db)):
+    assignments, queue_cards = await db.run(build_today_queue, kid_id)
     return templates.TemplateResponse(
         "partials/today_queue.html",
         {
@@ -252,34 +549,25 @@ async def today_queue(kid_id: int, request: Request, conn=Depends(get_db)):
 
 
 @router.get("/today/{kid_id}/next", response_class=HTMLResponse)
-async def today_next_card(kid_id: int, request: Request, conn=Depends(get_db)):
+async def today_next_card(kid_id: int, request: Request, db: AsyncDatabase = Depends(get_async_db)):
     hint_mode = normalize_hint_mode(request.query_params.get("hint_mode"))
-    assignments, queue_cards = build_today_queue(conn, kid_id)
-    if not queue_cards:
+    assignments, card = await db.run(next_today_card, kid_id)
+    if not card:
         return templates.TemplateResponse(
             "partials/today_no_cards.html",
             {"request": request, "kid_id": kid_id},
         )
-    card = queue_cards[0]
-    review_mode = card.get("review_mode") or "free_recall"
-    hint_text = build_hint_text(card["full_text"], hint_mode) if review_mode == "free_recall" else ""
-    masked_text = build_cloze_text(card["full_text"]) if review_mode == "cloze" else ""
-    initials_text = build_first_letters_text(card["full_text"]) if review_mode == "first_letters" else ""
     return templates.TemplateResponse(
         "partials/today_card.html",
         {
             "request": request,
-            "card": card,
+            **card_view_context(card, hint_mode),
             "kid_id": kid_id,
             "deck_id": card["deck_id"],
             "hint_mode": hint_mode,
-            "hint_text": hint_text,
             "hint_modes": HINT_MODE_OPTIONS,
             "started_at": datetime.now(timezone.utc).isoformat(),
             "assignments": assignments,
-            "review_mode": review_mode,
-            "masked_text": masked_text,
-            "initials_text": initials_text,
         },
     )
 
@@ -294,28 +582,20 @@ async def submit_today_review(
     hint_mode: str = Form("none"),
     parent_grade: Optional[str] = Form(None),
     started_at: Optional[str] = Form(None),
-    conn=Depends(get_db),
+    prefetched: Optional[str] = Form(None),
+    db: AsyncDatabase = Depends(get_async_db),
 ):
     config = load_config()
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT c.*, d.review_mode
-        FROM cards c
-        JOIN decks d ON d.id = c.deck_id
-        WHERE c.id = ? AND c.deleted_at IS NULL AND d.deleted_at IS NULL
-        """,
-        (card_id,),
-    )
-    card_row = cursor.fetchone()
-    if not card_row:
+    card_row = await db.fetchone("SELECT * FROM cards WHERE id = ? AND deleted_at IS NULL", (card_id,))
+    deck = await cached_deck(db, card_row["deck_id"]) if card_row else None
+    if deck is None:
         raise HTTPException(status_code=404, detail="Card not found")
     card = dict(card_row)
     if card["deck_id"] != deck_id:
         raise HTTPException(status_code=400, detail="Deck does not match card")
     full_text = card["full_text"]
     hint_mode = normalize_hint_mode(hint_mode)
-    review_mode = card.get("review_mode") or "free_recall"
+    review_mode = deck.review_mode
     if review_mode == "recitation":
         require_parent_session(request)
         if parent_grade is None:
@@ -336,73 +616,41 @@ async def submit_today_review(
         auto_grade = None
         final_grade = grade
         graded_by = "parent"
+        llm_status = None
     else:
-        auto_grade = grade_recall(full_text, user_text, config)
+        # Borderline answers are confirmed by the LLM in the background.
+        auto_grade, llm_status = grade_recall_deferred(full_text, user_text, config)
         final_grade = auto_grade
         graded_by = "auto"
         quality = map_grade_to_quality(final_grade)
-    progress = get_card_progress(conn, kid_id, card_id) or default_progress()
-    new_interval, new_ef, new_streak, new_due = update_sm2(
-        progress.interval_days, progress.ease_factor, quality, progress.streak
-    )
-    mastery_rules = get_deck_mastery_rules(conn, card["deck_id"])
-    mastery_status = mastery_status_from_rules(
-        new_streak,
-        new_ef,
-        new_interval,
-        mastery_rules,
-    )
-    review_ts = datetime.now(timezone.utc).isoformat()
-    duration_seconds = None
-    if started_at:
-        try:
-            started = datetime.fromisoformat(started_at)
-            if started.tzinfo is None:
-                started = started.replace(tzinfo=timezone.utc)
-            duration_seconds = max(0, int((datetime.now(timezone.utc) - started).total_seconds()))
-        except ValueError:
-            duration_seconds = None
-    cursor.execute(
-        """
-        INSERT INTO reviews (
-            card_id,
-            kid_id,
-            grade,
-            auto_grade,
-            final_grade,
-            graded_by,
-            review_mode,
-            user_text,
-            hint_mode,
-            duration_seconds
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            card_id,
-            kid_id,
-            final_grade,
-            auto_grade,
-            final_grade,
-            graded_by,
-            review_mode,
-            user_text,
-            hint_mode,
-            duration_seconds,
-        ),
-    )
-    upsert_card_progress(
-        conn,
+    review_id = await db.run(
+        record_review,
         kid_id=kid_id,
         card_id=card_id,
-        interval_days=new_interval,
-        due_date=new_due.isoformat(),
-        ease_factor=new_ef,
-        streak=new_streak,
-        mastery_status=mastery_status,
-        last_review_ts=review_ts,
+        deck_id=card["deck_id"],
+        quality=quality,
+        final_grade=final_grade,
+        auto_grade=auto_grade,
+        graded_by=graded_by,
+        review_mode=review_mode,
+        user_text=user_text,
+        hint_mode=hint_mode,
+        duration_seconds=parse_duration_seconds(started_at),
+        llm_status=llm_status,
+        balance_target=balance_target(config),
     )
-    conn.commit()
+    if llm_status == "pending":
+        LLM_JOBS.submit(review_id)
+    prefetch_limit = config["today"]["prefetch_cards"]
+    upcoming_cards: List[Dict] = []
+    append_upcoming = False
+    if prefetch_limit > 0:
+        # The next cards travel with this response as out-of-band templates, so
+        # "Next Card" swaps locally instead of making another round trip.
+        cards, append_upcoming = await db.run(
+            load_upcoming_cards, kid_id, prefetch_limit, parse_card_ids(prefetched)
+        )
+        upcoming_cards = [card_view_context(card, hint_mode) for card in cards]
     color_class = {
         "perfect": "bg-green-100 border-green-400 text-green-800",
         "good": "bg-yellow-100 border-yellow-400 text-yellow-800",
@@ -420,5 +668,11 @@ async def submit_today_review(
             "deck_id": deck_id,
             "hint_mode": hint_mode,
             "review_mode": review_mode,
+            "review_id": review_id,
+            "llm_status": llm_status,
+            "hint_modes": HINT_MODE_OPTIONS,
+            "prefetch_enabled": prefetch_limit > 0,
+            "upcoming_cards": upcoming_cards,
+            "append_upcoming": append_upcoming,
         },
     )
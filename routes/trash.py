@@ -4,13 +4,15 @@ from fastapi.templating import Jinja2Templates
 from pathlib import Path
 from db.database import get_db
 from utils.auth import require_parent_session
+from utils.deck_cache import DECK_CACHE
+from utils.review_sessions import REVIEW_SESSIONS
 
 router = APIRouter(dependencies=[Depends(require_parent_session)])
 base_dir = Path(__file__).resolve().parent.parent
 templates = Jinja2Templates(directory=str(base_dir / "templates"))
 
 @router.get("/", response_class=HTMLResponse)
-async def trash_index(request: Request, conn = Depends(get_db)):
+def trash_index(request: Request, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("SELECT id, name, deleted_at FROM kids WHERE deleted_at IS NOT NULL ORDER BY deleted_at DESC")
     kids = [dict(row) for row in cursor.fetchall()]
@@ -50,7 +52,7 @@ async def trash_index(request: Request, conn = Depends(get_db)):
     )
 
 @router.post("/kids/{kid_id}/restore")
-async def restore_kid(kid_id: int, conn = Depends(get_db)):
+def restore_kid(kid_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("UPDATE kids SET deleted_at = NULL WHERE id = ?", (kid_id,))
     if cursor.rowcount == 0:
@@ -59,7 +61,7 @@ async def restore_kid(kid_id: int, conn = Depends(get_db)):
     return RedirectResponse(url="/trash", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/kids/{kid_id}/purge")
-async def purge_kid(kid_id: int, conn = Depends(get_db)):
+def purge_kid(kid_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("DELETE FROM kids WHERE id = ?", (kid_id,))
     if cursor.rowcount == 0:
@@ -68,7 +70,7 @@ async def purge_kid(kid_id: int, conn = Depends(get_db)):
     return RedirectResponse(url="/trash", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/decks/{deck_id}/restore")
-async def restore_deck(deck_id: int, conn = Depends(get_db)):
+def restore_deck(deck_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("UPDATE decks SET deleted_at = NULL WHERE id = ?", (deck_id,))
     if cursor.rowcount == 0:
@@ -76,10 +78,12 @@ async def restore_deck(deck_id: int, conn = Depends(get_db)):
     cursor.execute("UPDATE cards SET deleted_at = NULL WHERE deck_id = ?", (deck_id,))
     cursor.execute("UPDATE texts SET deleted_at = NULL WHERE deck_id = ?", (deck_id,))
     conn.commit()
+    REVIEW_SESSIONS.invalidate_deck(deck_id)
+    DECK_CACHE.invalidate_deck(deck_id)
     return RedirectResponse(url="/trash", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/decks/{deck_id}/purge")
-async def purge_deck(deck_id: int, conn = Depends(get_db)):
+def purge_deck(deck_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("DELETE FROM cards WHERE deck_id = ?", (deck_id,))
     cursor.execute("DELETE FROM texts WHERE deck_id = ?", (deck_id,))
@@ -88,10 +92,12 @@ async def purge_deck(deck_id: int, conn = Depends(get_db)):
     if cursor.rowcount == 0:
         raise HTTPException(status_code=404, detail="Deck not found")
     conn.commit()
+    REVIEW_SESSIONS.invalidate_deck(deck_id)
+    DECK_CACHE.invalidate_deck(deck_id)
     return RedirectResponse(url="/trash", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/cards/{card_id}/restore")
-async def restore_card(card_id: int, conn = Depends(get_db)):
+def restore_card(card_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute(
         "SELECT deck_id, text_id FROM cards WHERE id = ? AND deleted_at IS NOT NULL",
@@ -108,19 +114,21 @@ async def restore_card(card_id: int, conn = Depends(get_db)):
     if card["text_id"]:
         cursor.execute("UPDATE texts SET deleted_at = NULL WHERE id = ?", (card["text_id"],))
     conn.commit()
+    REVIEW_SESSIONS.invalidate_deck(card["deck_id"])
     return RedirectResponse(url="/trash", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/cards/{card_id}/purge")
-async def purge_card(card_id: int, conn = Depends(get_db)):
+def purge_card(card_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("DELETE FROM cards WHERE id = ?", (card_id,))
     if cursor.rowcount == 0:
         raise HTTPException(status_code=404, detail="Card not found")
     conn.commit()
+    REVIEW_SESSIONS.invalidate_all()
     return RedirectResponse(url="/trash", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/texts/{text_id}/restore")
-async def restore_text(text_id: int, conn = Depends(get_db)):
+def restore_text(text_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("SELECT deck_id FROM texts WHERE id = ? AND deleted_at IS NOT NULL", (text_id,))
     text = cursor.fetchone()
@@ -133,14 +141,16 @@ async def restore_text(text_id: int, conn = Depends(get_db)):
     cursor.execute("UPDATE texts SET deleted_at = NULL WHERE id = ?", (text_id,))
     cursor.execute("UPDATE cards SET deleted_at = NULL WHERE text_id = ?", (text_id,))
     conn.commit()
+    REVIEW_SESSIONS.invalidate_deck(text["deck_id"])
     return RedirectResponse(url="/trash", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/texts/{text_id}/purge")
-async def purge_text(text_id: int, conn = Depends(get_db)):
+def purge_text(text_id: int, conn = Depends(get_db)):
     cursor = conn.cursor()
     cursor.execute("DELETE FROM cards WHERE text_id = ?", (text_id,))
     cursor.execute("DELETE FROM texts WHERE id = ?", (text_id,))
     if cursor.rowcount == 0:
         raise HTTPException(status_code=404, detail="Text not found")
     conn.commit()
+    REVIEW_SESSIONS.invalidate_all()
     return RedirectResponse(url="/trash", status_code=status.HTTP_303_SEE_OTHER)
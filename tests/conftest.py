@@ -1,8 +1,85 @@
 from __future__ import annotations
 
+import sqlite3
 import sys
 from pathlib import Path
 
+import pytest
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
+
+import config  # noqa: E402
+from db import database  # noqa: E402
+from db.migrations import run_migrations  # noqa: E402
+from utils.reviews import record_review  # noqa: E402
+
+
+@pytest.fixture
+def use_tmp_db(tmp_path, monkeypatch):
+    """Point config and the connection pool at a fresh .memcoach dir under tmp_path.
+
+    Call it with extra config.toml text; it returns the config dir.
+    """
+    def _use(extra_config: str = "") -> Path:
+        config_dir = tmp_path / ".memcoach"
+        config_dir.mkdir()
+        config_path = config_dir / "config.toml"
+        config_path.write_text("[grading]\nuse_llm_on_borderline = false\n" + extra_config, encoding="utf-8")
+        monkeypatch.setattr(config, "CONFIG_DIR", config_dir)
+        monkeypatch.setattr(config, "CONFIG_PATH", config_path)
+        monkeypatch.setattr(database, "CONFIG_DIR", config_dir)
+        monkeypatch.setattr(database, "DB_PATH", config_dir / "memcoach.db")
+        monkeypatch.setattr(database, "BACKUP_DIR", config_dir / "backups")
+        database.close_pool()
+        return config_dir
+
+    yield _use
+    database.close_pool()
+
+
+@pytest.fixture
+def memory_db():
+    """Build migrated in-memory databases: kid 1 assigned deck 1 with cards 1..cards."""
+    # Module caches hold deck rows and review sessions keyed by ids every one of these reuses.
+    database.close_pool()
+
+    def _build(cards: int = 3, scheduler: str = "sm2") -> sqlite3.Connection:
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        run_migrations(conn)
+        conn.execute("INSERT INTO kids (id, name) VALUES (1, 'Ada')")
+        conn.execute("INSERT INTO decks (id, name, scheduler) VALUES (1, 'Psalms', ?)", (scheduler,))
+        conn.execute("INSERT INTO assignments (kid_id, deck_id) VALUES (1, 1)")
+        for card_id in range(1, cards + 1):
+            conn.execute(
+                "INSERT INTO cards (id, deck_id, prompt, full_text, position) VALUES (?, 1, ?, 'text', ?)",
+                (card_id, f"Card {card_id}", card_id),
+            )
+        return conn
+
+    return _build
+
+
+@pytest.fixture
+def pending_review():
+    """Record an auto-graded 'good' review of a kid 1 card whose LLM check is still pending."""
+    def _record(conn: sqlite3.Connection, card_id: int) -> int:
+        return record_review(
+            conn,
+            kid_id=1,
+            card_id=card_id,
+            deck_id=1,
+            quality=3,
+            final_grade="good",
+            auto_grade="good",
+            graded_by="auto",
+            review_mode="free_recall",
+            user_text="txt",
+            hint_mode="none",
+            duration_seconds=None,
+            llm_status="pending",
+        )
+
+    return _record
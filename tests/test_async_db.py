@@ -0,0 +1,29 @@
+import asyncio
+import threading
+
+from db import database
+from db.async_db import get_async_db
+
+
+def test_async_db_runs_queries_off_the_event_loop(use_tmp_db):
+    use_tmp_db("\n[database]\npool_size = 2\n")
+
+    async def scenario():
+        loop_thread = threading.current_thread().name
+        dependency = get_async_db()
+        db = await dependency.__anext__()
+        try:
+            await db.execute("CREATE TABLE t (x INTEGER)")
+            await db.execute("INSERT INTO t VALUES (?)", (7,))
+            await db.commit()
+            row = await db.fetchone("SELECT x FROM t")
+            worker_thread = await db.run(lambda conn: threading.current_thread().name)
+        finally:
+            await dependency.aclose()
+        return loop_thread, worker_thread, row[0]
+
+    loop_thread, worker_thread, value = asyncio.run(scenario())
+    assert value == 7
+    assert worker_thread != loop_thread
+    assert worker_thread.startswith("memcoach-db")
+    assert database.get_pool_stats()["in_use"] == 0
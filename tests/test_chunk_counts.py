@@ -0,0 +1,29 @@
+import sqlite3
+
+from db.migrations import run_migrations
+
+
+def test_chunk_count_tracks_insert_soft_delete_restore_and_purge():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("PRAGMA foreign_keys = ON")
+    run_migrations(conn)
+    conn.execute("INSERT INTO decks (id, name) VALUES (1, 'Psalms')")
+    conn.execute("INSERT INTO texts (id, deck_id, title, full_text) VALUES (1, 1, 'Psalm 23', 'text')")
+    for index in (1, 2, 3):
+        conn.execute(
+            "INSERT INTO cards (deck_id, prompt, full_text, text_id, chunk_index) VALUES (1, ?, 'line', 1, ?)",
+            (f"Part {index}", index),
+        )
+
+    def chunk_count() -> int:
+        return conn.execute("SELECT chunk_count FROM texts WHERE id = 1").fetchone()[0]
+
+    assert chunk_count() == 3
+    conn.execute("UPDATE cards SET deleted_at = datetime('now') WHERE chunk_index = 2")
+    assert chunk_count() == 2
+    conn.execute("UPDATE cards SET deleted_at = NULL WHERE text_id = 1")
+    assert chunk_count() == 3
+    conn.execute("UPDATE cards SET position = 9 WHERE chunk_index = 1")
+    assert chunk_count() == 3
+    conn.execute("DELETE FROM cards WHERE chunk_index = 3")
+    assert chunk_count() == 2
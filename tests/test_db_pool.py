@@ -0,0 +1,79 @@
+import sqlite3
+
+from db import database
+
+
+def test_pooled_connection_is_reused_in_wal_mode(use_tmp_db):
+    use_tmp_db("\n[database]\nsynchronous = \"FULL\"\ncache_size = -4000\nbusy_timeout = 2500\ntemp_store = \"MEMORY\"\n")
+    with database.get_conn() as conn:
+        first_id = id(conn)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -4000
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 2500
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    with database.get_conn() as conn:
+        assert id(conn) == first_id
+
+    stats = database.get_pool_stats()
+    assert stats["open"] == 1
+    assert stats["in_use"] == 0
+    assert stats["acquired"] == 2
+
+
+def test_released_connection_rolls_back_uncommitted_work(use_tmp_db):
+    use_tmp_db()
+    with database.get_conn() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+    with database.get_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_pool_waits_then_times_out_when_exhausted(use_tmp_db):
+    use_tmp_db("\n[database]\npool_size = 1\npool_timeout = 0.05\n")
+    pool = database.get_pool()
+    held = pool.acquire()
+    try:
+        try:
+            pool.acquire()
+        except database.sqlite3.OperationalError as exc:
+            assert "Timed out" in str(exc)
+        else:
+            raise AssertionError("expected pool timeout")
+    finally:
+        pool.release(held)
+    stats = database.get_pool_stats()
+    assert stats["timeouts"] == 1
+    assert stats["max_size"] == 1
+
+
+def test_background_connection_leaves_the_pool_free(use_tmp_db):
+    use_tmp_db("\n[database]\npool_size = 1\npool_timeout = 0.05\n")
+    with database.get_conn():
+        with database.get_background_conn() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    stats = database.get_pool_stats()
+    assert (stats["open"], stats["waits"], stats["timeouts"]) == (1, 0, 0)
+
+
+def test_restore_copies_into_the_live_database(tmp_path, use_tmp_db):
+    use_tmp_db()
+    source = tmp_path / "backup.db"
+    source_conn = sqlite3.connect(source)
+    source_conn.execute("CREATE TABLE t (x INTEGER)")
+    source_conn.executemany("INSERT INTO t VALUES (?)", [(n,) for n in range(100)])
+    source_conn.commit()
+    source_conn.close()
+    with database.get_conn() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        # A request still holding its connection keeps working across the restore.
+        database.restore_database(source)
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 100
+    with database.get_conn() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
@@ -0,0 +1,40 @@
+from utils import deck_cache
+from utils.deck_cache import DeckMetadataCache
+
+
+def test_deck_metadata_is_cached_until_invalidated(memory_db):
+    conn = memory_db()
+    cache = DeckMetadataCache()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert cache.get(conn, 1).review_mode == "free_recall"
+    assert cache.get(conn, 1).mastery_rules["consecutive_grades"] == 3
+    assert cache.peek(1) is not None and len(statements) == 1
+    conn.set_trace_callback(None)
+    assert cache.get(conn, 99) is None and cache.peek(99) is None
+
+    conn.execute("UPDATE decks SET review_mode = 'cloze' WHERE id = 1")
+    assert cache.get(conn, 1).review_mode == "free_recall"
+    cache.invalidate_deck(1)
+    assert cache.get(conn, 1).review_mode == "cloze"
+    conn.execute("UPDATE decks SET deleted_at = datetime('now') WHERE id = 1")
+    cache.invalidate_all()
+    assert cache.get(conn, 1) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"], stats["entries"]) == (3, 4, 2, 0)
+
+
+
+def test_deck_loads_racing_an_invalidation_are_not_stored(monkeypatch, memory_db):
+    conn = memory_db()
+    cache = DeckMetadataCache()
+    load = deck_cache.load_deck_metadata
+
+    def racing_load(conn, deck_id):
+        deck = load(conn, deck_id)
+        cache.invalidate_deck(deck_id)
+        return deck
+
+    monkeypatch.setattr(deck_cache, "load_deck_metadata", racing_load)
+    assert cache.get(conn, 1).name == "Psalms"
+    assert cache.stats()["entries"] == 0 and cache.stats()["discarded_loads"] == 1
@@ -0,0 +1,307 @@
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+
+from routes.review import resolve_review_card_ids, review_filters
+from routes.today import (
+    build_today_queue,
+    fetch_household_today,
+    fetch_today_queue,
+    materialize_daily_queue,
+    next_today_card,
+)
+from utils.days import day_number, sql_day_number
+from utils.durations import record_duration
+from utils.load_balance import due_counts, fuzz_window
+from utils.progress import rebuild_card_progress, replay_card_progress, upsert_card_progress
+from utils.reviews import BatchReview, record_review, record_review_batch
+
+
+def _query_plan(conn: sqlite3.Connection, run) -> str:
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        run()
+    finally:
+        conn.set_trace_callback(None)
+    rows = conn.execute("EXPLAIN QUERY PLAN " + statements[-1]).fetchall()
+    return "\n".join(row[3] for row in rows)
+
+
+def _table_scans(plan: str) -> list:
+    # Scans of materialized CTEs (due, ranked) are fine; scans of base tables are not.
+    tables = {"a", "c", "cp", "d", "r", "t", "fresh", "seen"}
+    return [line for line in plan.splitlines() if line.startswith("SCAN ") and line.split()[1] in tables]
+
+
+def test_sql_day_number_matches_python_ordinal():
+    conn = sqlite3.connect(":memory:")
+    for value in ("2024-02-29", "1999-12-31 23:59:59", "2030-01-01T00:00:00+00:00"):
+        sql_value = conn.execute(f"SELECT {sql_day_number('?')}", (value,)).fetchone()[0]
+        assert sql_value == day_number(value)
+
+
+def test_review_day_backfill_reads_both_timestamp_formats():
+    conn = sqlite3.connect(":memory:")
+    local_day = sql_day_number("?", "'localtime'")
+    for value in ("2024-03-01 23:30:00", "2024-03-01T23:30:00+00:00"):
+        utc = datetime(2024, 3, 1, 23, 30, tzinfo=timezone.utc)
+        expected = utc.astimezone().date().toordinal()
+        assert conn.execute(f"SELECT {local_day}", (value,)).fetchone()[0] == expected
+
+
+def test_due_queue_uses_due_day_range_scan(memory_db):
+    conn = memory_db()
+    today = date.today()
+    for card_id, due in ((1, today - timedelta(days=2)), (2, today + timedelta(days=5))):
+        upsert_card_progress(
+            conn,
+            kid_id=1,
+            card_id=card_id,
+            interval_days=3,
+            due_date=due.isoformat(),
+            ease_factor=2.5,
+            streak=1,
+            mastery_status="learning",
+            last_review_ts=None,
+        )
+
+    due_ids = [card["id"] for card in fetch_today_queue(conn, 1, today)]
+    assert due_ids == [1, 3]
+
+    for run in (
+        lambda: fetch_today_queue(conn, 1, today),
+        lambda: resolve_review_card_ids(conn, 1, 1, today.toordinal(), review_filters(False, None, None), "seed"),
+    ):
+        plan = _query_plan(conn, run)
+        assert "idx_card_progress_kid_due_day (kid_id=? AND due_day<?)" in plan
+        assert "idx_reviews_kid_day_card (kid_id=? AND review_day=? AND card_id=?)" in plan
+        assert _table_scans(plan) == []
+
+
+def test_load_balancing_moves_due_dates_to_lighter_days(memory_db):
+    conn = memory_db()
+    today = date.today()
+    assert fuzz_window(1) == (1, 1)
+    assert fuzz_window(6) == (4, 8)
+    # Day offsets 4..8 of the first review's window hold 5, 10, 10, 2 and 0 other cards.
+    card_id = 4
+    for offset, count in ((4, 5), (5, 10), (6, 10), (7, 2)):
+        for _ in range(count):
+            conn.execute(
+                "INSERT INTO cards (id, deck_id, prompt, full_text, position) VALUES (?, 1, 'x', 'text', ?)",
+                (card_id, card_id),
+            )
+            upsert_card_progress(
+                conn,
+                kid_id=1,
+                card_id=card_id,
+                interval_days=offset,
+                due_date=(today + timedelta(days=offset)).isoformat(),
+                ease_factor=2.5,
+                streak=1,
+                mastery_status="learning",
+                last_review_ts=None,
+            )
+            card_id += 1
+
+    def review(card, target):
+        record_review(
+            conn,
+            kid_id=1,
+            card_id=card,
+            deck_id=1,
+            quality=4,
+            final_grade="perfect",
+            auto_grade="perfect",
+            graded_by="auto",
+            review_mode="free_recall",
+            user_text="text",
+            hint_mode="none",
+            duration_seconds=None,
+            balance_target=target,
+        )
+        return conn.execute(
+            """
+            SELECT p.interval_days, p.due_date, r.due_offset_days
+            FROM card_progress p JOIN reviews r ON r.kid_id = p.kid_id AND r.card_id = p.card_id
+            WHERE p.card_id = ?
+            """,
+            (card,),
+        ).fetchone()
+
+    # SM-2 gives a first perfect review 6 days; day 7 is the nearest under the target of 3.
+    # The interval stays SM-2's; only the due date moves.
+    assert tuple(review(1, 3)) == (6, (today + timedelta(days=7)).isoformat(), 1)
+    # A target of 0 always takes the least loaded day.
+    assert tuple(review(2, 0)) == (6, (today + timedelta(days=8)).isoformat(), 2)
+    assert tuple(review(3, None)) == (6, (today + timedelta(days=6)).isoformat(), 0)
+    # Replays and rebuilds put balanced cards back on the day they were moved to.
+    assert replay_card_progress(conn, 1, 1).due_date == (today + timedelta(days=7)).isoformat()
+    rebuild_card_progress(conn, 1)
+    due_dates = conn.execute("SELECT card_id, due_date FROM card_progress WHERE card_id <= 3 ORDER BY card_id")
+    assert [row[1] for row in due_dates] == [(today + timedelta(days=offset)).isoformat() for offset in (7, 8, 6)]
+    assert due_counts(conn, 1, today.toordinal() + 4, today.toordinal() + 8) == {
+        today.toordinal() + offset: count for offset, count in ((4, 5), (5, 10), (6, 11), (7, 3), (8, 1))
+    }
+    plan = _query_plan(conn, lambda: due_counts(conn, 1, 0, 1))
+    assert "COVERING INDEX idx_card_progress_kid_due_day (kid_id=? AND due_day>? AND due_day<?)" in plan
+
+
+def test_batch_reviews_balance_each_step_and_replay_to_the_same_day(memory_db):
+    conn = memory_db()
+    first = datetime.combine(date.today() - timedelta(days=10), datetime.min.time(), timezone.utc) + timedelta(hours=12)
+    second = first + timedelta(days=4)
+    base_first, base_second = first.date().toordinal(), second.date().toordinal()
+    # Two cards on each day around SM-2's 6 and then 15 days, so a target of 1 pushes both reviews early.
+    card_id = 4
+    for day in [base_first + offset for offset in (5, 6, 7)] + [base_second + offset for offset in (14, 15, 16)]:
+        for _ in range(2):
+            conn.execute("INSERT INTO cards (id, deck_id, prompt, full_text) VALUES (?, 1, 'x', 'text')", (card_id,))
+            upsert_card_progress(
+                conn,
+                kid_id=1,
+                card_id=card_id,
+                interval_days=1,
+                due_date=date.fromordinal(day).isoformat(),
+                ease_factor=2.5,
+                streak=1,
+                mastery_status="learning",
+                last_review_ts=None,
+            )
+            card_id += 1
+    conn.commit()
+    reviews = [
+        BatchReview(f"r{n}", 1, 1, at, 4, "perfect", "perfect", "auto", "free_recall", "text", "none", None)
+        for n, at in enumerate((first, second))
+    ]
+    record_review_batch(conn, 1, reviews, balance_target=1)
+    offsets = conn.execute("SELECT due_offset_days FROM reviews WHERE card_id = 1 ORDER BY ts").fetchall()
+    assert [row[0] for row in offsets] == [-2, -2]
+    progress = conn.execute("SELECT interval_days, due_day FROM card_progress WHERE card_id = 1").fetchone()
+    assert tuple(progress) == (15, base_second + 13)
+
+    rebuild_card_progress(conn)
+    assert conn.execute("SELECT due_day FROM card_progress WHERE card_id = 1").fetchone()[0] == base_second + 13
+
+
+def test_reviewed_today_cards_leave_the_queue(memory_db):
+    conn = memory_db()
+    today = date.today()
+    conn.execute(
+        "INSERT INTO reviews (card_id, kid_id, ts, review_day, grade) VALUES (1, 1, ?, ?, 'good')",
+        (f"{today.isoformat()}T08:00:00", today.toordinal()),
+    )
+    conn.execute(
+        "INSERT INTO reviews (card_id, kid_id, ts, review_day, grade) VALUES (2, 1, ?, ?, 'good')",
+        ("2000-01-01 08:00:00", date(2000, 1, 1).toordinal()),
+    )
+    assert [card["id"] for card in fetch_today_queue(conn, 1, today)] == [2, 3]
+
+
+def test_today_queue_applies_caps_and_assignment_activity_in_sql(memory_db):
+    conn = memory_db()
+    today = date.today()
+    upsert_card_progress(
+        conn,
+        kid_id=1,
+        card_id=3,
+        interval_days=1,
+        due_date=today.isoformat(),
+        ease_factor=2.5,
+        streak=1,
+        mastery_status="learning",
+        last_review_ts=None,
+    )
+    conn.execute("UPDATE assignments SET new_cap = 1, review_cap = 5")
+    summaries, queue = build_today_queue(conn, 1)
+    assert [(card["id"], card["bucket"]) for card in queue] == [(1, "new"), (3, "review")]
+    assert (summaries[0]["new_count"], summaries[0]["review_count"]) == (1, 1)
+
+    tomorrow = today + timedelta(days=1)
+    conn.execute("UPDATE assignments SET paused_until = ?", (tomorrow.isoformat(),))
+    assert fetch_today_queue(conn, 1, today) == []
+    conn.execute("UPDATE assignments SET paused_until = NULL, days_of_week = ?", (str(tomorrow.weekday()),))
+    summaries, queue = build_today_queue(conn, 1)
+    assert queue == [] and summaries[0]["active"] is False
+    conn.execute("UPDATE assignments SET days_of_week = ?", (f"{tomorrow.weekday()}, {today.weekday()}",))
+    assert len(fetch_today_queue(conn, 1, today)) == 2
+    # No valid weekday in the list falls back to every day, as parse_days_of_week does.
+    for days_of_week in ("", " ", "mon,tue", "7, 9"):
+        conn.execute("UPDATE assignments SET days_of_week = ?", (days_of_week,))
+        summaries, queue = build_today_queue(conn, 1)
+        assert len(queue) == 2 and summaries[0]["active"] is True
+
+
+def test_daily_queue_is_materialized_and_invalidated_by_triggers(memory_db, pending_review):
+    conn = memory_db()
+    today = date.today()
+    assert materialize_daily_queue(conn, 1, today)
+    assert not materialize_daily_queue(conn, 1, today)
+    plan = conn.execute("SELECT rank, card_id, bucket FROM daily_queue WHERE kid_id = 1 ORDER BY rank").fetchall()
+    assert [tuple(row) for row in plan] == [(1, 1, "new"), (2, 2, "new"), (3, 3, "new")]
+
+    pending_review(conn, 1)
+    assert [card["id"] for card in build_today_queue(conn, 1, today)[1]] == [2, 3]
+    assert not materialize_daily_queue(conn, 1, today)
+
+    conn.execute("INSERT INTO cards (id, deck_id, prompt, full_text, position) VALUES (4, 1, 'Card 4', 'text', 4)")
+    assert materialize_daily_queue(conn, 1, today)
+    conn.execute("UPDATE assignments SET new_cap = 1")
+    assert [card["id"] for card in build_today_queue(conn, 1, today)[1]] == [2]
+    conn.execute("UPDATE cards SET deleted_at = datetime('now') WHERE id = 4")
+    assert materialize_daily_queue(conn, 1, today)
+
+
+def test_household_overview_matches_each_kids_queue(memory_db):
+    conn = memory_db()
+    today = date.today()
+    conn.execute("INSERT INTO kids (id, name) VALUES (2, 'Ben'), (3, 'Cy')")
+    conn.execute("INSERT INTO assignments (kid_id, deck_id, new_cap) VALUES (2, 1, 1)")
+    upsert_card_progress(
+        conn,
+        kid_id=1,
+        card_id=2,
+        interval_days=1,
+        due_date=today.isoformat(),
+        ease_factor=2.5,
+        streak=1,
+        mastery_status="learning",
+        last_review_ts=None,
+    )
+    conn.execute(
+        "INSERT INTO reviews (card_id, kid_id, review_day, grade, duration_seconds) VALUES (3, 1, ?, 'good', 12)",
+        (today.toordinal(),),
+    )
+    record_duration(conn, 1, 3, 1, 12)
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    overview = {kid["name"]: kid for kid in fetch_household_today(conn, today)}
+    conn.set_trace_callback(None)
+    assert len(statements) == 1
+
+    for kid_id, name in ((1, "Ada"), (2, "Ben")):
+        summaries, queue = build_today_queue(conn, kid_id, today)
+        expected = [(a["deck_name"], a["new_count"], a["review_count"]) for a in summaries]
+        got = [(a["deck_name"], a["new_count"], a["review_count"]) for a in overview[name]["assignments"]]
+        assert got == expected and overview[name]["total_due"] == len(queue)
+    assert overview["Ada"]["estimated_seconds"] == 2 * 12
+    assert overview["Cy"]["assignments"] == [] and overview["Cy"]["avg_duration"] == 30
+
+
+def test_next_today_card_reads_the_materialized_plan(memory_db):
+    conn = memory_db()
+    today = date.today()
+    assignments, card = next_today_card(conn, 1)
+    assert card["id"] == 1 and assignments[0]["total_count"] == 3
+
+    conn.execute(
+        "INSERT INTO reviews (card_id, kid_id, review_day, grade) VALUES (1, 1, ?, 'good')",
+        (today.toordinal(),),
+    )
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assignments, card = next_today_card(conn, 1)
+    conn.set_trace_callback(None)
+    assert card["id"] == 2 and assignments[0]["new_count"] == 2
+    assert not any("INSERT INTO daily_queue" in statement for statement in statements)
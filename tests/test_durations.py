@@ -0,0 +1,19 @@
+from utils.durations import estimate_card_seconds, record_duration
+
+
+def test_duration_averages_estimate_per_card_then_deck(memory_db, pending_review):
+    conn = memory_db()
+    conn.execute("INSERT INTO decks (id, name) VALUES (2, 'Catechism')")
+    conn.execute("INSERT INTO cards (id, deck_id, prompt, full_text) VALUES (4, 2, 'Q1', 'A1'), (5, 2, 'Q2', 'A2')")
+    cards = [{"id": card_id} for card_id in (1, 2, 4, 5)]
+    assert estimate_card_seconds(conn, 1, cards) == 4 * 30
+
+    for seconds in (60, 100):
+        pending_review(conn, 1)
+        record_duration(conn, 1, 1, 1, seconds)
+    record_duration(conn, 1, 4, 2, 5)
+    card_avg = conn.execute("SELECT duration_ewma FROM card_progress WHERE card_id = 1").fetchone()[0]
+    deck = conn.execute("SELECT duration_ewma, samples FROM deck_durations WHERE deck_id = 1").fetchone()
+    assert card_avg == 60 + 0.3 * (100 - 60) and tuple(deck) == (card_avg, 2)
+    # card 1 and 2 use deck 1's average, cards 4 and 5 use deck 2's.
+    assert estimate_card_seconds(conn, 1, cards) == round(2 * card_avg + 2 * 5)
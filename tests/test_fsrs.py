@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.fsrs import (
+    DEFAULT_WEIGHTS,
+    build_histories,
+    fit_weights,
+    log_loss,
+    memory_step,
+    next_interval,
+    replay_histories,
+    retrievability,
+    review_step,
+)
+from utils.fsrs_jobs import kids_due_for_fit, save_kid_weights
+from utils.progress import rebuild_card_progress, replay_card_progress
+from utils.reviews import record_review
+from utils.schedulers import FsrsScheduler, MemoryState, scheduler_lookup
+
+
+def _synthetic_sequences(weights, cards: int, reviews: int, seed: int = 0):
+    """(reviewed_at, rating) sequences whose recalls are drawn from the model with `weights`."""
+    rng = np.random.default_rng(seed)
+    sequences = []
+    for _ in range(cards):
+        reviewed_at = datetime(2024, 1, 1)
+        stability, difficulty = review_step(weights, None, None, None, 3)
+        sequence = [(reviewed_at, 3)]
+        for _ in range(reviews - 1):
+            elapsed = next_interval(stability) * rng.uniform(0.5, 3.0)
+            reviewed_at += timedelta(days=elapsed)
+            recalled = rng.random() < retrievability(elapsed, stability)
+            rating = (4 if rng.random() < 0.3 else 3) if recalled else 1
+            stability, difficulty = review_step(weights, stability, difficulty, elapsed, rating)
+            sequence.append((reviewed_at, rating))
+        sequences.append(sequence)
+    return sequences
+
+
+def test_review_step_matches_the_batched_model():
+    rng = np.random.default_rng(3)
+    for _ in range(200):
+        stability, difficulty, elapsed = rng.uniform(0.1, 200), rng.uniform(1, 10), rng.uniform(0, 300)
+        rating = int(rng.choice([1, 2, 3, 4]))
+        batched = memory_step(DEFAULT_WEIGHTS, stability, difficulty, elapsed, rating)
+        assert np.allclose(review_step(DEFAULT_WEIGHTS, stability, difficulty, elapsed, rating), batched)
+
+    scheduler = FsrsScheduler()
+    first = scheduler.step(MemoryState(), 3, None)
+    recalled = scheduler.step(first, 3, first.interval_days)
+    forgot = scheduler.step(first, 0, first.interval_days)
+    assert recalled.stability > first.stability > forgot.stability
+    assert recalled.interval_days > first.interval_days
+    assert forgot.streak == 0 and forgot.interval_days == 1
+
+
+def test_fit_recovers_weights_closer_to_the_generating_ones():
+    true_weights = np.array(DEFAULT_WEIGHTS)
+    true_weights[[0, 2, 8, 11]] = [1.5, 8.0, 1.2, 3.0]
+    histories = build_histories(_synthetic_sequences(true_weights, cards=150, reviews=6))
+
+    default_loss = float(log_loss(replay_histories(DEFAULT_WEIGHTS, histories)[0], histories))
+    true_loss = float(log_loss(replay_histories(true_weights, histories)[0], histories))
+    weights, fitted_loss = fit_weights(histories, iterations=25)
+
+    assert fitted_loss < default_loss
+    assert fitted_loss - true_loss < (default_loss - true_loss) / 2
+    assert len(weights) == len(DEFAULT_WEIGHTS)
+
+
+def test_fsrs_deck_reviews_carry_stability_and_replay_from_snapshots(memory_db):
+    conn = memory_db(cards=1, scheduler="fsrs")
+    review_ids = [
+        record_review(
+            conn,
+            kid_id=1,
+            card_id=1,
+            deck_id=1,
+            quality=quality,
+            final_grade=grade,
+            auto_grade=grade,
+            graded_by="auto",
+            review_mode="free_recall",
+            user_text="txt",
+            hint_mode="none",
+            duration_seconds=None,
+        )
+        for quality, grade in ((3, "good"), (4, "perfect"), (0, "fail"))
+    ]
+    # Space the reviews out so elapsed days matter to the model.
+    for offset, review_id in enumerate(review_ids):
+        conn.execute("UPDATE reviews SET ts = ? WHERE id = ?", (f"2024-03-{1 + offset * 5:02d}T10:00:00+00:00", review_id))
+    full = replay_card_progress(conn, 1, 1)
+    assert full.stability is not None and full.difficulty is not None
+    snapshot = conn.execute(
+        "SELECT after_stability, after_difficulty, after_interval_days FROM reviews WHERE id = ?", (review_ids[-1],)
+    ).fetchone()
+    assert tuple(snapshot) == (full.stability, full.difficulty, full.interval_days)
+
+    tail = replay_card_progress(conn, 1, 1, from_review_id=review_ids[1])
+    assert tail == full
+    conn.execute("DELETE FROM card_progress")
+    rebuild_card_progress(conn)
+    row = conn.execute("SELECT stability, difficulty, interval_days FROM card_progress").fetchone()
+    assert tuple(row) == (full.stability, full.difficulty, full.interval_days)
+
+    conn.execute("UPDATE decks SET scheduler = 'sm2'")
+    assert replay_card_progress(conn, 1, 1).stability is None
+
+
+def test_fitted_weights_are_used_and_refits_wait_for_growth(memory_db):
+    conn = memory_db(cards=1, scheduler="fsrs")
+    conn.executemany(
+        "INSERT INTO reviews (card_id, kid_id, ts, grade) VALUES (1, 1, ?, 'good')",
+        [(f"2024-01-01T00:{minute:02d}:00",) for minute in range(50)] * 5,
+    )
+    assert kids_due_for_fit(conn) == [1]
+
+    weights = list(DEFAULT_WEIGHTS)
+    weights[2] = 9.0
+    save_kid_weights(conn, 1, weights, reviews=250, loss=0.3)
+    assert kids_due_for_fit(conn) == []
+    assert scheduler_lookup(conn)(1, 1).weights == tuple(weights)
@@ -0,0 +1,32 @@
+import contextlib
+
+from utils.llm_jobs import apply_llm_verdict, confirm_review_with_llm
+
+
+def test_background_llm_verdicts_update_pending_reviews(memory_db, pending_review):
+    conn = memory_db()
+    changed, confirmed, overridden, failed = (pending_review(conn, card_id) for card_id in (1, 2, 3, 3))
+    before = conn.execute("SELECT ease_factor FROM card_progress WHERE card_id = 1").fetchone()[0]
+
+    assert apply_llm_verdict(conn, changed, "perfect") == "changed"
+    assert apply_llm_verdict(conn, confirmed, "fail") == "confirmed"
+    conn.execute("UPDATE reviews SET graded_by = 'parent' WHERE id = ?", (overridden,))
+    assert apply_llm_verdict(conn, overridden, "perfect") == "skipped"
+    assert apply_llm_verdict(conn, failed, None) == "failed"
+    assert apply_llm_verdict(conn, changed, "good") is None
+
+    row = conn.execute("SELECT final_grade, auto_grade FROM reviews WHERE id = ?", (changed,)).fetchone()
+    assert tuple(row) == ("perfect", "perfect")
+    after = conn.execute("SELECT ease_factor FROM card_progress WHERE card_id = 1").fetchone()[0]
+    assert after > before
+
+
+
+def test_llm_confirmation_skips_reviews_no_longer_pending(monkeypatch, memory_db, pending_review):
+    conn = memory_db()
+    monkeypatch.setattr("utils.llm_jobs.database.get_background_conn", lambda: contextlib.nullcontext(conn))
+    calls = []
+    review_id = pending_review(conn, 1)
+    conn.execute("UPDATE reviews SET llm_status = 'confirmed' WHERE id = ?", (review_id,))
+    assert confirm_review_with_llm(review_id, lambda *args: calls.append(args)) is None
+    assert calls == []
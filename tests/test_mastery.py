@@ -0,0 +1,28 @@
+from utils.mastery import mastery_status_from_rules, reevaluate_deck_mastery
+
+
+def test_mastery_reevaluation_matches_the_python_rules_in_one_update(memory_db):
+    conn = memory_db()
+    conn.execute("INSERT INTO kids (id, name) VALUES (2, 'Ben')")
+    conn.executemany(
+        "INSERT INTO card_progress (kid_id, card_id, streak, ease_factor, interval_days, mastery_status) "
+        "VALUES (?, ?, ?, ?, ?, 'learning')",
+        [(1, 1, 0, 2.5, 1), (1, 2, 4, 2.6, 10), (1, 3, 2, 2.6, 10), (2, 1, 5, 2.2, 30), (2, 2, 3, 2.5, 7)],
+    )
+    rules = {"consecutive_grades": 2, "min_ease_factor": 2.3, "min_interval_days": 8}
+    expected = {
+        (row["kid_id"], row["card_id"]): mastery_status_from_rules(
+            row["streak"], row["ease_factor"], row["interval_days"], rules
+        )
+        for row in conn.execute("SELECT * FROM card_progress")
+    }
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert reevaluate_deck_mastery(conn, 1, rules) == 3
+    conn.set_trace_callback(None)
+    # Queue-marker trigger steps are traced under the same statement text.
+    assert len(set(statements)) == 1 and statements[0].lstrip().startswith("UPDATE card_progress")
+    statuses = {(row[0], row[1]): row[2] for row in conn.execute("SELECT kid_id, card_id, mastery_status FROM card_progress")}
+    assert statuses == expected
+    assert reevaluate_deck_mastery(conn, 1, rules) == 0
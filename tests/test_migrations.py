@@ -0,0 +1,143 @@
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+from db import database
+from db.migrations import MIGRATIONS, run_migrations
+from db.schema import SCHEMA_VERSION
+from utils.durations import rebuild_durations
+from utils.progress import rebuild_card_progress
+
+
+def test_latest_migration_matches_schema_version():
+    assert MIGRATIONS[-1].version == SCHEMA_VERSION
+
+
+def test_fresh_init_applies_migrations_once(use_tmp_db):
+    use_tmp_db()
+    applied = database.init_db()
+    assert applied and applied[-1].version == SCHEMA_VERSION
+
+    with database.get_conn() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            assert run_migrations(conn) == []
+        finally:
+            conn.set_trace_callback(None)
+    assert statements == ["PRAGMA user_version"]
+
+
+def test_legacy_database_is_upgraded(use_tmp_db):
+    config_dir = use_tmp_db()
+    legacy = sqlite3.connect(config_dir / "memcoach.db")
+    legacy.executescript(
+        """
+        CREATE TABLE kids (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, created_at TEXT);
+        CREATE TABLE decks (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, description TEXT);
+        CREATE TABLE cards (
+            id INTEGER PRIMARY KEY,
+            deck_id INTEGER NOT NULL,
+            prompt TEXT NOT NULL,
+            full_text TEXT NOT NULL,
+            interval_days INTEGER NOT NULL DEFAULT 1,
+            due_date TEXT NOT NULL DEFAULT (date('now')),
+            ease_factor REAL NOT NULL DEFAULT 2.5,
+            streak INTEGER NOT NULL DEFAULT 0
+        );
+        INSERT INTO decks (id, name) VALUES (1, 'Psalms');
+        INSERT INTO cards (id, deck_id, prompt, full_text) VALUES (1, 1, 'Psalm 23', 'The Lord is my shepherd');
+        """
+    )
+    legacy.close()
+
+    applied = database.init_db()
+    assert [step.version for step in applied] == [m.version for m in MIGRATIONS]
+    with database.get_conn() as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cards)")}
+        assert {"mastery_status", "position", "deleted_at", "text_id"} <= columns
+        position = conn.execute("SELECT position FROM cards WHERE id = 1").fetchone()[0]
+        assert position == 1
+        hits = conn.execute("SELECT rowid FROM cards_fts WHERE cards_fts MATCH 'shepherd'").fetchall()
+        assert [row[0] for row in hits] == [1]
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+
+def test_progress_backfill_matches_the_python_replay(use_tmp_db):
+    config_dir = use_tmp_db()
+    legacy = sqlite3.connect(config_dir / "memcoach.db")
+    legacy.executescript(
+        """
+        CREATE TABLE kids (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, created_at TEXT);
+        CREATE TABLE decks (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, description TEXT);
+        CREATE TABLE cards (
+            id INTEGER PRIMARY KEY,
+            deck_id INTEGER NOT NULL,
+            prompt TEXT NOT NULL,
+            full_text TEXT NOT NULL,
+            due_date TEXT NOT NULL DEFAULT (date('now'))
+        );
+        CREATE TABLE reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            card_id INTEGER NOT NULL,
+            kid_id INTEGER NOT NULL,
+            ts TEXT NOT NULL DEFAULT (datetime('now')),
+            grade TEXT NOT NULL,
+            duration_seconds INTEGER
+        );
+        INSERT INTO kids (id, name) VALUES (1, 'Ada'), (2, 'Ben');
+        INSERT INTO decks (id, name) VALUES (1, 'Psalms');
+        INSERT INTO cards (id, deck_id, prompt, full_text) VALUES (1, 1, 'A', 'a'), (2, 1, 'B', 'b'), (3, 1, 'C', 'c');
+        """
+    )
+    rng = random.Random(7)
+    rows = []
+    for kid_id in (1, 2):
+        for card_id in (1, 2, 3):
+            start = datetime(2024, 1, 1, 8) + timedelta(days=card_id)
+            for n in range(25):
+                grade = rng.choice(["perfect", "perfect", "good", "good", "fail"])
+                duration = rng.choice([None, 0, 12, 45, 900])
+                rows.append((card_id, kid_id, start + timedelta(days=n * 3, minutes=rng.randrange(600)), grade, duration))
+    # Offline syncs land older reviews after newer ones.
+    rng.shuffle(rows)
+    legacy.executemany(
+        "INSERT INTO reviews (card_id, kid_id, ts, grade, duration_seconds) VALUES (?, ?, ?, ?, ?)",
+        [(card, kid, at.strftime("%Y-%m-%d %H:%M:%S"), grade, duration) for card, kid, at, grade, duration in rows],
+    )
+    legacy.commit()
+    legacy.close()
+
+    database.init_db()
+    progress_sql = (
+        "SELECT kid_id, card_id, interval_days, due_date, due_day, ease_factor, streak, mastery_status, "
+        "last_review_ts, duration_ewma FROM card_progress ORDER BY kid_id, card_id"
+    )
+    snapshot_sql = (
+        "SELECT id, after_interval_days, after_ease_factor, after_streak, after_due_date, after_mastery_status "
+        "FROM reviews ORDER BY id"
+    )
+    with database.get_conn() as conn:
+        backfilled = [tuple(row) for row in conn.execute(progress_sql)]
+        snapshots = [tuple(row) for row in conn.execute(snapshot_sql)]
+        assert len(backfilled) == 6 and all(row[1] is not None for row in snapshots)
+        conn.execute("DELETE FROM card_progress")
+        conn.execute("UPDATE reviews SET after_interval_days = NULL")
+        rebuild_card_progress(conn)
+        rebuild_durations(conn)
+        assert [tuple(row) for row in conn.execute(progress_sql)] == backfilled
+        assert [tuple(row) for row in conn.execute(snapshot_sql)] == snapshots
+
+
+def test_iso_review_timestamps_are_rewritten_in_sqlite_format(memory_db):
+    conn = memory_db()
+    conn.executemany(
+        "INSERT INTO reviews (card_id, kid_id, ts, grade) VALUES (1, 1, ?, 'good')",
+        [("2024-05-02T09:00:00.250000+00:00",), ("2024-05-02 08:00:00",), ("2024-05-02T10:30:00+02:00",)],
+    )
+    conn.execute("PRAGMA user_version = 21")
+    conn.commit()
+    run_migrations(conn)
+    rows = conn.execute("SELECT ts FROM reviews ORDER BY ts").fetchall()
+    assert [row[0] for row in rows] == ["2024-05-02 08:00:00", "2024-05-02 08:30:00", "2024-05-02 09:00:00"]
@@ -0,0 +1,67 @@
+from utils.progress import compute_progress_from_reviews, rebuild_card_progress, replay_card_progress
+
+
+def test_rebuild_matches_per_card_replay_with_late_synced_reviews(memory_db):
+    conn = memory_db()
+    reviews = [
+        (1, "2024-03-01 10:00:00", "good"),
+        (2, "2024-03-01 10:01:00", "fail"),
+        (1, "2024-03-05 10:00:00", "perfect"),
+        (2, "2024-03-04 10:00:00", "good"),
+        # Synced from an offline device after the later reviews were logged.
+        (2, "2024-03-02 10:00:00", "perfect"),
+        (3, "2024-03-03 10:00:00", "fail"),
+    ]
+    conn.executemany(
+        "INSERT INTO reviews (card_id, kid_id, ts, grade) VALUES (?, 1, ?, ?)", reviews
+    )
+    conn.execute("DELETE FROM card_progress")
+
+    assert rebuild_card_progress(conn) == 3
+    for card_id in (1, 2, 3):
+        expected = compute_progress_from_reviews(conn, 1, card_id)
+        row = conn.execute(
+            "SELECT interval_days, ease_factor, streak, due_date, mastery_status, last_review_ts"
+            " FROM card_progress WHERE kid_id = 1 AND card_id = ?",
+            (card_id,),
+        ).fetchone()
+        assert tuple(row) == (
+            expected.interval_days,
+            expected.ease_factor,
+            expected.streak,
+            expected.due_date,
+            expected.mastery_status,
+            expected.last_review_ts,
+        )
+    assert conn.execute("SELECT last_review_ts FROM card_progress WHERE card_id = 2").fetchone()[0] == "2024-03-04 10:00:00"
+    latest = conn.execute(
+        "SELECT after_interval_days, after_ease_factor, after_streak FROM reviews"
+        " WHERE card_id = 2 AND ts = '2024-03-04 10:00:00'"
+    ).fetchone()
+    expected = compute_progress_from_reviews(conn, 1, 2)
+    assert tuple(latest) == (expected.interval_days, expected.ease_factor, expected.streak)
+
+
+def test_override_replays_from_the_previous_review_snapshot(memory_db, pending_review):
+    conn = memory_db()
+    first, middle, last = (pending_review(conn, 1) for _ in range(3))
+    snapshot_sql = (
+        "SELECT after_interval_days, after_ease_factor, after_streak, after_due_date, after_mastery_status"
+        " FROM reviews WHERE id = ?"
+    )
+    progress_sql = (
+        "SELECT interval_days, ease_factor, streak, due_date, mastery_status FROM card_progress WHERE card_id = 1"
+    )
+    assert tuple(conn.execute(snapshot_sql, (last,)).fetchone()) == tuple(conn.execute(progress_sql).fetchone())
+
+    # A tail replay trusts the first review's snapshot, so this grade edit is not seen.
+    conn.execute("UPDATE reviews SET grade = 'fail', final_grade = 'fail' WHERE id = ?", (first,))
+    conn.execute("UPDATE reviews SET grade = 'perfect', final_grade = 'perfect' WHERE id = ?", (middle,))
+    tail = replay_card_progress(conn, 1, 1, from_review_id=middle)
+    assert tail.streak == 3
+    assert tuple(conn.execute(snapshot_sql, (last,)).fetchone())[:3] == (tail.interval_days, tail.ease_factor, 3)
+
+    full = replay_card_progress(conn, 1, 1)
+    assert full.streak == 2
+    assert conn.execute(snapshot_sql, (first,)).fetchone()[2] == 0
+    assert conn.execute(progress_sql).fetchone()[2] == 2
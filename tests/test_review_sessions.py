@@ -0,0 +1,49 @@
+from datetime import date
+
+from routes.review import get_next_card_for_review, resolve_review_card_ids, review_filters
+from utils.review_sessions import ReviewSessionStore, seeded_shuffle
+from utils.tags import set_card_tags
+
+
+def test_filtered_review_session_searches_once(monkeypatch, memory_db):
+    conn = memory_db()
+    sessions = ReviewSessionStore()
+    monkeypatch.setattr("routes.review.REVIEW_SESSIONS", sessions)
+    set_card_tags(conn, 2, ["easy"])
+    set_card_tags(conn, 3, ["easy"])
+    filters = {"search_query": "text", "tag_filters": ["easy"]}
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    session, card = get_next_card_for_review(conn, 1, 1, **filters)
+    conn.execute(
+        "INSERT INTO reviews (card_id, kid_id, review_day, grade) VALUES (?, 1, ?, 'good')",
+        (card["id"], date.today().toordinal()),
+    )
+    resumed, second = get_next_card_for_review(conn, 1, 1, session_id=session.id, **filters)
+    conn.set_trace_callback(None)
+
+    assert resumed is session
+    assert {card["id"], second["id"]} == {2, 3}
+    assert sum("MATCH" in sql for sql in statements) == 1
+    sessions.discard_card(session, second["id"])
+    assert get_next_card_for_review(conn, 1, 1, session_id=session.id, **filters)[1] is None
+
+    sessions.invalidate_deck(1)
+    fresh, _ = get_next_card_for_review(conn, 1, 1, session_id=session.id, **filters)
+    assert fresh.id != session.id
+
+
+def test_seeded_shuffle_is_reproducible_within_due_days(memory_db):
+    rows = [(card_id, 10 if card_id % 2 else 11) for card_id in range(1, 41)]
+    first = seeded_shuffle(rows, "abc")
+    assert first == seeded_shuffle(list(reversed(rows)), "abc")
+    assert first != seeded_shuffle(rows, "xyz")
+    assert all(card_id % 2 for card_id in first[:20]) and first[:20] != sorted(first[:20])
+
+    conn = memory_db()
+    filters = review_filters(False, None, None)
+    today = date.today().toordinal()
+    assert resolve_review_card_ids(conn, 1, 1, today, filters, "abc") == seeded_shuffle(
+        [(1, today), (2, today), (3, today)], "abc"
+    )
@@ -1,11 +1,12 @@
 from pathlib import Path
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone
 
 from fastapi.testclient import TestClient
 
 import config
 from db import database
 from main import app
+from utils.hints import build_cloze_text
 
 
 def _write_test_config(config_path: Path) -> None:
@@ -87,3 +88,87 @@ def test_review_submit_renders_result_partial(tmp_path, monkeypatch):
         assert row["streak"] == 1
         assert row["mastery_status"] == "learning"
         assert row["due_date"] == (date.today() + timedelta(days=6)).isoformat()
+
+
+def test_today_submit_carries_prefetched_next_cards(use_tmp_db):
+    use_tmp_db()
+    database.init_db()
+    with database.get_conn() as conn:
+        cursor = conn.cursor()
+        kid_id = cursor.execute("INSERT INTO kids (name) VALUES ('Ada')").lastrowid
+        deck_id = cursor.execute("INSERT INTO decks (name, review_mode) VALUES ('Psalms', 'cloze')").lastrowid
+        cursor.execute("INSERT INTO assignments (kid_id, deck_id) VALUES (?, ?)", (kid_id, deck_id))
+        card_ids = [
+            cursor.execute(
+                "INSERT INTO cards (deck_id, prompt, full_text) VALUES (?, ?, 'The Lord is my shepherd')",
+                (deck_id, f"Verse {number}"),
+            ).lastrowid
+            for number in (1, 2, 3)
+        ]
+        conn.commit()
+
+    client = TestClient(app)
+
+    def submit(card_id: int, prefetched: str):
+        return client.post(
+            f"/today/{kid_id}/submit?deck_id={deck_id}&card_id={card_id}",
+            data={"user_text": "The Lord is my shepherd", "prefetched": prefetched},
+        )
+
+    body = submit(card_ids[0], "").text
+    assert 'id="today-upcoming" hx-swap-oob="innerHTML"' in body
+    assert f'data-card-id="{card_ids[1]}"' in body and f'data-card-id="{card_ids[2]}"' in body
+    assert body.count(build_cloze_text("The Lord is my shepherd")) == 2
+
+    body = submit(card_ids[1], str(card_ids[2])).text
+    assert 'hx-swap-oob="beforeend"' in body
+    assert "today-upcoming-card" not in body
+
+    body = submit(card_ids[2], "").text
+    assert "All done for today!" in body
+
+
+def test_review_batch_is_idempotent_and_applies_reviews_in_order(use_tmp_db):
+    use_tmp_db()
+    database.init_db()
+    with database.get_conn() as conn:
+        cursor = conn.cursor()
+        kid_id = cursor.execute("INSERT INTO kids (name) VALUES ('Ada')").lastrowid
+        deck_id = cursor.execute("INSERT INTO decks (name) VALUES ('Math')").lastrowid
+        first = cursor.execute(
+            "INSERT INTO cards (deck_id, prompt, full_text) VALUES (?, '1+1?', '2')", (deck_id,)
+        ).lastrowid
+        second = cursor.execute(
+            "INSERT INTO cards (deck_id, prompt, full_text) VALUES (?, '2+2?', '4')", (deck_id,)
+        ).lastrowid
+        conn.commit()
+
+    payload = {
+        "kid_id": kid_id,
+        "reviews": [
+            {"client_id": "b", "card_id": first, "reviewed_at": "2024-05-02T09:00:00+00:00", "user_text": "2"},
+            {"client_id": "a", "card_id": first, "reviewed_at": "2024-05-01T09:00:00+00:00", "user_text": "2"},
+            {"client_id": "c", "card_id": second, "reviewed_at": "2024-05-01T09:05:00+00:00", "user_text": "5"},
+            {"client_id": "d", "card_id": 9999, "reviewed_at": "2024-05-01T09:06:00+00:00", "user_text": "x"},
+        ],
+    }
+    client = TestClient(app)
+    body = client.post("/review/batch", json=payload).json()
+    assert (body["recorded"], body["duplicates"], body["rejected"]) == (3, 0, 1)
+    assert [result["status"] for result in body["results"]] == ["recorded", "recorded", "recorded", "rejected"]
+
+    retry = client.post("/review/batch", json=payload).json()
+    assert (retry["recorded"], retry["duplicates"], retry["rejected"]) == (0, 3, 1)
+    assert retry["results"][0]["review_id"] == body["results"][0]["review_id"]
+
+    with database.get_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0] == 3
+        progress = {
+            row["card_id"]: row
+            for row in conn.execute("SELECT card_id, interval_days, streak, due_date, last_review_ts FROM card_progress")
+        }
+    assert (progress[first]["streak"], progress[first]["interval_days"]) == (2, 15)
+    assert progress[first]["last_review_ts"] == "2024-05-02 09:00:00"
+    local_day = datetime(2024, 5, 1, 9, 5, tzinfo=timezone.utc).astimezone().date()
+    assert progress[second]["streak"] == 0
+    assert progress[second]["due_date"] == (local_day + timedelta(days=1)).isoformat()
@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from utils.simulator import load_simulation_inputs, simulate_due_load
+from utils.sm2 import sm2_step
+
+TODAY = date(2026, 3, 2).toordinal()
+
+
+def test_new_cards_follow_the_weekly_goal(memory_db):
+    conn = memory_db(cards=7)
+    conn.execute("INSERT INTO deck_plans (deck_id, weekly_goal) VALUES (1, 14)")
+    inputs = load_simulation_inputs(conn, 1, today=TODAY)
+    assert inputs.due.tolist() == [0, 0, 1, 1, 2, 2, 3]
+
+    conn.execute("UPDATE assignments SET new_cap = 1")
+    inputs = load_simulation_inputs(conn, 1, today=TODAY)
+    assert inputs.due.tolist() == [0, 1, 2, 3, 4, 5, 6]
+
+
+def test_all_perfect_runs_match_sm2_and_master_the_deck(memory_db):
+    conn = memory_db(cards=7)
+    inputs = load_simulation_inputs(conn, 1, today=TODAY)
+    inputs.grade_cuts[:] = 0.0  # every draw is 'perfect'
+    result = simulate_due_load(inputs, days=60, runs=4)
+
+    interval, ease, streak, day, review_days = 1, 2.5, 0, 0, []
+    while day < 60:
+        review_days.append(day)
+        interval, ease, streak = sm2_step(interval, ease, 4, streak)
+        day += interval
+    expected = np.zeros(60)
+    expected[review_days] = 7
+    assert result.mean_load == expected.tolist()
+    assert result.p90_load[0] == 7
+
+    # Default rules: three passing grades in a row, ease >= 2.5 and a 7+ day interval.
+    forecast = result.decks[0]
+    assert forecast.cards == 7
+    assert forecast.mastery_date == date.fromordinal(TODAY) + timedelta(days=review_days[2])
+
+
+def test_kid_grade_history_sets_fail_probability(memory_db):
+    conn = memory_db(cards=7)
+    conn.executemany(
+        "INSERT INTO reviews (card_id, kid_id, ts, review_day, grade) VALUES (1, 1, '2026-03-01', ?, 'fail')",
+        [(TODAY - 1,)] * 90,
+    )
+    inputs = load_simulation_inputs(conn, 1, today=TODAY)
+    assert inputs.grade_cuts[0, 0] == (90 + 2) / (90 + 10)
@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+
+from db import database
+from db.instrumentation import SQL_METRICS, begin_query_stats, end_query_stats
+from main import app
+
+
+def test_statements_are_timed_and_slow_ones_explained(use_tmp_db):
+    use_tmp_db("\n[database]\nslow_query_ms = 0\nsql_headers = true\n")
+    with database.get_conn() as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    SQL_METRICS.reset()
+    stats, token = begin_query_stats()
+    try:
+        with database.get_conn() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('a')")
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM items WHERE id = ?", (1,))
+            cursor.fetchall()
+    finally:
+        end_query_stats(token)
+
+    assert stats.count == 2
+    select = next(item for item in stats.statements if item.sql.startswith("SELECT"))
+    assert select.plan and "items" in select.plan[0]
+    snapshot = SQL_METRICS.snapshot()
+    assert any(entry["sql"] == select.sql and entry["plan"] for entry in snapshot["statements"])
+
+
+def test_responses_carry_sql_headers_and_route_totals(use_tmp_db):
+    use_tmp_db("\n[database]\nslow_query_ms = 0\nsql_headers = true\n")
+    database.init_db()
+    SQL_METRICS.reset()
+
+    response = TestClient(app).get("/")
+
+    assert response.status_code == 200
+    assert int(response.headers["X-SQL-Queries"]) >= 1
+    assert response.headers["Server-Timing"].startswith("sql;dur=")
+    routes = {entry["route"]: entry for entry in SQL_METRICS.snapshot()["routes"]}
+    assert routes["GET /"]["queries"] == int(response.headers["X-SQL-Queries"])
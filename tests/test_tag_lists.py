@@ -0,0 +1,45 @@
+import sqlite3
+
+from db.migrations import run_migrations
+from utils.tags import set_card_tags, set_deck_tags
+
+
+def _memory_db() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    run_migrations(conn)
+    conn.execute("INSERT INTO decks (id, name) VALUES (1, 'Psalms')")
+    conn.execute("INSERT INTO cards (id, deck_id, prompt, full_text) VALUES (1, 1, 'Psalm 23', 'text')")
+    return conn
+
+
+def _card_tags(conn) -> str:
+    return conn.execute("SELECT tag_list FROM cards WHERE id = 1").fetchone()[0]
+
+
+def test_tag_lists_follow_links_and_renames():
+    conn = _memory_db()
+    set_card_tags(conn, 1, ["psalm", "easy"])
+    set_deck_tags(conn, 1, ["bible"])
+    assert _card_tags(conn) == "easy,psalm"
+    assert conn.execute("SELECT tag_list FROM decks WHERE id = 1").fetchone()[0] == "bible"
+
+    set_card_tags(conn, 1, ["psalm", "review"])
+    assert _card_tags(conn) == "psalm,review"
+
+    conn.execute("UPDATE tags SET name = 'psalms' WHERE name = 'psalm'")
+    assert _card_tags(conn) == "psalms,review"
+
+    conn.execute("DELETE FROM tags WHERE name = 'review'")
+    assert _card_tags(conn) == "psalms"
+
+
+def test_unchanged_tag_set_writes_nothing():
+    conn = _memory_db()
+    set_card_tags(conn, 1, ["psalm", "easy"])
+    statements = []
+    conn.set_trace_callback(statements.append)
+    set_card_tags(conn, 1, ["easy", "psalm"])
+    conn.set_trace_callback(None)
+    assert len(statements) == 1 and statements[0].startswith("SELECT tag_list")
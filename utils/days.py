@@ -0,0 +1,57 @@
+"""Integer day numbers for due dates.
+
+Due dates are stored as proleptic Gregorian ordinals (``date.toordinal()``)
+so the due queues can compare a bare indexed column against a bound
+parameter instead of wrapping it in ``date(...)``.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Optional, Union
+
+# julianday('0001-01-01') is 1721425.5 and date(1, 1, 1).toordinal() is 1.
+JULIAN_DAY_OFFSET = 1721424.5
+
+DayLike = Union[date, datetime, str, None]
+
+
+def day_number(value: DayLike) -> Optional[int]:
+    """Convert a date, datetime or ISO string to a day number (None if unparseable)."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        return date.fromisoformat(text[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+def today_number() -> int:
+    return date.today().toordinal()
+
+
+def seconds_until_next_day(now: Optional[datetime] = None) -> float:
+    """Seconds from now until the next local midnight."""
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (midnight - now).total_seconds()
+
+
+def date_from_day_number(value: int) -> date:
+    return date.fromordinal(int(value))
+
+
+def sql_day_number(expression: str, *modifiers: str) -> str:
+    """SQL expression computing the day number of a date/timestamp expression.
+
+    Modifiers are passed through to julianday(), e.g. ``"'localtime'"``.
+    """
+    arguments = ", ".join((expression, *modifiers))
+    return f"CAST(julianday({arguments}) - {JULIAN_DAY_OFFSET} AS INTEGER)"
+
@@ -0,0 +1,140 @@
+"""Process-wide cache of the deck metadata every review needs.
+
+Showing, grading and recording a card needs the deck's name, review mode,
+scheduler and mastery rules. Rather than read the deck for every card, a
+live deck is loaded once and kept here. Writes that change it must call
+invalidate_deck or invalidate_all after they commit: deck edits, scheduler
+switches, mastery rule edits, deletes, restores, purges and backup
+restores. Deleted or missing decks are never cached.
+
+Each deck has a version, bumped on every invalidation of it, and the cache
+has an epoch, bumped by invalidate_all. A load that raced an invalidation
+of its deck is returned to its caller but not stored, so a stale row can't
+outlive the write that replaced it.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+from utils.mastery import DEFAULT_MASTERY_RULES, get_deck_mastery_rules
+
+
+@dataclass(frozen=True)
+class DeckMetadata:
+    id: int
+    name: str
+    review_mode: str
+    scheduler: str
+    mastery_rules: Mapping[str, Any]
+
+
+def load_deck_metadata(conn, deck_id: int) -> Optional[DeckMetadata]:
+    """Read a live deck and its mastery rules (None if missing or deleted)."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT d.id, d.name, d.review_mode, d.scheduler,
+               r.consecutive_grades, r.min_ease_factor, r.min_interval_days
+        FROM decks d
+        LEFT JOIN deck_mastery_rules r ON r.deck_id = d.id
+        WHERE d.id = ? AND d.deleted_at IS NULL
+        """,
+        (deck_id,),
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    if row[4] is None:
+        rules = dict(DEFAULT_MASTERY_RULES)
+    else:
+        rules = {
+            "consecutive_grades": int(row[4]),
+            "min_ease_factor": float(row[5]),
+            "min_interval_days": int(row[6]),
+        }
+    return DeckMetadata(
+        id=row[0],
+        name=row[1],
+        review_mode=row[2] or "free_recall",
+        scheduler=row[3] or "sm2",
+        mastery_rules=MappingProxyType(rules),
+    )
+
+
+class DeckMetadataCache:
+    """Live deck metadata by deck id, with hit/miss/invalidation counters."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[int, DeckMetadata] = {}
+        self._versions: Dict[int, int] = {}
+        self._epoch = 0
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0, "discarded_loads": 0}
+
+    def peek(self, deck_id: int) -> Optional[DeckMetadata]:
+        """The cached deck, or None without touching the database (a miss is not counted)."""
+        with self._lock:
+            entry = self._entries.get(deck_id)
+            if entry is not None:
+                self._counters["hits"] += 1
+            return entry
+
+    def get(self, conn, deck_id: int) -> Optional[DeckMetadata]:
+        """The deck's metadata, loading it on a miss (None if missing or deleted)."""
+        with self._lock:
+            entry = self._entries.get(deck_id)
+            if entry is not None:
+                self._counters["hits"] += 1
+                return entry
+            self._counters["misses"] += 1
+            stamp = (self._epoch, self._versions.get(deck_id, 0))
+        entry = load_deck_metadata(conn, deck_id)
+        if entry is not None:
+            with self._lock:
+                if (self._epoch, self._versions.get(deck_id, 0)) == stamp:
+                    self._entries[deck_id] = entry
+                else:
+                    self._counters["discarded_loads"] += 1
+        return entry
+
+    def invalidate_deck(self, deck_id: int) -> None:
+        with self._lock:
+            self._versions[deck_id] = self._versions.get(deck_id, 0) + 1
+            if self._entries.pop(deck_id, None) is not None:
+                self._counters["invalidations"] += 1
+
+    def invalidate_all(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._counters["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "epoch": self._epoch,
+                "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+
+DECK_CACHE = DeckMetadataCache()
+
+
+async def cached_deck(db, deck_id: int) -> Optional[DeckMetadata]:
+    """DECK_CACHE.get for async routes; a hit skips the database thread hop."""
+    deck = DECK_CACHE.peek(deck_id)
+    if deck is None:
+        deck = await db.run(DECK_CACHE.get, deck_id)
+    return deck
+
+
+def deck_mastery_rules(conn, deck_id: int) -> Mapping[str, Any]:
+    """A deck's mastery rules from the cache, read directly for deleted decks."""
+    deck = DECK_CACHE.get(conn, deck_id)
+    return deck.mastery_rules if deck is not None else get_deck_mastery_rules(conn, deck_id)
@@ -0,0 +1,88 @@
+"""Exponentially weighted review durations for time estimates.
+
+Each timed review folds its duration into two running averages:
+card_progress.duration_ewma for the (kid, card) and deck_durations for the
+(kid, deck). Estimates use the card's own average when it has one, then the
+deck's, then the kid's sample-weighted pace across decks, so a long psalm
+chunk and a one-line catechism answer are estimated separately without
+scanning the review log.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional
+
+DURATION_EWMA_ALPHA = 0.3
+# A card left open while the kid walked away shouldn't swamp the average.
+MAX_DURATION_SAMPLE_SECONDS = 600
+DEFAULT_DURATION_SECONDS = 30
+
+# Sample-weighted pace of one kid (bound as `{kid_id}`) across all decks.
+KID_PACE_SQL = """(
+    SELECT SUM(duration_ewma * samples) / SUM(samples)
+    FROM deck_durations WHERE kid_id = {kid_id}
+)"""
+
+
+def record_duration(conn, kid_id: int, card_id: int, deck_id: int, seconds: Optional[int]) -> None:
+    """Fold one review's duration into the card and deck averages (no commit)."""
+    if seconds is None:
+        return
+    sample = float(min(max(seconds, 1), MAX_DURATION_SAMPLE_SECONDS))
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        UPDATE card_progress
+        SET duration_ewma = COALESCE(duration_ewma + ? * (? - duration_ewma), ?)
+        WHERE kid_id = ? AND card_id = ?
+        """,
+        (DURATION_EWMA_ALPHA, sample, sample, kid_id, card_id),
+    )
+    cursor.execute(
+        """
+        INSERT INTO deck_durations (kid_id, deck_id, duration_ewma, samples)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT(kid_id, deck_id) DO UPDATE SET
+            duration_ewma = duration_ewma + ? * (excluded.duration_ewma - duration_ewma),
+            samples = samples + 1
+        """,
+        (kid_id, deck_id, sample, DURATION_EWMA_ALPHA),
+    )
+
+
+def rebuild_durations(conn) -> None:
+    """Recompute every average from the review log, oldest review first (no commit)."""
+    cursor = conn.cursor()
+    cursor.execute("UPDATE card_progress SET duration_ewma = NULL")
+    cursor.execute("DELETE FROM deck_durations")
+    cursor.execute(
+        """
+        SELECT r.kid_id, r.card_id, c.deck_id, r.duration_seconds
+        FROM reviews r
+        JOIN cards c ON c.id = r.card_id
+        WHERE r.duration_seconds IS NOT NULL
+        ORDER BY r.ts, r.id
+        """
+    )
+    for row in cursor.fetchall():
+        record_duration(conn, row[0], row[1], row[2], row[3])
+
+
+def estimate_card_seconds(conn, kid_id: int, cards: Iterable[Dict]) -> int:
+    """Expected total seconds for the kid to review these cards."""
+    card_ids: List[int] = [card["id"] for card in cards]
+    if not card_ids:
+        return 0
+    placeholders = ", ".join("?" for _ in card_ids)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT SUM(COALESCE(cp.duration_ewma, dd.duration_ewma, {KID_PACE_SQL.format(kid_id="?")}, ?))
+        FROM cards c
+        LEFT JOIN card_progress cp ON cp.kid_id = ? AND cp.card_id = c.id
+        LEFT JOIN deck_durations dd ON dd.kid_id = ? AND dd.deck_id = c.deck_id
+        WHERE c.id IN ({placeholders})
+        """,
+        (kid_id, DEFAULT_DURATION_SECONDS, kid_id, kid_id, *card_ids),
+    )
+    row = cursor.fetchone()
+    return int(round(row[0] or 0))
@@ -0,0 +1,309 @@
+"""FSRS-4.5 style memory model and its per-kid parameter fit.
+
+Each card carries a stability S (days until recall probability falls to
+90%) and a difficulty D in [1, 10]. Recall probability after t days is
+R = (1 + FACTOR * t / S) ** DECAY. A review moves S and D according to
+17 weights; the scheduled interval is the number of days until R falls to
+the desired retention.
+
+The functions take the weights as anything indexable by position. With a
+plain 17-vector they work on scalars (one review at a time); with a
+(17, P, 1) array they evaluate P weight sets over every card's history at
+once, which is what fit_weights uses to estimate gradients by finite
+differences in a single batched pass.
+
+Grades map to FSRS ratings as fail -> Again (1), good -> Good (3) and
+perfect -> Easy (4); Hard (2) is never recorded.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+DECAY = -0.5
+FACTOR = 0.9 ** (1 / DECAY) - 1
+DESIRED_RETENTION = 0.9
+MAX_INTERVAL_DAYS = 36500
+MIN_STABILITY = 0.01
+
+DEFAULT_WEIGHTS: Tuple[float, ...] = (
+    0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+    0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+)
+WEIGHT_BOUNDS = np.array(
+    [
+        (0.1, 100.0), (0.1, 100.0), (0.1, 100.0), (0.1, 100.0),
+        (1.0, 10.0), (0.01, 4.0), (0.01, 4.0), (0.0, 0.75), (0.0, 4.5),
+        (0.0, 0.8), (0.01, 3.5), (0.1, 5.0), (0.01, 0.25), (0.01, 0.9),
+        (0.01, 4.0), (0.0, 1.0), (1.0, 6.0),
+    ]
+)
+# Initial stabilities span three orders of magnitude, so they are fitted on a log scale.
+_LOG_SCALED = np.arange(17) < 4
+
+FIT_ITERATIONS = 80
+FIT_LEARNING_RATE = 0.05
+FIT_EPSILON = 1e-3
+# Reviews less than this many days apart say little about long-term recall.
+MIN_LOSS_ELAPSED_DAYS = 0.5
+MAX_HISTORY_STEPS = 128
+# Above this many cards each iteration fits a random subset of them.
+FIT_BATCH_CARDS = 1024
+
+
+def rating_from_quality(quality):
+    """FSRS rating (1 Again, 3 Good, 4 Easy) for an SM-2 quality score."""
+    return np.where(np.less(quality, 3), 1, np.where(np.less(quality, 4), 3, 4))
+
+
+def retrievability(elapsed_days, stability):
+    return np.power(1 + FACTOR * np.maximum(elapsed_days, 0) / stability, DECAY)
+
+
+def initial_stability(w, rating):
+    return np.choose(np.asarray(rating) - 1, [w[0], w[1], w[2], w[3]])
+
+
+def initial_difficulty(w, rating):
+    return np.clip(w[4] - (np.asarray(rating) - 3) * w[5], 1, 10)
+
+
+def next_difficulty(w, difficulty, rating):
+    moved = difficulty - w[6] * (np.asarray(rating) - 3)
+    return np.clip(w[7] * initial_difficulty(w, 3) + (1 - w[7]) * moved, 1, 10)
+
+
+def recall_stability(w, difficulty, stability, recall, rating):
+    hard_penalty = np.where(np.equal(rating, 2), w[15], 1.0)
+    easy_bonus = np.where(np.equal(rating, 4), w[16], 1.0)
+    growth = (
+        np.exp(w[8])
+        * (11 - difficulty)
+        * np.power(stability, -w[9])
+        * (np.exp(w[10] * (1 - recall)) - 1)
+        * hard_penalty
+        * easy_bonus
+    )
+    return stability * (1 + growth)
+
+
+def forget_stability(w, difficulty, stability, recall):
+    lapsed = (
+        w[11]
+        * np.power(difficulty, -w[12])
+        * (np.power(stability + 1, w[13]) - 1)
+        * np.exp(w[14] * (1 - recall))
+    )
+    return np.minimum(lapsed, stability)
+
+
+def memory_step(w, stability, difficulty, elapsed_days, rating):
+    """(stability, difficulty) after a review; NaN stability means the card's first review."""
+    first = np.isnan(stability)
+    s = np.where(first, 1.0, stability)
+    d = np.where(first, 5.0, difficulty)
+    recall = retrievability(np.nan_to_num(elapsed_days), s)
+    after_s = np.where(
+        first,
+        initial_stability(w, rating),
+        np.where(np.greater(rating, 1), recall_stability(w, d, s, recall, rating), forget_stability(w, d, s, recall)),
+    )
+    after_d = np.where(first, initial_difficulty(w, rating), next_difficulty(w, d, rating))
+    return np.clip(after_s, MIN_STABILITY, MAX_INTERVAL_DAYS), after_d
+
+
+def review_step(w, stability: Optional[float], difficulty: Optional[float], elapsed_days: Optional[float], rating: int) -> Tuple[float, float]:
+    """memory_step for one review in plain floats (None stability means the first review).
+
+    Schedulers call this per review, where numpy's per-call overhead would dominate.
+    """
+    if stability is None:
+        return (
+            min(max(w[rating - 1], MIN_STABILITY), MAX_INTERVAL_DAYS),
+            min(max(w[4] - (rating - 3) * w[5], 1.0), 10.0),
+        )
+    if difficulty is None:
+        difficulty = 5.0
+    recall = (1 + FACTOR * max(elapsed_days or 0.0, 0.0) / stability) ** DECAY
+    if rating > 1:
+        growth = (
+            math.exp(w[8])
+            * (11 - difficulty)
+            * stability ** -w[9]
+            * (math.exp(w[10] * (1 - recall)) - 1)
+            * (w[15] if rating == 2 else 1.0)
+            * (w[16] if rating == 4 else 1.0)
+        )
+        after_s = stability * (1 + growth)
+    else:
+        lapsed = (
+            w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1) * math.exp(w[14] * (1 - recall))
+        )
+        after_s = min(lapsed, stability)
+    anchor = min(max(w[4], 1.0), 10.0)
+    moved = difficulty - w[6] * (rating - 3)
+    after_d = min(max(w[7] * anchor + (1 - w[7]) * moved, 1.0), 10.0)
+    return min(max(after_s, MIN_STABILITY), MAX_INTERVAL_DAYS), after_d
+
+
+def next_interval(stability: float, desired_retention: float = DESIRED_RETENTION) -> int:
+    days = stability / FACTOR * (desired_retention ** (1 / DECAY) - 1)
+    return int(min(max(round(days), 1), MAX_INTERVAL_DAYS))
+
+
+def scheduled_intervals(stability, desired_retention=DESIRED_RETENTION) -> np.ndarray:
+    """next_interval over an array of stabilities."""
+    days = np.asarray(stability) / FACTOR * (np.power(desired_retention, 1 / DECAY) - 1)
+    return np.clip(np.rint(days), 1, MAX_INTERVAL_DAYS)
+
+
+@dataclass
+class ReviewHistories:
+    """Review sequences padded to (steps, cards); rating 0 marks padding."""
+
+    elapsed: np.ndarray
+    rating: np.ndarray
+    counted: np.ndarray
+
+    @property
+    def cards(self) -> int:
+        return self.rating.shape[1]
+
+    @property
+    def scored_reviews(self) -> int:
+        return int(self.counted.sum())
+
+    def select(self, columns: np.ndarray) -> "ReviewHistories":
+        """The histories of a subset of cards, trimmed to their longest sequence."""
+        rating = self.rating[:, columns]
+        steps = int((rating > 0).sum(axis=0).max(initial=0))
+        return ReviewHistories(
+            elapsed=self.elapsed[:steps, columns], rating=rating[:steps], counted=self.counted[:steps, columns]
+        )
+
+
+def build_histories(
+    sequences: Iterable[Sequence[Tuple[datetime, int]]],
+    scored_from: Optional[datetime] = None,
+) -> ReviewHistories:
+    """Pad per-card (reviewed_at, rating) sequences, oldest first, into arrays.
+
+    Only reviews at or after `scored_from` count towards the loss (all of
+    them when None); earlier ones still shape the memory state.
+    """
+    sequences = [list(sequence[:MAX_HISTORY_STEPS]) for sequence in sequences if sequence]
+    steps = max((len(sequence) for sequence in sequences), default=0)
+    elapsed = np.full((steps, len(sequences)), np.nan)
+    rating = np.zeros((steps, len(sequences)), dtype=np.int8)
+    counted = np.zeros((steps, len(sequences)), dtype=bool)
+    for column, sequence in enumerate(sequences):
+        previous = None
+        for step, (reviewed_at, card_rating) in enumerate(sequence):
+            rating[step, column] = card_rating
+            if previous is not None:
+                days = (reviewed_at - previous).total_seconds() / 86400
+                elapsed[step, column] = days
+                counted[step, column] = days >= MIN_LOSS_ELAPSED_DAYS and (
+                    scored_from is None or reviewed_at >= scored_from
+                )
+            previous = reviewed_at
+    return ReviewHistories(elapsed=elapsed, rating=rating, counted=counted)
+
+
+def replay_histories(w, histories: ReviewHistories) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Predicted recall before every review, plus each card's final (stability, difficulty).
+
+    Recall is shaped (steps, cards). With (17, P, 1) weights every result
+    gains a leading P axis.
+    """
+    steps = histories.rating.shape[0]
+    shape = np.broadcast_shapes(np.shape(w[0]), (histories.cards,))
+    stability = np.full(shape, np.nan)
+    difficulty = np.full(shape, np.nan)
+    predicted = np.full(shape[:-1] + (steps, histories.cards), np.nan)
+    for step in range(steps):
+        rating = histories.rating[step]
+        active = rating > 0
+        known = ~np.isnan(stability)
+        predicted[..., step, :] = np.where(
+            known, retrievability(np.nan_to_num(histories.elapsed[step]), np.where(known, stability, 1.0)), np.nan
+        )
+        after_s, after_d = memory_step(w, stability, difficulty, histories.elapsed[step], np.where(active, rating, 3))
+        stability = np.where(active, after_s, stability)
+        difficulty = np.where(active, after_d, difficulty)
+    return predicted, stability, difficulty
+
+
+def log_loss(predicted: np.ndarray, histories: ReviewHistories) -> np.ndarray:
+    """Mean binary cross-entropy of `predicted` recall over the counted reviews."""
+    recalled = histories.rating > 1
+    p = np.clip(predicted, 1e-4, 1 - 1e-4)
+    losses = -np.where(recalled, np.log(p), np.log(1 - p))
+    counted = histories.counted
+    total = max(int(counted.sum()), 1)
+    return np.where(counted, losses, 0.0).sum(axis=(-2, -1)) / total
+
+
+def _scaled(values: np.ndarray) -> np.ndarray:
+    return np.where(_LOG_SCALED, np.log(np.where(_LOG_SCALED, values, 1.0)), values)
+
+
+_UNIT_LOW = _scaled(WEIGHT_BOUNDS[:, 0])
+_UNIT_SPAN = _scaled(WEIGHT_BOUNDS[:, 1]) - _UNIT_LOW
+
+
+def _to_unit(weights: np.ndarray) -> np.ndarray:
+    return (_scaled(weights) - _UNIT_LOW) / _UNIT_SPAN
+
+
+def _from_unit(unit: np.ndarray) -> np.ndarray:
+    scaled = _UNIT_LOW + np.clip(unit, 0, 1) * _UNIT_SPAN
+    return np.where(_LOG_SCALED, np.exp(scaled), scaled)
+
+
+def fit_weights(
+    histories: ReviewHistories,
+    initial: Sequence[float] = DEFAULT_WEIGHTS,
+    iterations: int = FIT_ITERATIONS,
+    seed: int = 0,
+) -> Tuple[Tuple[float, ...], float]:
+    """Minimise log-loss over `histories` with Adam on central finite differences.
+
+    Every iteration evaluates the current weights and both perturbations of
+    each of the 17 weights as one (35-set) batched replay, over all cards or,
+    past FIT_BATCH_CARDS, a random batch of them. Returns the best weights
+    seen (the final ones when batching) and their loss over all cards.
+    """
+    count = len(DEFAULT_WEIGHTS)
+    unit = _to_unit(np.asarray(initial, dtype=float))
+    offsets = np.vstack([np.zeros(count), np.eye(count) * FIT_EPSILON, -np.eye(count) * FIT_EPSILON])
+    first_moment = np.zeros(count)
+    second_moment = np.zeros(count)
+    batched = histories.cards > FIT_BATCH_CARDS
+    rng = np.random.default_rng(seed)
+    best_unit, best_loss = unit, np.inf
+    for iteration in range(1, iterations + 1):
+        sample = histories
+        if batched:
+            sample = histories.select(np.sort(rng.choice(histories.cards, FIT_BATCH_CARDS, replace=False)))
+        batch = _from_unit(unit + offsets)
+        predicted, _, _ = replay_histories(batch.T[:, :, None], sample)
+        losses = log_loss(predicted, sample)
+        if not batched and losses[0] < best_loss:
+            best_unit, best_loss = unit, float(losses[0])
+        gradient = (losses[1 : count + 1] - losses[count + 1 :]) / (2 * FIT_EPSILON)
+        first_moment = 0.9 * first_moment + 0.1 * gradient
+        second_moment = 0.999 * second_moment + 0.001 * gradient**2
+        step = FIT_LEARNING_RATE * (first_moment / (1 - 0.9**iteration)) / (
+            np.sqrt(second_moment / (1 - 0.999**iteration)) + 1e-8
+        )
+        unit = np.clip(unit - step, 0, 1)
+    weights = _from_unit(unit if batched else best_unit)
+    if batched:
+        predicted, _, _ = replay_histories(weights, histories)
+        best_loss = float(log_loss(predicted, histories))
+    return tuple(round(float(value), 4) for value in weights), best_loss
@@ -0,0 +1,319 @@
+"""Background fitting of per-kid FSRS weights, and the offline scheduler evaluation.
+
+A kid assigned an FSRS deck gets weights fitted to their whole review log
+once they have MIN_FIT_REVIEWS reviews, and refitted when the log has grown
+by REFIT_GROWTH since the last fit. A single daemon thread checks at
+startup, when asked and then daily; it reads the log, fits with no
+connection held and stores the result in scheduler_params. New weights
+apply from each card's next review; stored progress is not rescheduled.
+
+evaluate_schedulers backs `python main.py --evaluate-schedulers`: it fits on
+the older part of each kid's log and compares how well SM-2 and FSRS predict
+recall on the newer part, and how many reviews a day each would ask for.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from db import database
+from utils.fsrs import (
+    DEFAULT_WEIGHTS,
+    DESIRED_RETENTION,
+    MAX_HISTORY_STEPS,
+    build_histories,
+    fit_weights,
+    log_loss,
+    replay_histories,
+    scheduled_intervals,
+)
+from utils.schedulers import parse_review_ts
+from utils.sm2 import sm2_step
+
+logger = logging.getLogger(__name__)
+
+MIN_FIT_REVIEWS = 200
+REFIT_GROWTH = 0.1
+REFIT_INTERVAL_SECONDS = 24 * 60 * 60
+# SM-2 has no recall model; evaluation assumes 90% recall at the scheduled interval.
+SM2_RETENTION_AT_INTERVAL = 0.9
+
+History = List[Tuple[datetime, int]]
+_RATINGS = {"fail": 1, "good": 3, "perfect": 4}
+# SM-2 quality of each rating, as map_grade_to_quality gives for the grade.
+_QUALITIES = {1: 0, 3: 3, 4: 4}
+
+
+def load_kid_histories(conn, kid_id: int) -> List[History]:
+    """Each reviewed card's (reviewed_at, FSRS rating) sequence, oldest first."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(
+        """
+        SELECT card_id, ts, COALESCE(final_grade, grade)
+        FROM reviews
+        WHERE kid_id = ?
+        ORDER BY card_id, ts, id
+        """,
+        (kid_id,),
+    )
+    histories: Dict[int, History] = {}
+    for card_id, ts, grade in cursor.fetchall():
+        reviewed_at = parse_review_ts(ts)
+        if reviewed_at is not None:
+            histories.setdefault(card_id, []).append((reviewed_at, _RATINGS.get(grade, 1)))
+    return list(histories.values())
+
+
+def kids_due_for_fit(conn) -> List[int]:
+    """Kids with an FSRS deck whose log is big enough and has grown since the last fit."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT r.kid_id
+        FROM reviews r
+        LEFT JOIN scheduler_params sp ON sp.kid_id = r.kid_id
+        WHERE EXISTS (
+            SELECT 1 FROM assignments a
+            JOIN decks d ON d.id = a.deck_id
+            WHERE a.kid_id = r.kid_id AND d.scheduler = 'fsrs' AND d.deleted_at IS NULL
+        )
+        GROUP BY r.kid_id
+        HAVING COUNT(*) >= ? AND (MAX(sp.reviews) IS NULL OR COUNT(*) >= MAX(sp.reviews) * ?)
+        ORDER BY r.kid_id
+        """,
+        (MIN_FIT_REVIEWS, 1 + REFIT_GROWTH),
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def load_kid_weights(conn, kid_id: int) -> Optional[Tuple[float, ...]]:
+    row = conn.execute("SELECT weights FROM scheduler_params WHERE kid_id = ?", (kid_id,)).fetchone()
+    return tuple(json.loads(row[0])) if row else None
+
+
+def save_kid_weights(conn, kid_id: int, weights: Sequence[float], reviews: int, loss: float) -> None:
+    """Store a kid's fitted weights and commit."""
+    conn.execute(
+        """
+        INSERT INTO scheduler_params (kid_id, weights, reviews, log_loss, fitted_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(kid_id) DO UPDATE SET
+            weights = excluded.weights,
+            reviews = excluded.reviews,
+            log_loss = excluded.log_loss,
+            fitted_at = excluded.fitted_at
+        """,
+        (kid_id, json.dumps(list(weights)), reviews, loss, datetime.now(timezone.utc).isoformat()),
+    )
+    conn.commit()
+
+
+def fit_kid(kid_id: int) -> Optional[float]:
+    """Refit one kid's weights, starting from their current ones. Returns the log-loss, or None if too few reviews."""
+    with database.get_background_conn() as conn:
+        sequences = load_kid_histories(conn, kid_id)
+        initial = load_kid_weights(conn, kid_id) or DEFAULT_WEIGHTS
+    reviews = sum(len(sequence) for sequence in sequences)
+    if reviews < MIN_FIT_REVIEWS:
+        return None
+    weights, loss = fit_weights(build_histories(sequences), initial)
+    with database.get_background_conn() as conn:
+        save_kid_weights(conn, kid_id, weights, reviews, loss)
+    return loss
+
+
+class FsrsFitJobs:
+    """One daemon thread refitting kids' FSRS weights at start, on request and daily."""
+
+    def __init__(self, interval_seconds: float = REFIT_INTERVAL_SECONDS) -> None:
+        self.interval_seconds = interval_seconds
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._counters = {"runs": 0, "fitted": 0, "skipped": 0, "errors": 0}
+        self._last_run: Optional[float] = None
+        self._last_fit_seconds: Optional[float] = None
+
+    def start(self) -> None:
+        with self._lock:
+            self._stopping = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="memcoach-fsrs", daemon=True)
+                self._thread.start()
+
+    def request(self) -> None:
+        """Check for kids due a fit now instead of at the next daily run."""
+        self.start()
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+        if thread is not None:
+            self._wake.set()
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                **self._counters,
+                "last_run": self._last_run,
+                "last_fit_seconds": self._last_fit_seconds,
+            }
+
+    def run_once(self) -> int:
+        """Fit every kid due a fit. Returns the number fitted."""
+        with database.get_background_conn() as conn:
+            kid_ids = kids_due_for_fit(conn)
+        fitted = 0
+        for kid_id in kid_ids:
+            if self._stopping:
+                break
+            started = time.perf_counter()
+            try:
+                loss = fit_kid(kid_id)
+            except Exception:
+                self._count("errors")
+                logger.exception("FSRS fit failed for kid %s", kid_id)
+                continue
+            if loss is None:
+                self._count("skipped")
+                continue
+            fitted += 1
+            self._count("fitted")
+            with self._lock:
+                self._last_fit_seconds = round(time.perf_counter() - started, 3)
+            logger.info("Fitted FSRS weights for kid %s (log-loss %.4f)", kid_id, loss)
+        with self._lock:
+            self._counters["runs"] += 1
+            self._last_run = time.time()
+        return fitted
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _run(self) -> None:
+        while not self._stopping:
+            try:
+                self.run_once()
+            except Exception:
+                self._count("errors")
+                logger.exception("FSRS fit run failed")
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
+
+
+FSRS_FITS = FsrsFitJobs()
+
+
+@dataclass(frozen=True)
+class SchedulerEvaluation:
+    """One kid's held-out comparison; log-losses are per scored review (lower is better)."""
+
+    kid_id: int
+    train_reviews: int
+    test_reviews: int
+    sm2_log_loss: float
+    fsrs_default_log_loss: float
+    fsrs_fitted_log_loss: float
+    observed_retention: float
+    sm2_reviews_per_day: float
+    fsrs_reviews_per_day: float
+    fsrs_target_reviews_per_day: float
+
+
+def _sm2_predictions(sequences: Sequence[History], steps: int) -> np.ndarray:
+    """Recall SM-2 implies before each review: SM2_RETENTION_AT_INTERVAL at the due date, decaying exponentially."""
+    predicted = np.full((steps, len(sequences)), np.nan)
+    for column, sequence in enumerate(sequences):
+        interval, ease, streak = 1, 2.5, 0
+        previous = None
+        for step, (reviewed_at, rating) in enumerate(sequence):
+            if previous is not None:
+                elapsed = max((reviewed_at - previous).total_seconds() / 86400, 0.0)
+                predicted[step, column] = SM2_RETENTION_AT_INTERVAL ** (elapsed / interval)
+            interval, ease, streak = sm2_step(interval, ease, _QUALITIES[rating], streak)
+            previous = reviewed_at
+    return predicted
+
+
+def _sm2_final_intervals(sequences: Sequence[History]) -> np.ndarray:
+    intervals = []
+    for sequence in sequences:
+        interval, ease, streak = 1, 2.5, 0
+        for _, rating in sequence:
+            interval, ease, streak = sm2_step(interval, ease, _QUALITIES[rating], streak)
+        intervals.append(interval)
+    return np.asarray(intervals, dtype=float)
+
+
+def evaluate_kid(sequences: Sequence[History], kid_id: int, holdout: float = 0.2) -> Optional[SchedulerEvaluation]:
+    """Fit on the oldest (1 - holdout) of a kid's reviews and score the rest.
+
+    Reviews/day is the steady-state load of the cards' current intervals
+    (sum of 1 / interval): SM-2's, FSRS's at the retention SM-2 actually
+    achieved on the held-out reviews (same retention, fewer or more reviews)
+    and FSRS's at its DESIRED_RETENTION target.
+    """
+    sequences = [list(sequence[:MAX_HISTORY_STEPS]) for sequence in sequences if sequence]
+    times = sorted(reviewed_at for sequence in sequences for reviewed_at, _ in sequence)
+    if len(times) < MIN_FIT_REVIEWS:
+        return None
+    cutoff = times[int(len(times) * (1 - holdout))]
+    train = [[review for review in sequence if review[0] < cutoff] for sequence in sequences]
+    fitted, _ = fit_weights(build_histories(train))
+
+    histories = build_histories(sequences, scored_from=cutoff)
+    if not histories.scored_reviews:
+        return None
+    steps = histories.rating.shape[0]
+    default_predicted, _, _ = replay_histories(DEFAULT_WEIGHTS, histories)
+    fitted_predicted, stability, _ = replay_histories(fitted, histories)
+    recalled = histories.rating[histories.counted] > 1
+    retention = float(recalled.mean())
+    sm2_intervals = _sm2_final_intervals(sequences)
+    # At 100% observed recall FSRS's interval formula is unbounded; cap just below it.
+    equal_retention = min(max(retention, 0.5), 0.99)
+    return SchedulerEvaluation(
+        kid_id=kid_id,
+        train_reviews=sum(len(sequence) for sequence in train),
+        test_reviews=histories.scored_reviews,
+        sm2_log_loss=round(float(log_loss(_sm2_predictions(sequences, steps), histories)), 4),
+        fsrs_default_log_loss=round(float(log_loss(default_predicted, histories)), 4),
+        fsrs_fitted_log_loss=round(float(log_loss(fitted_predicted, histories)), 4),
+        observed_retention=round(retention, 3),
+        sm2_reviews_per_day=round(float((1 / sm2_intervals).sum()), 1),
+        fsrs_reviews_per_day=round(float((1 / scheduled_intervals(stability, equal_retention)).sum()), 1),
+        fsrs_target_reviews_per_day=round(float((1 / scheduled_intervals(stability, DESIRED_RETENTION)).sum()), 1),
+    )
+
+
+def evaluate_schedulers(conn, kid_id: Optional[int] = None, holdout: float = 0.2) -> List[SchedulerEvaluation]:
+    """evaluate_kid for one kid or every kid with enough reviews."""
+    if kid_id is not None:
+        kid_ids = [kid_id]
+    else:
+        kid_ids = [
+            row[0]
+            for row in conn.execute(
+                "SELECT kid_id FROM reviews GROUP BY kid_id HAVING COUNT(*) >= ? ORDER BY kid_id",
+                (MIN_FIT_REVIEWS,),
+            ).fetchall()
+        ]
+    results = []
+    for kid in kid_ids:
+        evaluation = evaluate_kid(load_kid_histories(conn, kid), kid, holdout)
+        if evaluation is not None:
+            results.append(evaluation)
+    return results
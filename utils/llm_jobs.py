@@ -0,0 +1,150 @@
+"""Background LLM confirmation of borderline grades.
+
+Submit records the Levenshtein grade straight away and marks borderline
+reviews llm_status = 'pending'. A single worker thread (Ollama runs one
+model at a time anyway) asks the model for a verdict with no connection
+held, then stores it: an agreeing verdict marks the review 'confirmed'; a
+different one rewrites the auto grade, replays the card's progress and marks
+it 'changed'. Reviews a parent has overridden in the meantime are 'skipped'.
+Pending reviews left by a restart are queued again at startup.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from typing import Callable, Dict, Optional
+
+from config import load_config
+from db import database
+from utils.ollama import llm_verdict
+from utils.progress import replay_card_progress
+
+logger = logging.getLogger(__name__)
+
+Verdict = Callable[[str, str, dict], Optional[str]]
+
+
+def load_pending_review(conn, review_id: int) -> Optional[Dict]:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT r.id, r.kid_id, r.card_id, r.user_text, c.full_text
+        FROM reviews r
+        JOIN cards c ON c.id = r.card_id
+        WHERE r.id = ? AND r.llm_status = 'pending'
+        """,
+        (review_id,),
+    )
+    row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+def apply_llm_verdict(conn, review_id: int, verdict: Optional[str]) -> Optional[str]:
+    """Store the model's verdict for a pending review. Returns the new llm_status."""
+    # Take the write lock up front so a parent override can't slip in
+    # between reading graded_by and writing the verdict.
+    with database.write_transaction(conn):
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT kid_id, card_id, final_grade, graded_by FROM reviews WHERE id = ? AND llm_status = 'pending'",
+            (review_id,),
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+        if row["graded_by"] != "auto":
+            status = "skipped"
+        elif verdict is None:
+            status = "failed"
+        else:
+            # Borderline answers are at least 'good', matching the synchronous path.
+            grade = verdict if verdict in ("perfect", "good") else "good"
+            status = "confirmed" if grade == row["final_grade"] else "changed"
+            if status == "changed":
+                cursor.execute(
+                    "UPDATE reviews SET grade = ?, auto_grade = ?, final_grade = ? WHERE id = ?",
+                    (grade, grade, grade, review_id),
+                )
+                replay_card_progress(conn, row["kid_id"], row["card_id"], from_review_id=review_id)
+        cursor.execute("UPDATE reviews SET llm_status = ? WHERE id = ?", (status, review_id))
+    return status
+
+
+def confirm_review_with_llm(review_id: int, verdict_fn: Verdict = llm_verdict) -> Optional[str]:
+    with database.get_background_conn() as conn:
+        review = load_pending_review(conn, review_id)
+    if review is None:
+        return None
+    verdict = verdict_fn(review["full_text"], review["user_text"] or "", load_config())
+    with database.get_background_conn() as conn:
+        return apply_llm_verdict(conn, review_id, verdict)
+
+
+class LlmGradingJobs:
+    """One daemon thread working through pending review ids in submit order."""
+
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {"queued": 0, "processed": 0, "changed": 0, "errors": 0}
+
+    def submit(self, review_id: int) -> None:
+        self._ensure_started()
+        self._count("queued")
+        self._queue.put(review_id)
+
+    def resume_pending(self, conn) -> int:
+        """Queue reviews still pending from before a restart."""
+        rows = conn.execute("SELECT id FROM reviews WHERE llm_status = 'pending' ORDER BY id").fetchall()
+        for row in rows:
+            self.submit(row[0])
+        return len(rows)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "waiting": self._queue.qsize()}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="memcoach-llm", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            review_id = self._queue.get()
+            if review_id is None:
+                return
+            try:
+                status = confirm_review_with_llm(review_id)
+                self._count("processed")
+                if status == "changed":
+                    self._count("changed")
+            except Exception:
+                self._count("errors")
+                logger.exception("LLM confirmation failed for review %s", review_id)
+                self._mark_failed(review_id)
+
+    def _mark_failed(self, review_id: int) -> None:
+        # Keep the Levenshtein grade and stop the result page polling.
+        try:
+            with database.get_background_conn() as conn:
+                apply_llm_verdict(conn, review_id, None)
+        except Exception:
+            logger.exception("Could not mark review %s as failed", review_id)
+
+
+LLM_JOBS = LlmGradingJobs()
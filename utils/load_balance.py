@@ -0,0 +1,90 @@
+"""Due-date load balancing.
+
+Cards first reviewed together (a catechism or long-text import) would
+otherwise come due together on every later pass. When a review schedules a
+card more than a couple of days out, its interval may move within a small
+fuzz window (wider for longer intervals, as in Anki). The kid's due counts
+for the window's days come from a range scan of the
+card_progress(kid_id, due_day) index.
+
+A day with fewer than the target cards due takes the card. Among those
+days, the one closest to the scheduler's own interval wins. When every day
+is at the target, the least loaded day wins. A target of 0 always picks
+the least loaded day.
+
+Balancing leaves the scheduler's interval alone: a live review stores how
+many days its due date moved (reviews.due_offset_days), and replays and
+rebuilds add that offset back, kept within the replayed interval's window.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Optional, Tuple
+
+# (from, to, share): each interval day in [from, to) widens the window by `share` days.
+FUZZ_RANGES = ((2.5, 7.0, 0.15), (7.0, 20.0, 0.1), (20.0, math.inf, 0.05))
+
+
+def fuzz_window(interval_days: int) -> Tuple[int, int]:
+    """Shortest and longest interval a balanced card may get instead of `interval_days`."""
+    if interval_days < FUZZ_RANGES[0][0]:
+        return interval_days, interval_days
+    delta = 1.0 + sum(share * max(min(interval_days, end) - start, 0.0) for start, end, share in FUZZ_RANGES)
+    return max(2, round(interval_days - delta)), round(interval_days + delta)
+
+
+def clamp_due_offset(interval_days: int, offset: int) -> int:
+    """A stored offset, cut back to what the fuzz window of `interval_days` allows.
+
+    A replayed review can get a different interval (an overridden grade, a
+    new scheduler) than the one its offset was chosen for.
+    """
+    low, high = fuzz_window(interval_days)
+    return min(max(interval_days + offset, low), high) - interval_days
+
+
+def due_counts(conn, kid_id: int, first_day: int, last_day: int) -> Dict[int, int]:
+    """{due_day: cards} for the kid's reviewed cards due in [first_day, last_day]."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT due_day, COUNT(*)
+        FROM card_progress
+        WHERE kid_id = ? AND due_day BETWEEN ? AND ?
+        GROUP BY due_day
+        """,
+        (kid_id, first_day, last_day),
+    )
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def balanced_interval(
+    conn,
+    kid_id: int,
+    base_day: int,
+    interval_days: int,
+    target: int,
+    current_due_day: Optional[int] = None,
+) -> int:
+    """The interval within the fuzz window whose due day best keeps the kid near `target` a day.
+
+    current_due_day is where the card itself is counted now; that row moves,
+    so it does not count against its own window.
+    """
+    low, high = fuzz_window(interval_days)
+    if low == high:
+        return interval_days
+    counts = due_counts(conn, kid_id, base_day + low, base_day + high)
+    if current_due_day in counts:
+        counts[current_due_day] -= 1
+    offsets = range(low, high + 1)
+    under_target = [offset for offset in offsets if counts.get(base_day + offset, 0) < target]
+    if under_target:
+        return min(under_target, key=lambda offset: (abs(offset - interval_days), offset))
+    return min(offsets, key=lambda offset: (counts.get(base_day + offset, 0), abs(offset - interval_days), offset))
+
+
+def balance_target(config: Dict[str, Any]) -> Optional[int]:
+    """Daily target to balance reviews towards, or None when balancing is off."""
+    scheduling = config.get("scheduling", {})
+    return scheduling.get("daily_target", 0) if scheduling.get("load_balance") else None
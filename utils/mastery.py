@@ -1,3 +1,5 @@
+from typing import Optional
+
 DEFAULT_MASTERY_RULES = {
     "consecutive_grades": 3,
     "min_ease_factor": 2.5,
@@ -20,6 +22,38 @@ def mastery_status_from_rules(
         return "mastered"
     return "learning"
 
+# mastery_status_from_rules as SQL over card_progress columns.
+MASTERY_STATUS_SQL = """
+    CASE
+        WHEN streak <= 0 THEN 'new'
+        WHEN streak >= :consecutive_grades
+             AND ease_factor >= :min_ease_factor
+             AND interval_days >= :min_interval_days THEN 'mastered'
+        ELSE 'learning'
+    END
+"""
+
+def reevaluate_deck_mastery(conn, deck_id: int, rules: Optional[dict] = None) -> int:
+    """Recompute every kid's mastery_status on the deck's cards in one UPDATE.
+
+    Uses the stored streak, ease and interval against `rules` (the deck's
+    current rules by default) and returns how many rows changed. The caller
+    commits.
+    """
+    if rules is None:
+        rules = get_deck_mastery_rules(conn, deck_id)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        UPDATE card_progress
+        SET mastery_status = {MASTERY_STATUS_SQL}
+        WHERE card_id IN (SELECT id FROM cards WHERE deck_id = :deck_id)
+          AND mastery_status IS NOT {MASTERY_STATUS_SQL}
+        """,
+        {**rules, "deck_id": deck_id},
+    )
+    return cursor.rowcount
+
 def get_deck_mastery_rules(conn, deck_id: int) -> dict:
     cursor = conn.cursor()
     cursor.execute(
@@ -39,6 +73,22 @@ def get_deck_mastery_rules(conn, deck_id: int) -> dict:
         "min_interval_days": int(row[2]),
     }
 
+def load_all_mastery_rules(conn) -> dict:
+    """Custom mastery rules for every deck that has them, keyed by deck id."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT deck_id, consecutive_grades, min_ease_factor, min_interval_days FROM deck_mastery_rules"
+    )
+    return {
+        row[0]: {
+            "consecutive_grades": int(row[1]),
+            "min_ease_factor": float(row[2]),
+            "min_interval_days": int(row[3]),
+        }
+        for row in cursor.fetchall()
+    }
+
+
 def mastery_percent(mastered: int, total: int) -> float:
     if total <= 0:
         return 0.0
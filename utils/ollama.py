@@ -26,6 +26,10 @@ def call_llm(prompt: str, model: str = None, timeout: int = 15) -> Optional[str]
 
 def grade_with_llm(full_text: str, user_text: str, config: dict = None) -> str:
     """Use LLM to grade borderline cases."""
+    return llm_verdict(full_text, user_text, config) or 'good'  # Fallback
+
+def llm_verdict(full_text: str, user_text: str, config: dict = None) -> Optional[str]:
+    """The model's grade for a recall, or None if Ollama could not be reached."""
     if not config:
         config = load_config()
     prompt = f"""Original text to memorize: {full_text}
@@ -46,4 +50,4 @@ Response:"""
             return 'good'
         else:
             return 'fail'
-    return 'good'  # Fallback
+    return None
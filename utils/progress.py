@@ -1,11 +1,19 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import date, datetime
-from typing import Optional
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 
-from utils.mastery import get_deck_mastery_rules, mastery_status_from_rules
-from utils.sm2 import map_grade_to_quality, update_sm2
+from utils.days import day_number
+from utils.deck_cache import deck_mastery_rules
+from utils.load_balance import clamp_due_offset
+from utils.mastery import DEFAULT_MASTERY_RULES, load_all_mastery_rules, mastery_status_from_rules
+from utils.schedulers import SM2, MemoryState, Scheduler, parse_review_ts, scheduler_lookup
+from utils.sm2 import map_grade_to_quality, sm2_step
+
+
+REBUILD_BATCH_SIZE = 5000
 
 
 @dataclass(frozen=True)
@@ -16,6 +24,11 @@ class CardProgressState:
     mastery_status: str
     due_date: str
     last_review_ts: Optional[str] = None
+    stability: Optional[float] = None
+    difficulty: Optional[float] = None
+
+    def memory(self) -> MemoryState:
+        return MemoryState(self.interval_days, self.ease_factor, self.streak, self.stability, self.difficulty)
 
 
 def default_progress() -> CardProgressState:
@@ -44,7 +57,7 @@ def get_card_progress(conn, kid_id: int, card_id: int) -> Optional[CardProgressS
     cursor = conn.cursor()
     cursor.execute(
         """
-        SELECT interval_days, ease_factor, streak, mastery_status, due_date, last_review_ts
+        SELECT interval_days, ease_factor, streak, mastery_status, due_date, last_review_ts, stability, difficulty
         FROM card_progress
         WHERE kid_id = ? AND card_id = ?
         """,
@@ -60,6 +73,52 @@ def get_card_progress(conn, kid_id: int, card_id: int) -> Optional[CardProgressS
         mastery_status=row["mastery_status"],
         due_date=row["due_date"],
         last_review_ts=row["last_review_ts"],
+        stability=row["stability"],
+        difficulty=row["difficulty"],
+    )
+
+
+UPSERT_CARD_PROGRESS_SQL = """
+    INSERT INTO card_progress (
+        kid_id,
+        card_id,
+        interval_days,
+        due_date,
+        due_day,
+        ease_factor,
+        streak,
+        mastery_status,
+        last_review_ts,
+        stability,
+        difficulty
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(kid_id, card_id) DO UPDATE SET
+        interval_days = excluded.interval_days,
+        due_date = excluded.due_date,
+        due_day = excluded.due_day,
+        ease_factor = excluded.ease_factor,
+        streak = excluded.streak,
+        mastery_status = excluded.mastery_status,
+        last_review_ts = excluded.last_review_ts,
+        stability = excluded.stability,
+        difficulty = excluded.difficulty
+"""
+
+
+def _progress_params(kid_id: int, card_id: int, progress: CardProgressState) -> Tuple:
+    return (
+        kid_id,
+        card_id,
+        progress.interval_days,
+        progress.due_date,
+        day_number(progress.due_date),
+        progress.ease_factor,
+        progress.streak,
+        progress.mastery_status,
+        progress.last_review_ts,
+        progress.stability,
+        progress.difficulty,
     )
 
 
@@ -74,49 +133,143 @@ def upsert_card_progress(
     streak: int,
     mastery_status: str,
     last_review_ts: Optional[str],
+    stability: Optional[float] = None,
+    difficulty: Optional[float] = None,
 ) -> None:
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT INTO card_progress (
-            kid_id,
-            card_id,
-            interval_days,
-            due_date,
-            ease_factor,
-            streak,
-            mastery_status,
-            last_review_ts
+    progress = CardProgressState(
+        interval_days=interval_days,
+        ease_factor=ease_factor,
+        streak=streak,
+        mastery_status=mastery_status,
+        due_date=due_date,
+        last_review_ts=last_review_ts,
+        stability=stability,
+        difficulty=difficulty,
+    )
+    conn.cursor().execute(UPSERT_CARD_PROGRESS_SQL, _progress_params(kid_id, card_id, progress))
+
+
+def due_card_filter(
+    kid_id: int,
+    today: int,
+    deck_id: Optional[int] = None,
+    card_alias: str = "c",
+) -> Tuple[str, List[object]]:
+    """SQL predicate (and params) matching cards due for a kid on day `today`.
+
+    Reviewed cards come from a range scan of card_progress(kid_id, due_day);
+    cards the kid has never reviewed are due immediately and come from the
+    deck's cards that have no progress row.
+    """
+    deck_clause = "fresh.deck_id = ? AND " if deck_id is not None else ""
+    sql = f"""
+        {card_alias}.id IN (
+            SELECT due.card_id FROM card_progress due
+            WHERE due.kid_id = ? AND due.due_day <= ?
+            UNION ALL
+            SELECT fresh.id FROM cards fresh
+            WHERE {deck_clause}NOT EXISTS (
+                SELECT 1 FROM card_progress seen
+                WHERE seen.kid_id = ? AND seen.card_id = fresh.id
+            )
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(kid_id, card_id) DO UPDATE SET
-            interval_days = excluded.interval_days,
-            due_date = excluded.due_date,
-            ease_factor = excluded.ease_factor,
-            streak = excluded.streak,
-            mastery_status = excluded.mastery_status,
-            last_review_ts = excluded.last_review_ts
-        """,
-        (
-            kid_id,
-            card_id,
-            interval_days,
-            due_date,
-            ease_factor,
-            streak,
-            mastery_status,
-            last_review_ts,
-        ),
+    """
+    params: List[object] = [kid_id, today]
+    if deck_id is not None:
+        params.append(deck_id)
+    params.append(kid_id)
+    return sql, params
+
+
+def _due_date(ts: Optional[str], interval_days: int, due_offset: int = 0) -> date:
+    """Due date of a review at `ts`, moved by its stored load-balancing offset."""
+    if due_offset:
+        due_offset = clamp_due_offset(interval_days, due_offset)
+    return _date_from_ts(ts) + timedelta(days=interval_days + due_offset)
+
+
+def _final_progress(
+    state: MemoryState, last_review_ts: Optional[str], rules: dict, due_offset: int = 0
+) -> CardProgressState:
+    due = _due_date(last_review_ts, state.interval_days, due_offset)
+    return CardProgressState(
+        interval_days=state.interval_days,
+        ease_factor=state.ease_factor,
+        streak=state.streak,
+        mastery_status=mastery_status_from_rules(state.streak, state.ease_factor, state.interval_days, rules),
+        due_date=due.isoformat(),
+        last_review_ts=last_review_ts,
+        stability=state.stability,
+        difficulty=state.difficulty,
     )
 
 
+REVIEW_SNAPSHOT_SQL = """
+    UPDATE reviews
+    SET after_interval_days = ?,
+        after_ease_factor = ?,
+        after_streak = ?,
+        after_due_date = ?,
+        after_mastery_status = ?,
+        after_stability = ?,
+        after_difficulty = ?
+    WHERE id = ?
+"""
+
+
+def review_snapshot_params(review_id: int, progress: CardProgressState) -> Tuple:
+    return (
+        progress.interval_days,
+        progress.ease_factor,
+        progress.streak,
+        progress.due_date,
+        progress.mastery_status,
+        progress.stability,
+        progress.difficulty,
+        review_id,
+    )
+
+
+def _replay_with_snapshots(
+    rows: Iterable[Tuple[int, str, Optional[str], int, int]],
+    rules_for: Callable[[int], Mapping],
+    scheduler_for: Callable[[int], Scheduler],
+    start: MemoryState = MemoryState(),
+    start_ts: Optional[str] = None,
+) -> Tuple[Optional[CardProgressState], List[Tuple]]:
+    """Fold (id, ts, grade, deck_id, due offset) rows from `start` (the state after
+    the review at `start_ts`); returns the final state and per-review snapshot params."""
+    state, previous_at = start, parse_review_ts(start_ts)
+    progress = None
+    snapshots: List[Tuple] = []
+    for review_id, ts, grade, deck_id, due_offset in rows:
+        scheduler = scheduler_for(deck_id)
+        elapsed = None
+        if scheduler.uses_elapsed:
+            reviewed_at = parse_review_ts(ts)
+            if reviewed_at is not None and previous_at is not None:
+                elapsed = max((reviewed_at - previous_at).total_seconds() / 86400, 0.0)
+            previous_at = reviewed_at
+        state = scheduler.step(state, map_grade_to_quality(grade or "fail"), elapsed)
+        progress = _final_progress(state, ts, rules_for(deck_id), due_offset)
+        snapshots.append(review_snapshot_params(review_id, progress))
+    return progress, snapshots
+
+
+def _card_replay_lookups(conn, kid_id: int) -> Tuple[Callable[[int], Mapping], Callable[[int], Scheduler]]:
+    schedulers = scheduler_lookup(conn, kid_id)
+    return (lambda deck_id: deck_mastery_rules(conn, deck_id)), (lambda deck_id: schedulers(kid_id, deck_id))
+
+
 def compute_progress_from_reviews(conn, kid_id: int, card_id: int) -> Optional[CardProgressState]:
     cursor = conn.cursor()
     cursor.execute(
         """
-        SELECT r.ts,
+        SELECT r.id,
+               r.ts,
                COALESCE(r.final_grade, r.grade) AS grade,
-               c.deck_id
+               c.deck_id,
+               r.due_offset_days
         FROM reviews r
         JOIN cards c ON c.id = r.card_id
         WHERE r.kid_id = ? AND r.card_id = ?
@@ -124,44 +277,266 @@ def compute_progress_from_reviews(conn, kid_id: int, card_id: int) -> Optional[C
         """,
         (kid_id, card_id),
     )
-    rows = cursor.fetchall()
-    if not rows:
+    progress, _ = _replay_with_snapshots([tuple(row) for row in cursor.fetchall()], *_card_replay_lookups(conn, kid_id))
+    return progress
+
+
+def rebuild_card_progress(conn, kid_id: Optional[int] = None, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """Replay the whole review log into card_progress in one scan (no commit).
+
+    Reviews stream in id order, which is review order except for offline
+    syncs of older reviews. Each (kid, card) keeps only its running state;
+    due date and mastery (with rules loaded once for all decks) are derived
+    from the final state, and rows are written with executemany in batches.
+    SM-2 decks take an inlined fast path; other schedulers step through
+    their Scheduler. Pairs whose reviews arrived out of timestamp order are
+    gathered in a second scan and replayed from their sorted history.
+
+    Each review's stored after_* state is rewritten where it differs from
+    the replay. Pass kid_id to rebuild one kid. Returns card_progress rows
+    written.
+    """
+    rules = load_all_mastery_rules(conn)
+    schedulers = scheduler_lookup(conn, kid_id)
+    card_decks = dict(conn.execute("SELECT id, deck_id FROM cards").fetchall())
+    states: Dict[Tuple[int, int], List] = {}
+    out_of_order = set()
+    where = "WHERE kid_id = ?" if kid_id is not None else ""
+
+    def rules_of(deck_id: int) -> dict:
+        return rules.get(deck_id, DEFAULT_MASTERY_RULES)
+
+    writer = conn.cursor()
+    changed_snapshots: List[Tuple] = []
+    # Due dates by (review date, interval, offset): most reviews share a date with others.
+    due_dates: Dict[Tuple[str, int, int], str] = {}
+    cursor = conn.cursor()
+    cursor.row_factory = None  # plain tuples: this loop touches every review
+    cursor.execute(
+        "SELECT id, kid_id, card_id, ts, COALESCE(final_grade, grade), due_offset_days, after_interval_days, "
+        "after_ease_factor, after_streak, after_due_date, after_mastery_status, after_stability, after_difficulty "
+        f"FROM reviews {where} ORDER BY id",
+        (kid_id,) if kid_id is not None else (),
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for review_id, row_kid, row_card, ts, grade, due_offset, *stored in rows:
+            deck_id = card_decks.get(row_card)
+            if deck_id is None:
+                continue
+            key = (row_kid, row_card)
+            # [interval, ease, streak, last ts, stability, difficulty, last review time, last due offset]
+            state = states.get(key)
+            if state is None:
+                state = states[key] = [1, 2.5, 0, None, None, None, None, 0]
+            elif ts < state[3]:
+                out_of_order.add(key)
+            quality = map_grade_to_quality(grade or "fail")
+            scheduler = schedulers(row_kid, deck_id)
+            if scheduler is SM2:
+                state[0], state[1], state[2] = sm2_step(state[0], state[1], quality, state[2])
+                state[4] = state[5] = None
+            else:
+                # Parse each timestamp once; elapsed_days() would parse both ends every review.
+                reviewed_at = parse_review_ts(ts)
+                elapsed = (
+                    max((reviewed_at - state[6]).total_seconds() / 86400, 0.0)
+                    if reviewed_at is not None and state[6] is not None
+                    else None
+                )
+                state[6] = reviewed_at
+                after = scheduler.step(MemoryState(*state[:3], state[4], state[5]), quality, elapsed)
+                state[0], state[1], state[2], state[4], state[5] = (
+                    after.interval_days,
+                    after.ease_factor,
+                    after.streak,
+                    after.stability,
+                    after.difficulty,
+                )
+            state[3], state[7] = ts, due_offset
+            if key not in out_of_order:
+                due_key = (ts[:10], state[0], due_offset)
+                due_date = due_dates.get(due_key)
+                if due_date is None:
+                    due_date = due_dates[due_key] = _due_date(ts, state[0], due_offset).isoformat()
+                snapshot = (
+                    state[0],
+                    state[1],
+                    state[2],
+                    due_date,
+                    mastery_status_from_rules(state[2], state[1], state[0], rules_of(deck_id)),
+                    state[4],
+                    state[5],
+                )
+                if tuple(stored) != snapshot:
+                    changed_snapshots.append((*snapshot, review_id))
+                    if len(changed_snapshots) >= batch_size:
+                        writer.executemany(REVIEW_SNAPSHOT_SQL, changed_snapshots)
+                        changed_snapshots.clear()
+    if changed_snapshots:
+        writer.executemany(REVIEW_SNAPSHOT_SQL, changed_snapshots)
+
+    histories = _collect_histories(conn, out_of_order, card_decks, where, kid_id, batch_size)
+    pending: List[Tuple] = []
+    written = 0
+    for key, (interval_days, ease_factor, streak, last_ts, stability, difficulty, _, due_offset) in states.items():
+        if key in out_of_order:
+            history = sorted(histories[key])
+            final, replayed = _replay_with_snapshots(
+                [(review_id, ts, grade, deck_id, offset) for ts, review_id, grade, deck_id, offset in history],
+                rules_of,
+                lambda deck_id, kid=key[0]: schedulers(kid, deck_id),
+            )
+            writer.executemany(REVIEW_SNAPSHOT_SQL, replayed)
+        else:
+            state = MemoryState(interval_days, ease_factor, streak, stability, difficulty)
+            final = _final_progress(state, last_ts, rules_of(card_decks[key[1]]), due_offset)
+        pending.append(_progress_params(key[0], key[1], final))
+        if len(pending) >= batch_size:
+            writer.executemany(UPSERT_CARD_PROGRESS_SQL, pending)
+            written += len(pending)
+            pending.clear()
+    if pending:
+        writer.executemany(UPSERT_CARD_PROGRESS_SQL, pending)
+        written += len(pending)
+    return written
+
+
+def _collect_histories(
+    conn, keys: set, card_decks: Dict[int, int], where: str, kid_id: Optional[int], batch_size: int
+) -> Dict[Tuple[int, int], List[Tuple]]:
+    """(ts, id, grade, deck_id, due offset) rows of the given (kid, card) pairs, from one more scan."""
+    histories: Dict[Tuple[int, int], List[Tuple]] = {key: [] for key in keys}
+    if not keys:
+        return histories
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(
+        f"SELECT kid_id, card_id, ts, id, COALESCE(final_grade, grade), due_offset_days FROM reviews {where}",
+        (kid_id,) if kid_id is not None else (),
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row_kid, row_card, ts, review_id, grade, due_offset in rows:
+            history = histories.get((row_kid, row_card))
+            if history is not None:
+                history.append((ts, review_id, grade, card_decks[row_card], due_offset))
+    return histories
+
+
+def _tail_start(conn, kid_id: int, card_id: int, from_review_id: int) -> Optional[Tuple[str, int, MemoryState, Optional[str]]]:
+    """(ts, id, start state, previous ts) to replay a card from `from_review_id` on, or None for a full replay."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT ts FROM reviews WHERE id = ? AND kid_id = ? AND card_id = ?", (from_review_id, kid_id, card_id))
+    row = cursor.fetchone()
+    if not row:
         return None
-    base = default_progress()
-    interval_days = base.interval_days
-    ease_factor = base.ease_factor
-    streak = base.streak
-    mastery_status = base.mastery_status
-    due_date = base.due_date
-    last_review_ts: Optional[str] = None
-    for row in rows:
-        grade = row["grade"] or "fail"
-        quality = map_grade_to_quality(grade)
-        review_date = _date_from_ts(row["ts"])
-        new_interval, new_ef, new_streak, new_due = update_sm2(
-            interval_days,
-            ease_factor,
-            quality,
-            streak,
-            base_date=review_date,
-        )
-        mastery_rules = get_deck_mastery_rules(conn, row["deck_id"])
-        mastery_status = mastery_status_from_rules(
-            new_streak,
-            new_ef,
-            new_interval,
-            mastery_rules,
-        )
-        interval_days = new_interval
-        ease_factor = new_ef
-        streak = new_streak
-        due_date = new_due.isoformat()
-        last_review_ts = row["ts"]
-    return CardProgressState(
-        interval_days=interval_days,
-        ease_factor=ease_factor,
-        streak=streak,
-        mastery_status=mastery_status,
-        due_date=due_date,
-        last_review_ts=last_review_ts,
+    ts = row[0]
+    cursor.execute(
+        """
+        SELECT after_interval_days, after_ease_factor, after_streak, after_stability, after_difficulty, ts
+        FROM reviews
+        WHERE kid_id = ? AND card_id = ? AND (ts < ? OR (ts = ? AND id < ?))
+        ORDER BY ts DESC, id DESC
+        LIMIT 1
+        """,
+        (kid_id, card_id, ts, ts, from_review_id),
     )
+    previous = cursor.fetchone()
+    if previous is None:
+        return ts, from_review_id, MemoryState(), None
+    if any(value is None for value in previous[:3]):
+        return None
+    state = MemoryState(int(previous[0]), float(previous[1]), int(previous[2]), previous[3], previous[4])
+    return ts, from_review_id, state, previous[5]
+
+
+def replay_card_progress(
+    conn, kid_id: int, card_id: int, from_review_id: Optional[int] = None
+) -> Optional[CardProgressState]:
+    """Recompute a card's progress and its reviews' snapshots, and store them (no commit).
+
+    Each review row keeps the scheduler state after it (after_* columns). With
+    from_review_id, the replay restarts from the snapshot of the review just
+    before it and folds only that review and later ones; without it, or when
+    the earlier snapshot is missing, the whole history is replayed.
+    """
+    start = _tail_start(conn, kid_id, card_id, from_review_id) if from_review_id is not None else None
+    tail_clause = "AND (r.ts > ? OR (r.ts = ? AND r.id >= ?))" if start else ""
+    params: List[object] = [kid_id, card_id]
+    if start:
+        params.extend([start[0], start[0], start[1]])
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT r.id,
+               r.ts,
+               COALESCE(r.final_grade, r.grade) AS grade,
+               c.deck_id,
+               r.due_offset_days
+        FROM reviews r
+        JOIN cards c ON c.id = r.card_id
+        WHERE r.kid_id = ? AND r.card_id = ? {tail_clause}
+        ORDER BY r.ts ASC, r.id ASC
+        """,
+        params,
+    )
+    rules_for, scheduler_for = _card_replay_lookups(conn, kid_id)
+    progress, snapshots = _replay_with_snapshots(
+        [tuple(row) for row in cursor.fetchall()],
+        rules_for,
+        scheduler_for,
+        *((start[2], start[3]) if start else ()),
+    )
+    if progress is None:
+        return None
+    cursor.executemany(REVIEW_SNAPSHOT_SQL, snapshots)
+    cursor.execute(UPSERT_CARD_PROGRESS_SQL, _progress_params(kid_id, card_id, progress))
+    return progress
+
+
+def replay_deck_progress(conn, deck_id: int) -> int:
+    """Replay every reviewed card of a deck, e.g. after its scheduler changed (no commit).
+
+    One scan over the deck's reviews, grouped by (kid, card); snapshots and
+    progress rows are written in batches. Returns the number of pairs replayed.
+    """
+    rules = deck_mastery_rules(conn, deck_id)
+    schedulers = scheduler_lookup(conn)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(
+        """
+        SELECT r.kid_id, r.card_id, r.id, r.ts, COALESCE(r.final_grade, r.grade), r.due_offset_days
+        FROM cards c
+        JOIN reviews r ON r.card_id = c.id
+        WHERE c.deck_id = ?
+        ORDER BY r.kid_id, r.card_id, r.ts, r.id
+        """,
+        (deck_id,),
+    )
+    writer = conn.cursor()
+    snapshots: List[Tuple] = []
+    pending: List[Tuple] = []
+    replayed = 0
+    for (kid_id, card_id), rows in groupby(cursor, key=lambda row: (row[0], row[1])):
+        progress, card_snapshots = _replay_with_snapshots(
+            [(review_id, ts, grade, deck_id, due_offset) for _, _, review_id, ts, grade, due_offset in rows],
+            lambda _: rules,
+            lambda _, kid=kid_id: schedulers(kid, deck_id),
+        )
+        snapshots.extend(card_snapshots)
+        pending.append(_progress_params(kid_id, card_id, progress))
+        replayed += 1
+        if len(snapshots) >= REBUILD_BATCH_SIZE:
+            writer.executemany(REVIEW_SNAPSHOT_SQL, snapshots)
+            writer.executemany(UPSERT_CARD_PROGRESS_SQL, pending)
+            snapshots.clear()
+            pending.clear()
+    writer.executemany(REVIEW_SNAPSHOT_SQL, snapshots)
+    writer.executemany(UPSERT_CARD_PROGRESS_SQL, pending)
+    return replayed
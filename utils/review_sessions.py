@@ -0,0 +1,147 @@
+"""Server-side deck review sessions.
+
+start_review resolves the kid's filtered candidate cards (FTS match, tag
+filters, group_texts ordering) once and keeps the ordered ids here. /review/next
+and /review/submit then walk that list by primary key instead of re-running
+the search for every card. Shuffled (non-grouped) sessions order cards by a
+keyed hash of card id and session seed, so a given seed always reproduces
+the same order.
+
+Sessions are in memory only. An unknown, expired or invalidated session id is
+not an error: the routes resolve the candidates again from the filters the
+forms still carry and continue under a new id.
+"""
+from __future__ import annotations
+
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SESSION_TTL_SECONDS = 2 * 60 * 60
+MAX_SESSIONS = 200
+
+
+def new_session_seed() -> str:
+    return secrets.token_hex(8)
+
+
+def shuffle_key(seed: str, card_id: int) -> bytes:
+    """Keyed hash giving each card a stable pseudo-random rank within a session."""
+    return hashlib.blake2b(str(card_id).encode(), key=seed.encode()[:64], digest_size=8).digest()
+
+
+def seeded_shuffle(rows: Iterable[Tuple[int, int]], seed: str) -> List[int]:
+    """Order (card_id, due_day) rows by due day, then by shuffle_key within a day."""
+    return [card_id for card_id, _ in sorted(rows, key=lambda row: (row[1], shuffle_key(seed, row[0])))]
+
+
+@dataclass
+class ReviewSession:
+    id: str
+    kid_id: int
+    deck_id: int
+    day: int
+    filters: Tuple[Any, ...]
+    seed: str
+    card_ids: "OrderedDict[int, None]"
+    last_used: float = field(default_factory=time.monotonic)
+
+    def head(self) -> Optional[int]:
+        return next(iter(self.card_ids), None)
+
+
+class ReviewSessionStore:
+    """Ordered candidate ids per review session, with idle expiry."""
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS, max_sessions: int = MAX_SESSIONS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, ReviewSession]" = OrderedDict()
+        self._counters = {"created": 0, "resumed": 0, "expired": 0, "invalidated": 0}
+
+    def create(
+        self,
+        kid_id: int,
+        deck_id: int,
+        day: int,
+        filters: Tuple[Any, ...],
+        card_ids: List[int],
+        seed: str,
+    ) -> ReviewSession:
+        session = ReviewSession(
+            id=secrets.token_urlsafe(12),
+            kid_id=kid_id,
+            deck_id=deck_id,
+            day=day,
+            filters=filters,
+            seed=seed,
+            card_ids=OrderedDict.fromkeys(card_ids),
+        )
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._counters["expired"] += 1
+            self._sessions[session.id] = session
+            self._counters["created"] += 1
+        return session
+
+    def get(
+        self, session_id: Optional[str], kid_id: int, deck_id: int, day: int, filters: Tuple[Any, ...]
+    ) -> Optional[ReviewSession]:
+        """The live session matching this kid, deck, day and filters, if any."""
+        if not session_id:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._expire_locked(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if (session.kid_id, session.deck_id, session.day, session.filters) != (kid_id, deck_id, day, filters):
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            self._counters["resumed"] += 1
+            return session
+
+    def head(self, session: ReviewSession) -> Optional[int]:
+        with self._lock:
+            return session.head()
+
+    def discard_card(self, session: ReviewSession, card_id: int) -> None:
+        with self._lock:
+            session.card_ids.pop(card_id, None)
+
+    def invalidate_deck(self, deck_id: int) -> None:
+        with self._lock:
+            stale = [key for key, session in self._sessions.items() if session.deck_id == deck_id]
+            for key in stale:
+                del self._sessions[key]
+            self._counters["invalidated"] += len(stale)
+
+    def invalidate_all(self) -> None:
+        with self._lock:
+            self._counters["invalidated"] += len(self._sessions)
+            self._sessions.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "sessions": len(self._sessions)}
+
+    def _expire_locked(self, now: float) -> None:
+        # Sessions are kept in last-used order, so expired ones are at the front.
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self._counters["expired"] += 1
+
+
+REVIEW_SESSIONS = ReviewSessionStore()
@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from db.database import write_transaction
+from utils.days import day_number, today_number
+from utils.durations import record_duration
+from utils.load_balance import balanced_interval
+from utils.deck_cache import deck_mastery_rules
+from utils.mastery import mastery_status_from_rules
+from utils.progress import (
+    REVIEW_SNAPSHOT_SQL,
+    CardProgressState,
+    default_progress,
+    get_card_progress,
+    replay_card_progress,
+    review_snapshot_params,
+    upsert_card_progress,
+)
+from utils.schedulers import Scheduler, elapsed_days, load_scheduler
+
+
+# SQLite's datetime('now') format, which reviews written by the column default
+# use; one format keeps ts ordering and comparisons chronological as text.
+REVIEW_TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def format_review_ts(value: datetime) -> str:
+    """A review time as stored in reviews.ts (UTC, whole seconds)."""
+    return _as_utc(value).strftime(REVIEW_TS_FORMAT)
+
+
+def parse_duration_seconds(started_at: Optional[str], now: Optional[datetime] = None) -> Optional[int]:
+    """Seconds between the card being shown (ISO timestamp) and now."""
+    if not started_at:
+        return None
+    now = now or datetime.now(timezone.utc)
+    try:
+        started = datetime.fromisoformat(started_at)
+    except ValueError:
+        return None
+    if started.tzinfo is None:
+        started = started.replace(tzinfo=timezone.utc)
+    return max(0, int((now - started).total_seconds()))
+
+
+def grade_from_parent_quality(quality: int) -> str:
+    """Grade recorded for a parent's 0-5 recitation score."""
+    if quality >= 4:
+        return "perfect"
+    if quality >= 3:
+        return "good"
+    return "fail"
+
+
+def not_reviewed_on_day_filter(kid_id: int, day: int, card_alias: str = "c") -> Tuple[str, List[object]]:
+    """SQL predicate (and params) excluding cards the kid already reviewed on `day`.
+
+    Probes idx_reviews_kid_day_card once per candidate card.
+    """
+    sql = f"""
+        NOT EXISTS (
+            SELECT 1 FROM reviews r
+            WHERE r.kid_id = ? AND r.review_day = ? AND r.card_id = {card_alias}.id
+        )
+    """
+    return sql, [kid_id, day]
+
+
+def record_review(
+    conn,
+    *,
+    kid_id: int,
+    card_id: int,
+    deck_id: int,
+    quality: int,
+    final_grade: str,
+    auto_grade: Optional[str],
+    graded_by: str,
+    review_mode: str,
+    user_text: str,
+    hint_mode: str,
+    duration_seconds: Optional[int],
+    llm_status: Optional[str] = None,
+    balance_target: Optional[int] = None,
+) -> int:
+    """Insert a review (with its scheduler snapshot), advance the kid's progress and commit. Returns the review id.
+
+    With balance_target, the due date may move within the interval's fuzz
+    window towards days with fewer cards due (utils/load_balance.py); the
+    review stores the offset so replays land on the same day.
+    """
+    stored = get_card_progress(conn, kid_id, card_id)
+    progress = stored or default_progress()
+    review_ts = format_review_ts(datetime.now(timezone.utc))
+    scheduler = load_scheduler(conn, kid_id, deck_id)
+    elapsed = elapsed_days(progress.last_review_ts, review_ts) if scheduler.uses_elapsed else None
+    state = scheduler.step(progress.memory(), quality, elapsed)
+    today = date.today()
+    new_interval, new_ef, new_streak = state.interval_days, state.ease_factor, state.streak
+    due_offset = 0
+    if balance_target is not None:
+        due_offset = balanced_interval(
+            conn,
+            kid_id,
+            today.toordinal(),
+            new_interval,
+            balance_target,
+            day_number(stored.due_date) if stored else None,
+        ) - new_interval
+    new_due = today + timedelta(days=new_interval + due_offset)
+    mastery_rules = deck_mastery_rules(conn, deck_id)
+    mastery_status = mastery_status_from_rules(
+        new_streak,
+        new_ef,
+        new_interval,
+        mastery_rules,
+    )
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO reviews (
+            card_id,
+            kid_id,
+            ts,
+            review_day,
+            grade,
+            auto_grade,
+            final_grade,
+            graded_by,
+            review_mode,
+            user_text,
+            hint_mode,
+            duration_seconds,
+            llm_status,
+            due_offset_days,
+            after_interval_days,
+            after_ease_factor,
+            after_streak,
+            after_due_date,
+            after_mastery_status,
+            after_stability,
+            after_difficulty
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            card_id,
+            kid_id,
+            review_ts,
+            today_number(),
+            final_grade,
+            auto_grade,
+            final_grade,
+            graded_by,
+            review_mode,
+            user_text,
+            hint_mode,
+            duration_seconds,
+            llm_status,
+            due_offset,
+            new_interval,
+            new_ef,
+            new_streak,
+            new_due.isoformat(),
+            mastery_status,
+            state.stability,
+            state.difficulty,
+        ),
+    )
+    review_id = cursor.lastrowid
+    upsert_card_progress(
+        conn,
+        kid_id=kid_id,
+        card_id=card_id,
+        interval_days=new_interval,
+        due_date=new_due.isoformat(),
+        ease_factor=new_ef,
+        streak=new_streak,
+        mastery_status=mastery_status,
+        last_review_ts=review_ts,
+        stability=state.stability,
+        difficulty=state.difficulty,
+    )
+    record_duration(conn, kid_id, card_id, deck_id, duration_seconds)
+    conn.commit()
+    return review_id
+
+
+@dataclass(frozen=True)
+class BatchReview:
+    """A graded review from a batch sync, ready to be written."""
+
+    client_id: str
+    card_id: int
+    deck_id: int
+    reviewed_at: datetime
+    quality: int
+    final_grade: str
+    auto_grade: Optional[str]
+    graded_by: str
+    review_mode: str
+    user_text: str
+    hint_mode: str
+    duration_seconds: Optional[int]
+    llm_status: Optional[str] = None
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _parse_review_ts(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return _as_utc(datetime.fromisoformat(value))
+    except ValueError:
+        return None
+
+
+def _store_progress(conn, kid_id: int, card_id: int, progress: CardProgressState) -> None:
+    upsert_card_progress(
+        conn,
+        kid_id=kid_id,
+        card_id=card_id,
+        interval_days=progress.interval_days,
+        due_date=progress.due_date,
+        ease_factor=progress.ease_factor,
+        streak=progress.streak,
+        mastery_status=progress.mastery_status,
+        last_review_ts=progress.last_review_ts,
+        stability=progress.stability,
+        difficulty=progress.difficulty,
+    )
+
+
+def load_batch_cards(conn, card_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Live cards (with deck review mode) referenced by a batch, keyed by id."""
+    card_ids = sorted(set(card_ids))
+    if not card_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in card_ids)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT c.id, c.deck_id, c.full_text, COALESCE(d.review_mode, 'free_recall') AS review_mode
+        FROM cards c
+        JOIN decks d ON d.id = c.deck_id
+        WHERE c.id IN ({placeholders}) AND c.deleted_at IS NULL AND d.deleted_at IS NULL
+        """,
+        card_ids,
+    )
+    return {row["id"]: dict(row) for row in cursor.fetchall()}
+
+
+def existing_client_reviews(conn, kid_id: int, client_ids: Iterable[str]) -> Dict[str, Tuple[int, str]]:
+    """(review id, final grade) of reviews already stored under these client ids."""
+    client_ids = sorted(set(client_ids))
+    if not client_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in client_ids)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT client_id, id, COALESCE(final_grade, grade) AS grade
+        FROM reviews
+        WHERE kid_id = ? AND client_id IN ({placeholders})
+        """,
+        (kid_id, *client_ids),
+    )
+    return {row["client_id"]: (row["id"], row["grade"]) for row in cursor.fetchall()}
+
+
+def record_review_batch(
+    conn, kid_id: int, reviews: List[BatchReview], balance_target: Optional[int] = None
+) -> Dict[str, int]:
+    """Insert graded reviews and advance progress once per card, in one transaction.
+
+    Reviews are applied in reviewed_at order. A card whose stored progress is
+    already newer than the batch's oldest review for it (another device synced
+    first) is replayed from that review on instead. Client ids already stored
+    are skipped. balance_target load-balances due dates as in record_review
+    (not on the replay path, which reapplies stored offsets). Returns
+    {client_id: review_id} for the rows written.
+    """
+    with write_transaction(conn):
+        stored = existing_client_reviews(conn, kid_id, (review.client_id for review in reviews))
+        pending: Dict[str, BatchReview] = {}
+        for review in sorted(reviews, key=lambda item: _as_utc(item.reviewed_at)):
+            if review.client_id not in stored:
+                pending.setdefault(review.client_id, review)
+        by_card: Dict[int, List[BatchReview]] = {}
+        for review in pending.values():
+            by_card.setdefault(review.card_id, []).append(review)
+
+        written: Dict[str, int] = {}
+        cursor = conn.cursor()
+        for review in pending.values():
+            reviewed_at = _as_utc(review.reviewed_at)
+            review_ts = format_review_ts(reviewed_at)
+            cursor.execute(
+                """
+                INSERT INTO reviews (
+                    card_id,
+                    kid_id,
+                    ts,
+                    review_day,
+                    grade,
+                    auto_grade,
+                    final_grade,
+                    graded_by,
+                    review_mode,
+                    user_text,
+                    hint_mode,
+                    duration_seconds,
+                    client_id,
+                    llm_status
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    review.card_id,
+                    kid_id,
+                    review_ts,
+                    reviewed_at.astimezone().date().toordinal(),
+                    review.final_grade,
+                    review.auto_grade,
+                    review.final_grade,
+                    review.graded_by,
+                    review.review_mode,
+                    review.user_text,
+                    review.hint_mode,
+                    review.duration_seconds,
+                    review.client_id,
+                    review.llm_status,
+                ),
+            )
+            written[review.client_id] = cursor.lastrowid
+
+        mastery_rules: Dict[int, Mapping] = {}
+        schedulers: Dict[int, Scheduler] = {}
+        for card_id, card_reviews in by_card.items():
+            progress = get_card_progress(conn, kid_id, card_id)
+            last_ts = _parse_review_ts(progress.last_review_ts) if progress else None
+            if progress and last_ts and _as_utc(card_reviews[0].reviewed_at) < last_ts:
+                replay_card_progress(conn, kid_id, card_id, from_review_id=written[card_reviews[0].client_id])
+            else:
+                # card_progress is written once after the loop, so until then the
+                # card is counted on its stored due day for every step's balancing.
+                current_due_day = day_number(progress.due_date) if progress else None
+                progress = progress or default_progress()
+                snapshots = []
+                due_offsets = []
+                for review in card_reviews:
+                    reviewed_at = _as_utc(review.reviewed_at)
+                    if review.deck_id not in mastery_rules:
+                        mastery_rules[review.deck_id] = deck_mastery_rules(conn, review.deck_id)
+                        schedulers[review.deck_id] = load_scheduler(conn, kid_id, review.deck_id)
+                    scheduler = schedulers[review.deck_id]
+                    elapsed = (
+                        elapsed_days(progress.last_review_ts, format_review_ts(reviewed_at))
+                        if scheduler.uses_elapsed
+                        else None
+                    )
+                    state = scheduler.step(progress.memory(), review.quality, elapsed)
+                    base_date = reviewed_at.astimezone().date()
+                    due_offset = 0
+                    if balance_target is not None:
+                        due_offset = balanced_interval(
+                            conn,
+                            kid_id,
+                            base_date.toordinal(),
+                            state.interval_days,
+                            balance_target,
+                            current_due_day,
+                        ) - state.interval_days
+                        if due_offset:
+                            due_offsets.append((due_offset, written[review.client_id]))
+                    due = base_date + timedelta(days=state.interval_days + due_offset)
+                    progress = CardProgressState(
+                        interval_days=state.interval_days,
+                        ease_factor=state.ease_factor,
+                        streak=state.streak,
+                        mastery_status=mastery_status_from_rules(
+                            state.streak, state.ease_factor, state.interval_days, mastery_rules[review.deck_id]
+                        ),
+                        due_date=due.isoformat(),
+                        last_review_ts=format_review_ts(reviewed_at),
+                        stability=state.stability,
+                        difficulty=state.difficulty,
+                    )
+                    snapshots.append(review_snapshot_params(written[review.client_id], progress))
+                cursor.executemany(REVIEW_SNAPSHOT_SQL, snapshots)
+                cursor.executemany("UPDATE reviews SET due_offset_days = ? WHERE id = ?", due_offsets)
+                _store_progress(conn, kid_id, card_id, progress)
+            for review in card_reviews:
+                record_duration(conn, kid_id, card_id, review.deck_id, review.duration_seconds)
+    return written
@@ -0,0 +1,142 @@
+"""Per-deck review schedulers.
+
+decks.scheduler picks how a review moves a card's progress:
+
+* 'sm2' -- utils/sm2.py, the original algorithm;
+* 'fsrs' -- the memory model in utils/fsrs.py with the kid's fitted weights
+  (scheduler_params, refitted in the background by utils/fsrs_jobs.py) or
+  the published defaults until there is enough history.
+
+Both keep interval_days, ease_factor and streak current, so mastery rules,
+due days and the today queue work the same either way; FSRS also carries a
+stability and difficulty and takes the interval from them.
+"""
+from __future__ import annotations
+
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Callable, Dict, NamedTuple, Optional, Sequence
+
+from utils.deck_cache import DECK_CACHE
+from utils.fsrs import DEFAULT_WEIGHTS, DESIRED_RETENTION, next_interval, review_step
+from utils.sm2 import sm2_step
+
+SCHEDULER_NAMES = ("sm2", "fsrs")
+DEFAULT_SCHEDULER = "sm2"
+
+
+class MemoryState(NamedTuple):
+    """A card's scheduling state; a tuple because rebuilds create one per review."""
+
+    interval_days: int = 1
+    ease_factor: float = 2.5
+    streak: int = 0
+    stability: Optional[float] = None
+    difficulty: Optional[float] = None
+
+
+class Scheduler(ABC):
+    """Moves a card's MemoryState through one graded review."""
+
+    name = ""
+    # Whether step() needs the days since the card's previous review.
+    uses_elapsed = False
+
+    @abstractmethod
+    def step(self, state: MemoryState, quality: int, elapsed_days: Optional[float] = None) -> MemoryState:
+        """Return the state after one review graded with this SM-2 quality."""
+
+
+class Sm2Scheduler(Scheduler):
+    name = "sm2"
+
+    def step(self, state: MemoryState, quality: int, elapsed_days: Optional[float] = None) -> MemoryState:
+        interval_days, ease_factor, streak = sm2_step(state.interval_days, state.ease_factor, quality, state.streak)
+        return MemoryState(interval_days, ease_factor, streak)
+
+
+class FsrsScheduler(Scheduler):
+    name = "fsrs"
+    uses_elapsed = True
+
+    def __init__(self, weights: Sequence[float] = DEFAULT_WEIGHTS, desired_retention: float = DESIRED_RETENTION):
+        self.weights = tuple(weights)
+        self.desired_retention = desired_retention
+
+    def step(self, state: MemoryState, quality: int, elapsed_days: Optional[float] = None) -> MemoryState:
+        # Ease and streak still follow SM-2 so deck mastery rules keep their meaning.
+        _, ease_factor, streak = sm2_step(state.interval_days, state.ease_factor, quality, state.streak)
+        rating = 1 if quality < 3 else 3 if quality < 4 else 4
+        stability, difficulty = review_step(self.weights, state.stability, state.difficulty, elapsed_days, rating)
+        return MemoryState(
+            next_interval(stability, self.desired_retention), ease_factor, streak, stability, difficulty
+        )
+
+
+SM2 = Sm2Scheduler()
+
+
+def make_scheduler(name: Optional[str], weights: Optional[str] = None) -> Scheduler:
+    """Scheduler for a deck's scheduler name and a kid's stored weights (JSON)."""
+    if name == "fsrs":
+        return FsrsScheduler(json.loads(weights) if weights else DEFAULT_WEIGHTS)
+    return SM2
+
+
+def load_scheduler(conn, kid_id: int, deck_id: int) -> Scheduler:
+    """The deck's scheduler (from DECK_CACHE, read directly for deleted decks) with the kid's weights."""
+    deck = DECK_CACHE.get(conn, deck_id)
+    if deck is not None:
+        name = deck.scheduler
+    else:
+        row = conn.execute("SELECT scheduler FROM decks WHERE id = ?", (deck_id,)).fetchone()
+        name = row[0] if row else DEFAULT_SCHEDULER
+    if name == "sm2":
+        return SM2
+    row = conn.execute("SELECT weights FROM scheduler_params WHERE kid_id = ?", (kid_id,)).fetchone()
+    return make_scheduler(name, row[0] if row else None)
+
+
+def scheduler_lookup(conn, kid_id: Optional[int] = None) -> Callable[[int, int], Scheduler]:
+    """(kid_id, deck_id) -> Scheduler, with deck choices and kid weights loaded once."""
+    decks = dict(conn.execute("SELECT id, scheduler FROM decks WHERE scheduler != 'sm2'").fetchall())
+    if kid_id is None:
+        weights = dict(conn.execute("SELECT kid_id, weights FROM scheduler_params").fetchall())
+    else:
+        weights = dict(
+            conn.execute("SELECT kid_id, weights FROM scheduler_params WHERE kid_id = ?", (kid_id,)).fetchall()
+        )
+    cache: Dict[tuple, Scheduler] = {}
+
+    def scheduler_for(row_kid: int, deck_id: int) -> Scheduler:
+        name = decks.get(deck_id)
+        if name is None:
+            return SM2
+        key = (row_kid, deck_id)
+        if key not in cache:
+            cache[key] = make_scheduler(name, weights.get(row_kid))
+        return cache[key]
+
+    return scheduler_for
+
+
+def parse_review_ts(value: Optional[str]) -> Optional[datetime]:
+    """A review timestamp as an aware UTC datetime (naive values are UTC)."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def elapsed_days(previous_ts: Optional[str], ts: Optional[str]) -> Optional[float]:
+    """Days between two review timestamps (None when either is missing)."""
+    previous, current = parse_review_ts(previous_ts), parse_review_ts(ts)
+    if previous is None or current is None:
+        return None
+    return max((current - previous).total_seconds() / 86400, 0.0)
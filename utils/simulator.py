@@ -0,0 +1,310 @@
+"""Monte Carlo projection of daily review load and deck mastery dates.
+
+Every assigned (kid, card) becomes one row of a set of NumPy arrays holding
+its SM-2 interval, ease, streak and next due day. A run draws a grade for
+each row that falls due, with the kid's recent perfect/good/fail mix as
+probabilities, and applies the same SM-2 update as utils/sm2.py to all of
+those rows at once. Runs sit back to back in the same flat arrays, so one
+simulated day of every run is a handful of array operations.
+
+Cards the kid hasn't started are introduced in deck order at the deck
+plan's weekly_goal (or the assignment's new_cap per day, whichever is
+lower); with neither set they are all due today, as in the today queue.
+Review caps and days_of_week are not modelled: the projected load is what
+falls due, not what a capped queue would show.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.days import day_number, today_number
+from utils.mastery import DEFAULT_MASTERY_RULES, load_all_mastery_rules
+
+SIMULATION_DAYS = 90
+MAX_SIMULATION_DAYS = 365
+SIMULATION_RUNS = 32
+MIN_SIMULATION_RUNS = 8
+# Rows x runs simulated at once; larger households get fewer runs.
+SIMULATION_CELLS = 320_000
+GRADE_HISTORY_DAYS = 180
+# Pseudo-reviews (fail, good, perfect) blended into each kid's grade mix.
+GRADE_PRIOR = (2.0, 5.0, 3.0)
+NEVER = np.iinfo(np.int32).max
+
+
+@dataclass
+class SimulationInputs:
+    """Per-row arrays for every simulated (kid, card), sorted by group."""
+
+    today: int
+    interval: np.ndarray
+    ease: np.ndarray
+    streak: np.ndarray
+    due: np.ndarray
+    mastered: np.ndarray
+    grade_cuts: np.ndarray
+    rules: np.ndarray
+    group_starts: np.ndarray
+    groups: List[Dict]
+
+
+@dataclass
+class DeckForecast:
+    kid_id: int
+    kid_name: str
+    deck_id: int
+    deck_name: str
+    cards: int
+    target_date: Optional[date]
+    mastery_date: Optional[date]
+    late_mastery_date: Optional[date]
+    on_target: Optional[float]
+
+
+@dataclass
+class SimulationResult:
+    days: List[date]
+    mean_load: List[float]
+    p90_load: List[int]
+    decks: List[DeckForecast]
+    runs: int
+
+
+def _grade_cuts(conn, today: int) -> Dict[int, Tuple[float, float]]:
+    """Per kid (P(fail), P(fail or good)) from recent reviews blended with GRADE_PRIOR."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT kid_id,
+               SUM(COALESCE(final_grade, grade) = 'fail'),
+               SUM(COALESCE(final_grade, grade) = 'good'),
+               SUM(COALESCE(final_grade, grade) = 'perfect')
+        FROM reviews
+        WHERE review_day >= ?
+        GROUP BY kid_id
+        """,
+        (today - GRADE_HISTORY_DAYS,),
+    )
+    cuts = {}
+    for kid_id, fails, goods, perfects in cursor.fetchall():
+        counts = [fails + GRADE_PRIOR[0], goods + GRADE_PRIOR[1], perfects + GRADE_PRIOR[2]]
+        total = sum(counts)
+        cuts[kid_id] = (counts[0] / total, (counts[0] + counts[1]) / total)
+    return cuts
+
+
+def _prior_cuts() -> Tuple[float, float]:
+    total = sum(GRADE_PRIOR)
+    return GRADE_PRIOR[0] / total, (GRADE_PRIOR[0] + GRADE_PRIOR[1]) / total
+
+
+def load_simulation_inputs(conn, kid_id: Optional[int] = None, today: Optional[int] = None) -> SimulationInputs:
+    """Current progress of every active assignment (one kid's, or all kids')."""
+    today = today if today is not None else today_number()
+    kid_clause = "AND a.kid_id = ?" if kid_id is not None else ""
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT a.kid_id, k.name, a.deck_id, d.name, a.new_cap, dp.weekly_goal, dp.target_date,
+               cp.interval_days, cp.ease_factor, cp.streak, cp.due_day, cp.mastery_status
+        FROM assignments a
+        JOIN kids k ON k.id = a.kid_id AND k.deleted_at IS NULL
+        JOIN decks d ON d.id = a.deck_id AND d.deleted_at IS NULL
+        JOIN cards c ON c.deck_id = a.deck_id AND c.deleted_at IS NULL
+        LEFT JOIN deck_plans dp ON dp.deck_id = a.deck_id
+        LEFT JOIN card_progress cp ON cp.kid_id = a.kid_id AND cp.card_id = c.id
+        WHERE a.enabled = 1 {kid_clause}
+        ORDER BY k.name, a.kid_id, d.name, a.deck_id, c.position, c.id
+        """,
+        (kid_id,) if kid_id is not None else (),
+    )
+    rows = cursor.fetchall()
+    all_rules = load_all_mastery_rules(conn)
+    cuts = _grade_cuts(conn, today)
+    prior = _prior_cuts()
+
+    count = len(rows)
+    interval = np.ones(count, dtype=np.int64)
+    ease = np.full(count, 2.5)
+    streak = np.zeros(count, dtype=np.int32)
+    due = np.zeros(count, dtype=np.int64)
+    mastered = np.zeros(count, dtype=bool)
+    grade_cuts = np.empty((count, 2))
+    rules = np.empty((count, 3))
+    groups: List[Dict] = []
+    group_starts: List[int] = []
+    new_rank = 0
+    per_day: Optional[float] = None
+    for index, row in enumerate(rows):
+        (row_kid, kid_name, deck_id, deck_name, new_cap, weekly_goal, target_date,
+         interval_days, ease_factor, card_streak, due_day, mastery_status) = row
+        if not groups or (groups[-1]["kid_id"], groups[-1]["deck_id"]) != (row_kid, deck_id):
+            groups.append(
+                {
+                    "kid_id": row_kid,
+                    "kid_name": kid_name,
+                    "deck_id": deck_id,
+                    "deck_name": deck_name,
+                    "target_day": day_number(target_date),
+                }
+            )
+            group_starts.append(index)
+            new_rank = 0
+            rates = [rate for rate in (weekly_goal / 7 if weekly_goal else None, new_cap) if rate is not None]
+            per_day = min(rates) if rates else None
+        deck_rules = all_rules.get(deck_id, DEFAULT_MASTERY_RULES)
+        rules[index] = (
+            deck_rules["consecutive_grades"],
+            deck_rules["min_ease_factor"],
+            deck_rules["min_interval_days"],
+        )
+        grade_cuts[index] = cuts.get(row_kid, prior)
+        if interval_days is None:
+            # Not started: introduced in deck order at the planned rate.
+            if per_day is None:
+                due[index] = 0
+            elif per_day <= 0:
+                due[index] = NEVER
+            else:
+                due[index] = min(int(new_rank / per_day), NEVER)
+            new_rank += 1
+            continue
+        interval[index] = interval_days
+        ease[index] = ease_factor
+        streak[index] = card_streak
+        due[index] = max((due_day if due_day is not None else today) - today, 0)
+        mastered[index] = mastery_status == "mastered"
+    return SimulationInputs(
+        today=today,
+        interval=interval,
+        ease=ease,
+        streak=streak,
+        due=due,
+        mastered=mastered,
+        grade_cuts=grade_cuts,
+        rules=rules,
+        group_starts=np.asarray(group_starts, dtype=np.intp),
+        groups=groups,
+    )
+
+
+def simulate_due_load(
+    inputs: SimulationInputs,
+    days: int = SIMULATION_DAYS,
+    runs: Optional[int] = None,
+    seed: Optional[int] = 0,
+) -> SimulationResult:
+    """Run Monte Carlo schedules of every row for at least `days` days.
+
+    `runs` defaults to SIMULATION_RUNS, lowered to fit SIMULATION_CELLS (but
+    never below MIN_SIMULATION_RUNS) so large households stay fast.
+
+    The horizon is stretched (up to MAX_SIMULATION_DAYS) to reach the latest
+    deck target date. A deck's mastery day in a run is the first day every
+    one of its cards has reached mastery at least once.
+    """
+    targets = [group["target_day"] - inputs.today for group in inputs.groups if group["target_day"]]
+    horizon = min(max([days, *(target + 1 for target in targets)]), MAX_SIMULATION_DAYS)
+    rng = np.random.default_rng(seed)
+    rows = inputs.interval.size
+    if runs is None:
+        runs = max(MIN_SIMULATION_RUNS, min(SIMULATION_RUNS, SIMULATION_CELLS // max(rows, 1)))
+    # Runs are laid out back to back in flat arrays: index = run * rows + row.
+    interval = np.tile(inputs.interval, runs)
+    ease = np.tile(inputs.ease, runs)
+    streak = np.tile(inputs.streak, runs)
+    due = np.tile(np.minimum(inputs.due, NEVER).astype(np.int32), runs)
+    mastered_day = np.tile(np.where(inputs.mastered, 0, NEVER).astype(np.int32), runs)
+    fail_cut, good_cut = inputs.grade_cuts[:, 0], inputs.grade_cuts[:, 1]
+    need_streak, need_ease, need_interval = inputs.rules[:, 0], inputs.rules[:, 1], inputs.rules[:, 2]
+    load = np.zeros((runs, horizon), dtype=np.int32)
+
+    for day in range(horizon):
+        index = np.flatnonzero(due == day)
+        if index.size == 0:
+            continue
+        row_idx = index % rows
+        load[:, day] = np.bincount(index // rows, minlength=runs)
+        draws = rng.random(index.size)
+        quality = np.where(draws < fail_cut[row_idx], 0, np.where(draws < good_cut[row_idx], 3, 4))
+        old_interval = interval[index]
+        old_ease = ease[index]
+        passed = quality >= 3
+        new_streak = np.where(passed, streak[index] + 1, 0)
+        grown = np.maximum(1, np.rint(old_interval * old_ease)).astype(np.int64)
+        new_interval = np.where(passed, np.where(old_interval == 1, np.where(quality >= 4, 6, 1), grown), 1)
+        lapse = 5 - quality
+        new_ease = np.maximum(1.3, old_ease + (0.1 - lapse * (0.08 + lapse * 0.02)))
+        interval[index] = new_interval
+        ease[index] = new_ease
+        streak[index] = new_streak
+        due[index] = np.minimum(day + new_interval, NEVER)
+        now_mastered = (
+            (new_streak >= need_streak[row_idx])
+            & (new_ease >= need_ease[row_idx])
+            & (new_interval >= need_interval[row_idx])
+        )
+        first = mastered_day[index]
+        mastered_day[index] = np.where(now_mastered & (first == NEVER), day, first)
+
+    mastered_day = mastered_day.reshape(runs, rows)
+    start = date.fromordinal(inputs.today)
+    decks: List[DeckForecast] = []
+    if inputs.groups:
+        deck_days = np.maximum.reduceat(mastered_day, inputs.group_starts, axis=1)
+        sizes = np.diff(np.append(inputs.group_starts, inputs.interval.size))
+        for group, size, column in zip(inputs.groups, sizes, deck_days.T):
+            target_offset = group["target_day"] - inputs.today if group["target_day"] else None
+            decks.append(
+                DeckForecast(
+                    kid_id=group["kid_id"],
+                    kid_name=group["kid_name"],
+                    deck_id=group["deck_id"],
+                    deck_name=group["deck_name"],
+                    cards=int(size),
+                    target_date=date.fromordinal(group["target_day"]) if group["target_day"] else None,
+                    mastery_date=_quantile_date(column, 0.5, start),
+                    late_mastery_date=_quantile_date(column, 0.9, start),
+                    on_target=(
+                        round(float(np.mean(column <= target_offset)), 2)
+                        if target_offset is not None and target_offset >= 0
+                        else None
+                    ),
+                )
+            )
+    return SimulationResult(
+        days=[start + timedelta(days=offset) for offset in range(horizon)],
+        mean_load=[round(float(value), 1) for value in load.mean(axis=0)],
+        p90_load=[int(value) for value in np.percentile(load, 90, axis=0, method="higher")],
+        decks=decks,
+        runs=runs,
+    )
+
+
+def _quantile_date(mastery_days: np.ndarray, quantile: float, start: date) -> Optional[date]:
+    """Date by which `quantile` of runs mastered the deck (None if beyond the horizon)."""
+    value = np.quantile(mastery_days, quantile, method="higher")
+    if value == NEVER:
+        return None
+    return start + timedelta(days=int(value))
+
+
+def weekly_load(result: SimulationResult) -> List[Dict]:
+    """Projected reviews per week: mean total, mean per day and the busiest day's 90th percentile."""
+    weeks = []
+    for offset in range(0, len(result.days), 7):
+        mean = result.mean_load[offset : offset + 7]
+        weeks.append(
+            {
+                "start": result.days[offset],
+                "end": result.days[offset + len(mean) - 1],
+                "reviews": round(sum(mean)),
+                "per_day": round(sum(mean) / len(mean), 1),
+                "peak": max(result.p90_load[offset : offset + 7]),
+            }
+        )
+    return weeks
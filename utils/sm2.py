@@ -10,14 +10,8 @@ def map_grade_to_quality(grade: str) -> int:
     }
     return mapping.get(grade, 0)
 
-def update_sm2(
-    card_interval: int,
-    card_ef: float,
-    quality: int,
-    streak: int,
-    base_date: Optional[date] = None,
-) -> Tuple[int, float, int, date]:
-    """Update SM-2 parameters and compute new due date."""
+def sm2_step(card_interval: int, card_ef: float, quality: int, streak: int) -> Tuple[int, float, int]:
+    """Next SM-2 (interval, ease factor, streak), without a due date."""
     if quality < 3:
         new_streak = 0
         new_interval = 1
@@ -28,6 +22,17 @@ def update_sm2(
         else:
             new_interval = max(1, round(card_interval * card_ef))
     new_ef = max(1.3, card_ef + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+    return new_interval, new_ef, new_streak
+
+def update_sm2(
+    card_interval: int,
+    card_ef: float,
+    quality: int,
+    streak: int,
+    base_date: Optional[date] = None,
+) -> Tuple[int, float, int, date]:
+    """Update SM-2 parameters and compute new due date."""
+    new_interval, new_ef, new_streak = sm2_step(card_interval, card_ef, quality, streak)
     anchor = base_date or date.today()
     new_due = anchor + timedelta(days=new_interval)
     return new_interval, new_ef, new_streak, new_due
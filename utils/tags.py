@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import re
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 
 
 _TAG_SPLIT_RE = re.compile(r"[,\n]+")
@@ -43,25 +43,47 @@ def upsert_tags(conn, tag_names: Iterable[str]) -> List[int]:
     return [id_map[name] for name in names if name in id_map]
 
 
-def set_card_tags(conn, card_id: int, tag_names: Iterable[str]) -> None:
+def split_tag_list(value: Optional[str]) -> List[str]:
+    return [tag for tag in (value or "").split(",") if tag]
+
+
+def _sync_tags(conn, table: str, link_table: str, owner_column: str, owner_id: int, tag_names: Iterable[str]) -> None:
+    """Apply only the tag links that changed.
+
+    The owner's tag_list column (kept current by the link-table triggers) says
+    what is linked today, so an unchanged tag set costs one indexed read and
+    no writes.
+    """
+    wanted = list(dict.fromkeys(tag_names))
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM card_tags WHERE card_id = ?", (card_id,))
-    tag_ids = upsert_tags(conn, tag_names)
+    cursor.execute(f"SELECT tag_list FROM {table} WHERE id = ?", (owner_id,))
+    row = cursor.fetchone()
+    current = split_tag_list(row[0] if row else "")
+    if sorted(wanted) == current:
+        return
+    removed = [name for name in current if name not in wanted]
+    if removed:
+        placeholders = ",".join("?" for _ in removed)
+        cursor.execute(
+            f"""
+            DELETE FROM {link_table}
+            WHERE {owner_column} = ? AND tag_id IN (SELECT id FROM tags WHERE name IN ({placeholders}))
+            """,
+            [owner_id, *removed],
+        )
+    added = [name for name in wanted if name not in current]
+    tag_ids = upsert_tags(conn, added)
     if not tag_ids:
         return
     cursor.executemany(
-        "INSERT OR IGNORE INTO card_tags (card_id, tag_id) VALUES (?, ?)",
-        [(card_id, tag_id) for tag_id in tag_ids],
+        f"INSERT OR IGNORE INTO {link_table} ({owner_column}, tag_id) VALUES (?, ?)",
+        [(owner_id, tag_id) for tag_id in tag_ids],
     )
 
 
+def set_card_tags(conn, card_id: int, tag_names: Iterable[str]) -> None:
+    _sync_tags(conn, "cards", "card_tags", "card_id", card_id, tag_names)
+
+
 def set_deck_tags(conn, deck_id: int, tag_names: Iterable[str]) -> None:
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM deck_tags WHERE deck_id = ?", (deck_id,))
-    tag_ids = upsert_tags(conn, tag_names)
-    if not tag_ids:
-        return
-    cursor.executemany(
-        "INSERT OR IGNORE INTO deck_tags (deck_id, tag_id) VALUES (?, ?)",
-        [(deck_id, tag_id) for tag_id in tag_ids],
-    )
+    _sync_tags(conn, "decks", "deck_tags", "deck_id", deck_id, tag_names)